@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+""" Benchmark block shuffling against full shuffling on HDF5 datasets.
+
+Read one epoch of batches from a chunked HDF5 dataset (built like
+`build_hdf5_image_dataset` does, with `chunks=True`), with batches drawn from
+a full shuffle or from a block shuffle (for several window sizes), and report
+samples/sec. Block shuffling is read both directly and through a `ChunkCache`
+(as `FeedDictFlow` does with `shuffle='block'`).
+
+Usage:
+    python benchmarks/block_shuffle.py [n_samples]
+
+"""
+from __future__ import division, print_function, absolute_import
+
+import os
+import sys
+import tempfile
+import time
+
+import h5py
+import numpy as np
+
+from tflearn.data_flow import block_shuffle
+from tflearn.utils import make_batches, read_rows, ChunkCache
+
+
+def read_epoch(read, index_array, batch_size):
+    start = time.time()
+    for batch_start, batch_end in make_batches(len(index_array), batch_size):
+        read(index_array[batch_start:batch_end])
+    return len(index_array) / (time.time() - start)
+
+
+def main(n_samples=10000, batch_size=128):
+    path = os.path.join(tempfile.mkdtemp(), 'block_shuffle.h5')
+    with h5py.File(path, 'w') as h5f:
+        X = h5f.create_dataset('X', (n_samples, 32, 32, 3), dtype='float32',
+                               chunks=True)
+        for start, end in make_batches(n_samples, 4096):
+            X[start:end] = np.random.random((end - start, 32, 32, 3))
+    h5f = h5py.File(path, 'r')
+    X = h5f['X']
+    read = lambda ids: read_rows(X, ids)
+    block_size = X.chunks[0]
+    print("%d samples of shape %s, chunks of %d samples, batch size %d" % (
+        n_samples, X.shape[1:], block_size, batch_size))
+
+    print("%24s %14s" % ("shuffle", "samples/sec"))
+    index_array = np.random.permutation(n_samples)
+    print("%24s %14.0f" % ("full", read_epoch(read, index_array,
+                                                batch_size)))
+    for window in [1, 4, 16, 64]:
+        index_array = block_shuffle(np.arange(n_samples), block_size, window)
+        print("%24s %14.0f" % ("block (window=%d)" % window,
+                               read_epoch(read, index_array, batch_size)))
+        cache = ChunkCache(X, max_chunks=2 * window)
+        print("%24s %14.0f" % ("block + cache", read_epoch(
+            cache.read, index_array, batch_size)))
+    h5f.close()
+    os.remove(path)
+
+
+if __name__ == "__main__":
+    main(*[int(a) for a in sys.argv[1:]])
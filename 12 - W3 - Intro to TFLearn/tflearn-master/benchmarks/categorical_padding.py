@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+""" Benchmark `to_categorical` and `pad_sequences`.
+
+Compare the vectorized `tflearn.data_utils` implementations against the
+previous loop-based ones (reproduced below), across realistic dataset sizes
+(from MNIST/IMDB scale to larger corpora).
+
+Usage:
+    python benchmarks/categorical_padding.py
+
+"""
+from __future__ import division, print_function, absolute_import
+
+import timeit
+
+import numpy as np
+
+from tflearn.data_utils import to_categorical, pad_sequences
+
+
+def legacy_to_categorical(y, nb_classes):
+    y = np.asarray(y, dtype='int32')
+    if not nb_classes:
+        nb_classes = np.max(y)+1
+    Y = np.zeros((len(y), nb_classes))
+    for i in range(len(y)):
+        Y[i, y[i]] = 1.
+    return Y
+
+
+def legacy_pad_sequences(sequences, maxlen=None, dtype='int32',
+                         padding='post', truncating='post', value=0.):
+    lengths = [len(s) for s in sequences]
+
+    nb_samples = len(sequences)
+    if maxlen is None:
+        maxlen = np.max(lengths)
+
+    x = (np.ones((nb_samples, maxlen)) * value).astype(dtype)
+    for idx, s in enumerate(sequences):
+        if len(s) == 0:
+            continue
+        if truncating == 'pre':
+            trunc = s[-maxlen:]
+        else:
+            trunc = s[:maxlen]
+        if padding == 'post':
+            x[idx, :len(trunc)] = trunc
+        else:
+            x[idx, -len(trunc):] = trunc
+    return x
+
+
+def best_of(fn, repeat=3):
+    return min(timeit.repeat(fn, number=1, repeat=repeat))
+
+
+def bench_to_categorical():
+    print("to_categorical")
+    print("%10s %8s %12s %12s %12s %9s" % ("samples", "classes", "legacy (s)",
+                                           "float32 (s)", "uint8 (s)",
+                                           "speedup"))
+    for n, c in [(60000, 10), (50000, 100), (1000000, 10), (200000, 1000)]:
+        y = np.random.randint(0, c, n)
+        out = np.empty((n, c), dtype='uint8')
+        t_old = best_of(lambda: legacy_to_categorical(y, c))
+        t_f32 = best_of(lambda: to_categorical(y, c, dtype='float32'))
+        t_u8 = best_of(lambda: to_categorical(y, c, out=out))
+        print("%10d %8d %12.4f %12.4f %12.4f %8.1fx" % (n, c, t_old, t_f32,
+                                                      t_u8, t_old / t_f32))
+
+
+def bench_pad_sequences():
+    print("pad_sequences")
+    print("%10s %8s %10s %12s %12s %9s" % ("sequences", "maxlen", "padding",
+                                           "legacy (s)", "new (s)",
+                                           "speedup"))
+    for n, mean_len, maxlen in [(25000, 230, 100), (25000, 230, 500),
+                                (250000, 60, 100)]:
+        lengths = np.random.poisson(mean_len, n)
+        seqs = [np.random.randint(1, 20000, l).tolist() for l in lengths]
+        for padding in ['post', 'pre']:
+            t_old = best_of(lambda: legacy_pad_sequences(
+                seqs, maxlen, padding=padding, truncating=padding))
+            t_new = best_of(lambda: pad_sequences(
+                seqs, maxlen, padding=padding, truncating=padding))
+            print("%10d %8d %10s %12.4f %12.4f %8.1fx" % (
+                n, maxlen, padding, t_old, t_new, t_old / t_new))
+
+
+if __name__ == "__main__":
+    bench_to_categorical()
+    print()
+    bench_pad_sequences()
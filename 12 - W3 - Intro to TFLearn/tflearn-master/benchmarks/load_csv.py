@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+""" Benchmark typed CSV loading.
+
+Load a generated CSV file (numeric columns, a categorical column and a quoted
+text column, like the Titanic dataset) with the previous `load_csv` row by
+row loop (reproduced below, followed by the conversion to a float32 array
+it required), and with `CSVReader`, and report rows/sec.
+
+Usage:
+    python benchmarks/load_csv.py [n_rows] [n_numeric_columns]
+
+"""
+from __future__ import division, print_function, absolute_import
+
+import csv
+import os
+import sys
+import tempfile
+import timeit
+
+import numpy as np
+
+from tflearn.data_utils import CSVReader
+
+
+def legacy_load_csv(filepath, target_column=-1, columns_to_ignore=None,
+                    has_header=True):
+    with open(filepath) as csv_file:
+        data_file = csv.reader(csv_file)
+        if not columns_to_ignore:
+            columns_to_ignore = []
+        if has_header:
+            header = next(data_file)
+        data, target = [], []
+        for i, c in enumerate(columns_to_ignore):
+            if c > target_column:
+                columns_to_ignore[i] -= 1
+        for i, d in enumerate(data_file):
+            target.append(d.pop(target_column))
+            data.append([_d for j, _d in enumerate(d)
+                         if j not in columns_to_ignore])
+        return data, target
+
+
+def legacy_typed(filepath):
+    # Target is column 0, name (column 1) is ignored
+    data, target = legacy_load_csv(filepath, target_column=0,
+                                   columns_to_ignore=[1])
+    vocab = {}
+    for row in data:
+        row[0] = vocab.setdefault(row[0], len(vocab))
+    return np.array(data, dtype='float32'), np.array(target, dtype='float32')
+
+
+def write_csv(path, n_rows, n_numeric=8):
+    rng = np.random.RandomState(0)
+    values = rng.random_sample((n_rows, n_numeric)) * 100
+    labels = rng.randint(0, 2, n_rows)
+    sex = np.array(['female', 'male'])[rng.randint(0, 2, n_rows)]
+    with open(path, 'w') as f:
+        writer = csv.writer(f)
+        writer.writerow(['survived', 'name', 'sex'] +
+                        ['x%d' % i for i in range(n_numeric)])
+        for i in range(n_rows):
+            writer.writerow([labels[i], 'Doe, Mr. John %d' % i, sex[i]] +
+                            ['%.4f' % v for v in values[i]])
+
+
+def main(n_rows=200000, n_numeric=8):
+    path = os.path.join(tempfile.mkdtemp(), 'load_csv.csv')
+    write_csv(path, n_rows, n_numeric)
+    reader = CSVReader(path, target_column=0, columns_to_ignore=[1],
+                       categorical_columns=[2])
+
+    data, target = reader.read()
+    old_data, old_target = legacy_typed(path)
+    assert np.array_equal(data, old_data)
+    assert np.array_equal(target, old_target)
+
+    t_strings = min(timeit.repeat(
+        lambda: legacy_load_csv(path, 0, [1]), number=1, repeat=3))
+    t_old = min(timeit.repeat(lambda: legacy_typed(path), number=1,
+                              repeat=3))
+    t_new = min(timeit.repeat(reader.read, number=1, repeat=3))
+    print("%d rows, %d columns (%.1f MB)" % (
+        n_rows, reader.n_columns, os.path.getsize(path) / 2 ** 20))
+    print("%-40s %12s %9s" % ("loader", "rows/sec", "speedup"))
+    print("%-40s %12.0f %9s" % ("legacy load_csv (strings)",
+                                n_rows / t_strings, ""))
+    print("%-40s %12.0f %8.1fx" % ("legacy load_csv + float32 conversion",
+                                   n_rows / t_old, 1.))
+    print("%-40s %12.0f %8.1fx" % ("CSVReader (float32)", n_rows / t_new,
+                                   t_old / t_new))
+    os.remove(path)
+
+
+if __name__ == "__main__":
+    main(*[int(a) for a in sys.argv[1:]])
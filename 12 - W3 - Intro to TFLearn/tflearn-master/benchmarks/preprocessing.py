@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+""" Benchmark `ImagePreprocessing.apply`.
+
+Compare the fused, vectorized `tflearn.ImagePreprocessing` pipeline against
+the previous per-sample loops (reproduced below), on CIFAR-10 sized batches,
+and report throughput (samples/sec).
+
+Usage:
+    python benchmarks/preprocessing.py
+
+"""
+from __future__ import division, print_function, absolute_import
+
+import timeit
+
+import numpy as np
+
+from tflearn.data_preprocessing import ImagePreprocessing
+
+_EPSILON = 1e-8
+
+
+def legacy_apply(batch, steps, mean, std, pc):
+    for step in steps:
+        if step == 'samplewise_zero_center':
+            for i in range(len(batch)):
+                batch[i] -= np.mean(batch[i])
+        elif step == 'featurewise_zero_center':
+            for i in range(len(batch)):
+                batch[i] -= mean
+        elif step == 'featurewise_stdnorm':
+            for i in range(len(batch)):
+                batch[i] /= (std + _EPSILON)
+        elif step == 'zca_whitening':
+            for i in range(len(batch)):
+                flat = np.reshape(batch[i], batch[i].size)
+                white = np.dot(flat, pc)
+                batch[i] = np.reshape(white, batch[i].shape)
+    return batch
+
+
+def best_of(fn, repeat=5):
+    return min(timeit.repeat(fn, number=1, repeat=repeat))
+
+
+def main(batch_size=128):
+    X = np.random.random((batch_size, 32, 32, 3))
+    mean = np.random.random(3).astype('float32')
+    std = np.random.random(3).astype('float32') + 0.5
+    pc = np.random.random((32 * 32 * 3, 32 * 32 * 3)) / 3072.
+
+    pipelines = [
+        ['featurewise_zero_center', 'featurewise_stdnorm'],
+        ['samplewise_zero_center', 'featurewise_zero_center',
+         'featurewise_stdnorm'],
+        ['featurewise_zero_center', 'featurewise_stdnorm', 'zca_whitening'],
+    ]
+    print("Batch of %d samples of shape %s" % (batch_size, X.shape[1:]))
+    print("%-72s %12s %12s %9s" % ("pipeline", "legacy (s/s)", "fused (s/s)",
+                                   "speedup"))
+    for steps in pipelines:
+        prep = ImagePreprocessing()
+        for step in steps:
+            if step == 'samplewise_zero_center':
+                prep.add_samplewise_zero_center()
+            elif step == 'featurewise_zero_center':
+                prep.add_featurewise_zero_center(mean, per_channel=True)
+            elif step == 'featurewise_stdnorm':
+                prep.add_featurewise_stdnorm(std, per_channel=True)
+            elif step == 'zca_whitening':
+                prep.add_zca_whitening(pc)
+        t_old = best_of(lambda: legacy_apply(X.copy(), steps, mean, std, pc))
+        t_new = best_of(lambda: prep.apply(X.astype('float32'), inplace=True))
+        print("%-72s %12.0f %12.0f %8.1fx" % (
+            ", ".join(steps), batch_size / t_old, batch_size / t_new,
+            t_old / t_new))
+
+
+if __name__ == "__main__":
+    main()
@@ -24,6 +24,7 @@ from tflearn import variables
 from tflearn import data_flow
 from tflearn import data_preprocessing
 from tflearn import data_augmentation
+from tflearn import sampling
 from tflearn.layers import conv
 from tflearn.layers import core
 from tflearn.layers import embedding_ops
@@ -55,6 +56,7 @@ MODULES = [(activations, 'tflearn.activations'),
            (data_flow, 'tflearn.data_flow'),
            (data_preprocessing, 'tflearn.data_preprocessing'),
            (data_augmentation, 'tflearn.data_augmentation'),
+           (sampling, 'tflearn.sampling'),
            (conv, 'tflearn.layers.conv'),
            (core, 'tflearn.layers.core'),
            (embedding_ops, 'tflearn.layers.embedding_ops'),
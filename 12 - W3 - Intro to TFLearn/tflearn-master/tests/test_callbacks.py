@@ -0,0 +1,218 @@
+'''
+    This file contains test cases for tflearn/callbacks.py
+'''
+
+import json
+import time
+import threading
+import numpy as np
+import unittest
+
+from tflearn.callbacks import TermLogger
+
+
+class TrainingState(object):
+    """ Training state, as updated by the trainer. """
+
+    def __init__(self):
+        self.step = 0
+        self.epoch = 0
+        self.current_iter = 0
+        self.global_loss = None
+        self.global_acc = None
+        self.loss_value = None
+        self.acc_value = None
+        self.val_loss = None
+        self.val_acc = None
+        self.data_stats = None
+        self.step_time_total = 0.
+
+
+class CaptureLogger(TermLogger):
+    """ TermLogger keeping written logs, optionally slow to write them. """
+
+    def __init__(self, write_time=0., **kwargs):
+        self.logs = []
+        self.threads = set()
+        self.write_time = write_time
+        super(CaptureLogger, self).__init__(**kwargs)
+
+    def write(self, logs):
+        time.sleep(self.write_time)
+        self.threads.add(threading.current_thread())
+        self.logs.append(logs)
+
+    def records(self):
+        # Training steps logs (header excluded)
+        return [json.loads(l) for l in self.logs[1:]]
+
+
+def train_step(logger, state, loss=1.):
+    logger.on_batch_begin(state)
+    state.step += 1
+    state.current_iter += 10
+    state.loss_value = state.global_loss = loss
+    logger.on_sub_batch_end(state)
+    logger.on_batch_end(state)
+
+
+class TestCallbacks(unittest.TestCase):
+
+    def test_rate_limit(self):
+        logger = CaptureLogger(refresh_rate=10, log_format='json',
+                               background=False)
+        logger.add(100, 20)
+        state = TrainingState()
+        logger.on_train_begin(state)
+        logger.on_epoch_begin(state)
+        self.assertEqual(json.loads(logger.logs[0]),
+                         {'training_samples': 100, 'validation_samples': 20})
+        # At most 10 updates per second
+        for i in range(5):
+            train_step(logger, state)
+        self.assertEqual([r['step'] for r in logger.records()], [1])
+        time.sleep(0.11)
+        train_step(logger, state)
+        self.assertEqual([r['step'] for r in logger.records()], [1, 6])
+        # Snapshots are always displayed
+        train_step(logger, state)
+        logger.on_batch_end(state, snapshot=True)
+        self.assertEqual([r['snapshot'] for r in logger.records()],
+                         [False, False, True])
+        # Last step is displayed at the end of training
+        train_step(logger, state)
+        logger.on_train_end(state)
+        self.assertEqual([r['step'] for r in logger.records()],
+                         [1, 6, 7, 8])
+        logger.on_train_end(state)
+        self.assertEqual(len(logger.records()), 4)
+
+        # Every step is displayed without rate limit
+        logger = CaptureLogger(refresh_rate=0, log_format='json',
+                               background=False)
+        logger.add(100)
+        state = TrainingState()
+        logger.on_train_begin(state)
+        logger.on_epoch_begin(state)
+        for i in range(5):
+            train_step(logger, state)
+        logger.on_train_end(state)
+        self.assertEqual([r['step'] for r in logger.records()],
+                         [1, 2, 3, 4, 5])
+
+    def test_json_logs(self):
+        logger = CaptureLogger(log_format='json', background=False)
+        self.assertEqual(logger.refresh_rate, 1.)
+        logger.add(100, 20, metric_name='top3', name='Op')
+        state = TrainingState()
+        logger.on_train_begin(state)
+        logger.on_epoch_begin(state)
+        state.epoch = 2
+        state.acc_value, state.val_loss, state.val_acc = 0.5, 0.7, 0.25
+        state.data_stats = {'wait': np.float32(0.5), 'step': 0.1,
+                            'produce': 0.2, 'workers': 2}
+        train_step(logger, state, loss=np.float32(0.75))
+        record = logger.records()[0]
+        self.assertEqual(record['step'], 1)
+        self.assertEqual(record['total_loss'], 0.75)
+        self.assertFalse(record['snapshot'])
+        self.assertEqual(record['train_ops'], [{
+            'name': 'Op', 'epoch': 2, 'iter': 10, 'data_size': 100,
+            'loss': 0.75, 'top3': 0.5, 'val_loss': 0.7, 'val_acc': 0.25,
+            'data_stats': {'wait': 0.5, 'step': 0.1, 'produce': 0.2,
+                           'workers': 2}}])
+        # One JSON object per line
+        self.assertTrue(all(l.endswith('}\n') and l.count('\n') == 1
+                            for l in logger.logs))
+        logger.on_train_end(state)
+
+        with self.assertRaises(ValueError):
+            TermLogger(log_format='xml')
+
+    def test_text_logs(self):
+        # Text logs by default
+        logger = CaptureLogger(background=False)
+        self.assertEqual(logger.log_format, 'text')
+        self.assertEqual(logger.refresh_rate, 10.)
+        logger.add(100, 20, name='Op')
+        state = TrainingState()
+        logger.on_train_begin(state)
+        logger.on_epoch_begin(state)
+        self.assertIn('Training samples: 100\nValidation samples: 20\n',
+                      logger.logs[0])
+        state.val_acc = 0.25
+        train_step(logger, state, loss=0.75)
+        self.assertIn('Training Step: 1 ', logger.logs[1])
+        self.assertIn('| Op | epoch: 000 | loss: 0.75000', logger.logs[1])
+        self.assertIn(' - val_acc: 0.2500 -- iter: 010/100', logger.logs[1])
+        logger.on_train_end(state)
+
+    def test_background_logs(self):
+        # Logs are written by a background thread, all of them before the
+        # end of training
+        logger = CaptureLogger(write_time=0.05, refresh_rate=0,
+                               log_format='json')
+        logger.add(100)
+        state = TrainingState()
+        logger.on_train_begin(state)
+        logger.on_epoch_begin(state)
+        start = time.time()
+        for i in range(5):
+            train_step(logger, state)
+        self.assertLess(time.time() - start, 0.2)
+        self.assertLess(len(logger.logs), 6)
+        logger.on_train_end(state)
+        self.assertEqual([r['step'] for r in logger.records()],
+                         [1, 2, 3, 4, 5])
+        self.assertIsNone(logger.log_thread)
+
+        # Logged data is copied, so later updates don't change it
+        logger = CaptureLogger(write_time=0.05, refresh_rate=0,
+                               log_format='json')
+        logger.add(100)
+        state = TrainingState()
+        logger.on_train_begin(state)
+        logger.on_epoch_begin(state)
+        train_step(logger, state, loss=1.)
+        train_step(logger, state, loss=2.)
+        logger.on_train_end(state)
+        self.assertEqual([r['train_ops'][0]['loss']
+                          for r in logger.records()], [1., 2.])
+
+        # All text logs (header included) are written in order, by the
+        # background thread only
+        logger = CaptureLogger(write_time=0.02, refresh_rate=0)
+        logger.add(100)
+        state = TrainingState()
+        logger.on_train_begin(state)
+        logger.on_epoch_begin(state)
+        for i in range(3):
+            train_step(logger, state)
+        logger.on_train_end(state)
+        self.assertIn('Training samples: 100', logger.logs[0])
+        steps = [l for l in logger.logs if l.startswith('Training Step')]
+        self.assertEqual([l.split()[2] for l in steps], ['1', '2', '3'])
+        self.assertEqual(len(logger.threads), 1)
+        self.assertNotIn(threading.current_thread(), logger.threads)
+
+    def test_final_sub_batch_logs(self):
+        # Results reported after the last batch (such as final async
+        # validation) are displayed at the end of training
+        logger = CaptureLogger(refresh_rate=0, log_format='json')
+        logger.add(100, 20)
+        state = TrainingState()
+        logger.on_train_begin(state)
+        logger.on_epoch_begin(state)
+        train_step(logger, state)
+        state.val_loss, state.val_acc = 0.5, 0.75
+        logger.on_sub_batch_end(state)
+        self.assertTrue(logger.pending_log)
+        logger.on_train_end(state)
+        records = logger.records()
+        self.assertEqual([r['step'] for r in records], [1, 1])
+        self.assertIsNone(records[0]['train_ops'][0]['val_acc'])
+        self.assertEqual(records[1]['train_ops'][0]['val_acc'], 0.75)
+
+
+if __name__ == "__main__":
+    unittest.main()
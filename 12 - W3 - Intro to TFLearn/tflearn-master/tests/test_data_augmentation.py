@@ -0,0 +1,38 @@
+'''
+    This file contains test cases for tflearn/data_augmentation.py
+'''
+
+import numpy as np
+import unittest
+
+from tflearn.data_augmentation import ImageAugmentation
+
+
+class TestImageAugmentation(unittest.TestCase):
+
+    def test_batch_augmentation(self):
+        X = np.random.rand(16, 8, 8, 3).astype('float32')
+
+        def augment(seed):
+            aug = ImageAugmentation(seed=seed)
+            aug.add_random_crop((8, 8), padding=2)
+            aug.add_random_flip_leftright()
+            aug.add_random_90degrees_rotation()
+            return aug.apply(X.copy())
+
+        out = augment(0)
+        self.assertEqual(out.shape, X.shape)
+        # Same seed, same augmentation
+        np.testing.assert_array_equal(augment(0), out)
+
+        # Crop without padding, on a list of grayscale images
+        aug = ImageAugmentation(seed=1)
+        aug.add_random_crop((5, 6))
+        out = aug.apply(list(X[..., 0]))
+        self.assertEqual(out.shape, (16, 5, 6))
+        self.assertTrue(any(np.array_equal(out[0], X[0, h:h + 5, w:w + 6, 0])
+                            for h in range(4) for w in range(3)))
+
+
+if __name__ == "__main__":
+    unittest.main()
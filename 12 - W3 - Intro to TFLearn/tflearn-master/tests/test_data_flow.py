@@ -0,0 +1,506 @@
+'''
+    This file contains test cases for tflearn/data_flow.py
+'''
+
+import os
+import itertools
+import tempfile
+import threading
+import time
+import numpy as np
+import tensorflow as tf
+import unittest
+try:
+    import Queue as queue
+except Exception:
+    import queue
+
+from tflearn.data_flow import FeedDictFlow, ValidationFlow, ChunkFlow, \
+    DataFlowStats, BatchCache, block_shuffle
+from tflearn.data_utils import CSVReader
+from tflearn.data_preprocessing import DataPreprocessing
+from tflearn.utils import ChunkCache
+
+
+class SlowFirstBatch(object):
+    """ Augmentation delaying the first batch, so that workers finish
+    batches out of order. """
+
+    def apply(self, batch):
+        if batch[0, 0] == 0:
+            time.sleep(0.3)
+        return batch
+
+    def reseed(self, seed=None):
+        pass
+
+
+class SlowBatches(object):
+    """ Augmentation taking some time for every batch. """
+
+    def apply(self, batch):
+        time.sleep(0.01)
+        return batch
+
+    def reseed(self, seed=None):
+        pass
+
+
+class WorkerBatches(object):
+    """ Pre-processing replacing batches by their worker process id. """
+
+    def apply(self, batch):
+        time.sleep(0.05)
+        return np.full_like(batch, os.getpid())
+
+
+class GrowingBatches(object):
+    """ Pre-processing making batches bigger than the first one. """
+
+    def apply(self, batch):
+        if batch[0, 0] == 0:
+            return batch
+        return np.tile(batch, 4)
+
+
+class AddOne(DataPreprocessing):
+    """ Custom pre-processing, overriding `apply`. """
+
+    def apply(self, batch):
+        return batch + 1
+
+
+class Chunks(object):
+    """ Re-iterable chunks of uneven sizes. """
+
+    def __init__(self, X, Y, sizes):
+        self.X, self.Y, self.sizes = X, Y, sizes
+
+    def __len__(self):
+        return len(self.X)
+
+    def __iter__(self):
+        start = 0
+        for size in self.sizes:
+            yield self.X[start:start + size], self.Y[start:start + size]
+            start += size
+        if start < len(self.X):
+            raise ValueError("Bad chunk")
+
+
+def read_flow(flow):
+    batches = []
+    while True:
+        batch = flow.next(timeout=30)
+        if batch is False:
+            return batches
+        batches.append(dict((k, np.array(v)) for k, v in batch.items()))
+        flow.release(batch)
+
+
+class TestDataFlow(unittest.TestCase):
+
+    def test_process_workers(self):
+        X = np.arange(100 * 3, dtype='float32').reshape(100, 3)
+        Y = np.arange(100)
+        flow = FeedDictFlow({'X': X, 'Y': Y}, tf.train.Coordinator(),
+                            batch_size=8, num_threads=3, use_processes=True,
+                            daug_dict={'X': SlowFirstBatch()})
+        flow.start()
+        batches = read_flow(flow)
+        flow.interrupt()
+
+        # Batches built out of order by workers are fed in order
+        self.assertEqual(len(batches), 13)
+        np.testing.assert_array_equal(
+            np.concatenate([b['X'] for b in batches]), X)
+        np.testing.assert_array_equal(
+            np.concatenate([b['Y'] for b in batches]), Y)
+
+    def test_reuse_buffers(self):
+        X = np.arange(64 * 2, dtype='float32').reshape(64, 2)
+        # Batches are new arrays by default, so they can be kept
+        flow = FeedDictFlow({'X': X}, tf.train.Coordinator(), batch_size=8,
+                            num_threads=1, max_queue=2)
+        flow.start()
+        batches = [flow.next(timeout=10) for i in range(8)]
+        for i, b in enumerate(batches):
+            np.testing.assert_array_equal(b['X'], X[i * 8:(i + 1) * 8])
+        flow.interrupt()
+
+        # Buffers in use are never overwritten: the flow waits for them to
+        # be released.
+        flow = FeedDictFlow({'X': X}, tf.train.Coordinator(), batch_size=8,
+                            num_threads=2, max_queue=2, reuse_buffers=True)
+        flow.start()
+        held = [flow.next(timeout=10) for i in range(2)]
+        values = [np.array(b['X']) for b in held]
+        with self.assertRaises(queue.Empty):
+            flow.next(timeout=0.5)
+        for b, v in zip(held, values):
+            np.testing.assert_array_equal(b['X'], v)
+        flow.release(held[0])
+        b = flow.next(timeout=10)
+        np.testing.assert_array_equal(held[1]['X'], values[1])
+        self.assertEqual(len(set([tuple(v[:, 0]) for v in values] +
+                                 [tuple(b['X'][:, 0])])), 3)
+        flow.interrupt()
+
+    def test_preprocessing(self):
+        X = np.arange(24 * 2, dtype='float64').reshape(24, 2)
+        X_copy = X.copy()
+        Y = np.arange(24)
+        prep = DataPreprocessing()
+        prep.add_featurewise_zero_center(mean=1.)
+        prep.add_featurewise_stdnorm(std=2.)
+        expected = (X - 1.) / (2. + 1e-8)
+        # Built-in and custom pre-processing are applied the same way by
+        # all flows, without changing data, nor float types
+        for dprep, out in [(prep, expected), (AddOne(), X + 1)]:
+            flow = FeedDictFlow({'X': X}, tf.train.Coordinator(),
+                                batch_size=8, num_threads=1,
+                                dprep_dict={'X': dprep})
+            flow.start()
+            batches = read_flow(flow)
+            self.assertEqual(batches[0]['X'].dtype, np.float64)
+            np.testing.assert_allclose(
+                np.concatenate([b['X'] for b in batches]), out)
+            flow = ChunkFlow(Chunks(X, Y, [8, 16]), batch_size=8,
+                             feed_keys={'x': 'X'}, dprep_dict={'x': dprep})
+            flow.start()
+            batches = read_flow(flow)
+            self.assertEqual(batches[0]['x'].dtype, np.float64)
+            np.testing.assert_allclose(
+                np.concatenate([b['x'] for b in batches]), out)
+            np.testing.assert_array_equal(X, X_copy)
+
+    def test_block_shuffle(self):
+        index_array = np.arange(100)
+        for window in [1, 3]:
+            for i in range(5):
+                ids = block_shuffle(index_array, 10, window)
+                # A permutation of indexes
+                np.testing.assert_array_equal(np.sort(ids), index_array)
+                # Whose blocks (or windows of blocks) are contiguous
+                blocks = ids // 10
+                for start in range(0, 100, 10 * window):
+                    group = blocks[start:start + 10 * window]
+                    self.assertEqual(len(set(group)), len(group) // 10)
+                    self.assertEqual(np.max(np.bincount(group)), 10)
+        # Blocks are aligned on indexes (such as a validation split)
+        index_array = np.arange(5, 35)
+        ids = block_shuffle(index_array, 10, 1)
+        np.testing.assert_array_equal(np.sort(ids), index_array)
+        sizes = [len(list(g)) for k, g in itertools.groupby(ids // 10)]
+        self.assertEqual(sorted(sizes), [5, 5, 10, 10])
+
+    def test_block_shuffle_flow(self):
+        import h5py
+        X = np.arange(64 * 2, dtype='float32').reshape(64, 2)
+        path = os.path.join(tempfile.mkdtemp(), 'data.h5')
+        h5f = h5py.File(path, 'w')
+        h5f.create_dataset('X', data=X, chunks=(8, 2))
+        Y = np.arange(64)
+        flow = FeedDictFlow({'X': h5f['X'], 'Y': Y}, tf.train.Coordinator(),
+                            batch_size=8, num_threads=1, shuffle='block',
+                            shuffle_window=2)
+        # HDF5 datasets are read through a cache of the window chunks
+        self.assertIsInstance(flow.feed_dict['X'], ChunkCache)
+        self.assertEqual(flow.feed_dict['X'].chunk_rows, 8)
+        self.assertEqual(flow.feed_dict['X'].max_chunks, 3)
+        self.assertIs(flow.feed_dict['Y'], Y)
+        self.assertEqual(flow.block_size, 8)
+        flow.start()
+        batches = read_flow(flow)
+        y = np.concatenate([b['Y'] for b in batches])
+        np.testing.assert_array_equal(np.sort(y), Y)
+        self.assertFalse(np.array_equal(y, Y))
+        np.testing.assert_array_equal(
+            np.concatenate([b['X'] for b in batches]), X[y])
+        # Every batch reads at most 2 chunks
+        for b in batches:
+            self.assertLessEqual(len(set(b['Y'] // 8)), 2)
+        h5f.close()
+
+        with self.assertRaises(ValueError):
+            FeedDictFlow({'Y': Y}, tf.train.Coordinator(), shuffle='blocks')
+
+    def test_data_flow_stats(self):
+        stats = DataFlowStats()
+        # The first batch only starts the clock
+        stats.consumed(0., 0.5)
+        stats.consumed(2., 0.1)
+        stats.consumed(3., 0.3)
+        stats.produced(0.2)
+        stats.produced(0.4)
+        summary = stats.summary()
+        self.assertEqual(stats.n_consumed, 2)
+        self.assertAlmostEqual(summary['wait'], 0.2)
+        self.assertAlmostEqual(summary['step'], 1.2)
+        self.assertAlmostEqual(summary['produce'], 0.3)
+        # Produce time is kept if no batch was built since
+        stats.reset()
+        stats.consumed(4., 0.)
+        summary = stats.summary()
+        self.assertEqual(summary['wait'], 0.)
+        self.assertAlmostEqual(summary['step'], 0.7)
+        self.assertAlmostEqual(summary['produce'], 0.3)
+
+    def test_adaptive_workers(self):
+        X = np.arange(64 * 2, dtype='float32').reshape(64, 2)
+        flow = FeedDictFlow({'X': X}, tf.train.Coordinator(), batch_size=4,
+                            num_threads='auto', max_threads=3, max_queue=4,
+                            continuous=True)
+        self.assertTrue(flow.adaptive)
+        self.assertEqual(flow.num_threads, 1)
+        flow.start()
+        flow.add_worker()
+        self.assertEqual(flow.num_threads, 2)
+        workers = flow.threads[1:]
+        self.assertEqual(sum(t.is_alive() for t in workers), 2)
+        # A worker stops once done with its current batch
+        flow.remove_worker()
+        self.assertEqual(flow.num_threads, 1)
+        for i in range(20):
+            flow.next(timeout=10)
+            if sum(t.is_alive() for t in workers) == 1:
+                break
+            time.sleep(0.01)
+        self.assertEqual(sum(t.is_alive() for t in workers), 1)
+
+        # Workers are added while the consumer waits (up to max_threads),
+        # and removed when fewer would keep up with it
+        flow.data_stats = {'wait': 0.1, 'step': 1., 'produce': 0.1}
+        flow.adapt_workers()
+        flow.adapt_workers()
+        flow.adapt_workers()
+        self.assertEqual(flow.num_threads, 3)
+        flow.data_stats = {'wait': 0., 'step': 1., 'produce': 1.5}
+        flow.adapt_workers()
+        self.assertEqual(flow.num_threads, 2)
+        flow.adapt_workers()
+        self.assertEqual(flow.num_threads, 2)
+        flow.interrupt()
+
+        # Slow batches and a fast consumer: workers are added
+        flow = FeedDictFlow({'X': X}, tf.train.Coordinator(), batch_size=4,
+                            num_threads='auto', max_threads=3, max_queue=4,
+                            continuous=True, stats_interval=5,
+                            daug_dict={'X': SlowBatches()})
+        flow.start()
+        for i in range(60):
+            flow.next(timeout=10)
+        self.assertEqual(flow.num_threads, 3)
+        self.assertEqual(flow.data_stats['workers'], 3)
+        self.assertGreater(flow.data_stats['produce'], 0.005)
+        flow.interrupt()
+
+        # Worker processes are all started, only the active ones work
+        # (small queues, so the flow can't be stopping yet)
+        flow = FeedDictFlow({'X': X}, tf.train.Coordinator(), batch_size=4,
+                            num_threads='auto', max_threads=2, max_queue=2,
+                            use_processes=True)
+        flow.start()
+        self.assertEqual((len(flow.processes), flow.n_active.value), (2, 1))
+        flow.add_worker()
+        self.assertEqual(flow.n_active.value, 2)
+        flow.remove_worker()
+        self.assertEqual(flow.n_active.value, 1)
+        batches = read_flow(flow)
+        np.testing.assert_array_equal(
+            np.concatenate([b['X'] for b in batches]), X)
+        # Workers are fixed once stopping
+        flow.add_worker()
+        self.assertEqual(flow.num_threads, 1)
+        flow.interrupt()
+
+        # Idle worker processes are woken up when activated, and when
+        # stopping (so they exit by themselves)
+        flow = FeedDictFlow({'X': X}, tf.train.Coordinator(), batch_size=4,
+                            num_threads='auto', max_threads=2, max_queue=2,
+                            use_processes=True,
+                            dprep_dict={'X': WorkerBatches()})
+        flow.start()
+        flow.add_worker()
+        processes = list(flow.processes)
+        batches = read_flow(flow)
+        self.assertEqual(sum(len(b['X']) for b in batches), len(X))
+        self.assertEqual(set(int(b['X'][0, 0]) for b in batches),
+                         set(p.pid for p in processes))
+        flow.interrupt()
+        self.assertEqual([p.exitcode for p in processes], [0, 0])
+
+        flow = FeedDictFlow({'X': X}, tf.train.Coordinator(), batch_size=4,
+                            num_threads='auto', max_threads=2, max_queue=2,
+                            use_processes=True)
+        flow.start()
+        processes = list(flow.processes)
+        read_flow(flow)
+        flow.interrupt()
+        self.assertEqual([p.exitcode for p in processes], [0, 0])
+
+    def test_validation_flow(self):
+        X = np.arange(40 * 2, dtype='float32').reshape(40, 2)
+
+        def read_pass(flow):
+            flow.start()
+            batches = []
+            while True:
+                batch = flow.next(timeout=10)
+                if batch is False:
+                    return sorted(batches, key=lambda b: b['X'][0, 0])
+                batches.append(batch)
+
+        # Every pass feeds all batches, with bounded queues
+        flow = ValidationFlow({'X': X}, tf.train.Coordinator(), batch_size=4,
+                              num_threads=2, max_queue=2, cache_size=0)
+        self.assertEqual(flow.batch_ids_queue.maxsize, 2)
+        for i in range(2):
+            batches = read_pass(flow)
+            np.testing.assert_array_equal(
+                np.concatenate([b['X'] for b in batches]), X)
+        self.assertEqual(len(flow.cache), 0)
+        # An unfinished pass is dropped by the next one
+        flow.start()
+        flow.next(timeout=10)
+        batches = read_pass(flow)
+        np.testing.assert_array_equal(
+            np.concatenate([b['X'] for b in batches]), X)
+
+        # Workers blocked on full queues stop when interrupted
+        flow.start()
+        time.sleep(0.2)
+        self.assertTrue(flow.feed_dict_queue.full())
+        threads = flow.threads
+        flow.interrupt()
+        for t in threads:
+            t.join(5)
+            self.assertFalse(t.is_alive())
+        batches = read_pass(flow)
+        self.assertEqual(len(batches), 10)
+
+        # Batches are cached, then fed from cache
+        cache = BatchCache()
+        flow = ValidationFlow({'X': X}, tf.train.Coordinator(), batch_size=4,
+                              max_queue=2, cache=cache)
+        read_pass(flow)
+        self.assertEqual(len(cache), 10)
+        self.assertEqual(cache.size, X.nbytes)
+        flow.stop()
+        batches = read_pass(flow)
+        self.assertIsNotNone(flow.cached)
+        np.testing.assert_array_equal(
+            np.concatenate([b['X'] for b in batches]), X)
+
+        # Cache is bounded: none is cached if batches are bigger than
+        # estimated from the first one
+        flow = ValidationFlow({'X': X}, tf.train.Coordinator(), batch_size=4,
+                              max_queue=2, cache_size=X.nbytes,
+                              dprep_dict={'X': GrowingBatches()})
+        batches = read_pass(flow)
+        self.assertEqual(len(batches), 10)
+        self.assertFalse(flow.caching)
+        self.assertTrue(flow.cache.overflowed)
+        self.assertEqual((len(flow.cache), flow.cache.size), (0, 0))
+        read_pass(flow)
+        self.assertIsNone(flow.cached)
+        flow.interrupt()
+
+        # Flows running concurrently can share a cache
+        for cache_size, dprep in [(2**20, None), (X.nbytes, GrowingBatches())]:
+            cache = BatchCache(cache_size)
+            errors = []
+
+            def run(flow):
+                try:
+                    for i in range(20):
+                        batches = read_pass(flow)
+                        self.assertEqual(len(batches), 10)
+                        if dprep is None:
+                            np.testing.assert_array_equal(
+                                np.concatenate([b['X'] for b in batches]), X)
+                except Exception as e:
+                    errors.append(e)
+                flow.interrupt()
+
+            flows = [ValidationFlow({'X': X}, tf.train.Coordinator(),
+                                    batch_size=4, num_threads=2, cache=cache,
+                                    dprep_dict={'X': dprep} if dprep else None)
+                     for i in range(2)]
+            threads = [threading.Thread(target=run, args=(f,)) for f in flows]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join(30)
+            self.assertEqual(errors, [])
+            self.assertEqual(len(cache), 0 if dprep else 10)
+            self.assertEqual(cache.overflowed, dprep is not None)
+
+    def test_chunk_flow(self):
+        X = np.arange(25 * 2, dtype='float32').reshape(25, 2)
+        Y = np.arange(25)
+        chunks = Chunks(X, Y, [7, 13, 5])
+        flow = ChunkFlow(chunks, batch_size=4, feed_keys={'x': 'X',
+                                                          'y': 'Y'})
+        self.assertEqual(len(flow.batches), 7)
+        for epoch in range(2):
+            flow.start()
+            batches = read_flow(flow)
+            # Batches span chunks, only the last one is not full
+            self.assertEqual([len(b['y']) for b in batches], [4] * 6 + [1])
+            np.testing.assert_array_equal(
+                np.concatenate([b['x'] for b in batches]), X)
+            np.testing.assert_array_equal(
+                np.concatenate([b['y'] for b in batches]), Y)
+
+        # Samples are shuffled within chunks
+        flow = ChunkFlow(chunks, batch_size=4, shuffle=True,
+                         feed_keys={'x': 'X', 'y': 'Y'})
+        flow.start()
+        batches = read_flow(flow)
+        y = np.concatenate([b['y'] for b in batches])
+        np.testing.assert_array_equal(np.sort(y[7:20]), Y[7:20])
+        np.testing.assert_array_equal(np.sort(y), Y)
+        np.testing.assert_array_equal(
+            np.concatenate([b['x'] for b in batches]), X[y])
+
+        # Continuous flow, interrupted then started again
+        flow = ChunkFlow(chunks, batch_size=4, continuous=True, max_queue=2,
+                         feed_keys={'y': 'Y'})
+        flow.start()
+        for i in range(10):
+            batch = flow.next(timeout=10)
+        np.testing.assert_array_equal(batch['y'], Y[8:12])
+        flow.interrupt()
+        flow.start()
+        np.testing.assert_array_equal(flow.next(timeout=10)['y'], Y[:4])
+        flow.interrupt()
+
+        # CSV rows streamed by chunks
+        path = os.path.join(tempfile.mkdtemp(), 'data.csv')
+        with open(path, 'w') as f:
+            f.write('y,a,b\n')
+            for i in range(25):
+                f.write('%d,%d,%d\n' % (i, 2 * i, 2 * i + 1))
+        flow = ChunkFlow(CSVReader(path, target_column=0, chunk_size=6),
+                         batch_size=4, feed_keys={'x': 'X', 'y': 'Y'})
+        self.assertEqual(len(flow.batches), 7)
+        flow.start()
+        batches = read_flow(flow)
+        self.assertEqual([len(b['y']) for b in batches], [4] * 6 + [1])
+        np.testing.assert_array_equal(
+            np.concatenate([b['x'] for b in batches]), X)
+        np.testing.assert_array_equal(
+            np.concatenate([b['y'] for b in batches]), Y)
+        os.remove(path)
+
+        # Errors reading chunks are raised by next
+        flow = ChunkFlow(Chunks(X, Y, [7]), batch_size=4,
+                         feed_keys={'y': 'Y'})
+        flow.start()
+        with self.assertRaises(ValueError):
+            read_flow(flow)
+
+
+if __name__ == "__main__":
+    unittest.main()
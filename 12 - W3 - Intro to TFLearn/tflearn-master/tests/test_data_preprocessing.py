@@ -0,0 +1,166 @@
+'''
+    This file contains test cases for tflearn/data_preprocessing.py
+'''
+
+import os
+import tempfile
+import numpy as np
+import unittest
+
+from tflearn.data_preprocessing import DataPreprocessing, \
+    ImagePreprocessing, dataset_fingerprint
+
+
+def apply_unfused(prep, batch):
+    """ Apply preprocessing methods one by one (without fusion). """
+    for m, args in zip(prep.methods, prep.args):
+        batch = m(batch, *(args or []))
+    return batch
+
+
+class TestDataPreprocessing(unittest.TestCase):
+
+    def test_fused_methods(self):
+        X = np.random.randint(0, 256, (8, 6, 6, 3)).astype('uint8')
+        prep = ImagePreprocessing()
+        prep.add_image_normalization()
+        prep.add_featurewise_zero_center(mean=0.4)
+        prep.add_featurewise_stdnorm(std=0.2)
+        prep.add_samplewise_zero_center(per_channel=True)
+        prep.add_crop_center((4, 4))
+        prep.add_featurewise_zero_center(mean=np.float32([.1, .2, .3]))
+        out = prep.apply(X)
+        self.assertEqual(out.dtype, np.float32)
+        self.assertEqual(out.shape, (8, 4, 4, 3))
+        np.testing.assert_allclose(out, apply_unfused(prep, X.copy()),
+                                   rtol=1e-5, atol=1e-5)
+
+        # Batch is only overwritten if inplace (as by data flows)
+        X = np.random.rand(8, 5).astype('float32')
+        prep = DataPreprocessing()
+        prep.add_featurewise_zero_center(mean=0.5)
+        prep.add_featurewise_stdnorm(std=2.)
+        X_copy = X.copy()
+        out = prep.apply(X)
+        np.testing.assert_array_equal(X, X_copy)
+        np.testing.assert_allclose(out, apply_unfused(prep, X_copy),
+                                   rtol=1e-5, atol=1e-6)
+        prep._apply(X, inplace=True)
+        np.testing.assert_allclose(X, out)
+
+        # Float data type is kept by fused methods
+        X = np.random.rand(8, 5)
+        out = prep.apply(X)
+        self.assertEqual(out.dtype, np.float64)
+        np.testing.assert_allclose(out, (X - 0.5) / (2. + 1e-8))
+
+    def test_data_type(self):
+        # Data type is kept by methods that are not element-wise
+        X = np.random.randint(0, 256, (4, 6, 6, 3)).astype('uint8')
+        prep = ImagePreprocessing()
+        prep.add_crop_center((4, 4))
+        out = prep.apply(X)
+        self.assertEqual(out.dtype, np.uint8)
+        np.testing.assert_array_equal(out, X[:, 1:5, 1:5])
+
+        X = np.random.rand(4, 5)
+        prep = DataPreprocessing()
+        prep.add_samplewise_zero_center()
+        prep.add_samplewise_stdnorm()
+        out = prep.apply(X)
+        self.assertEqual(out.dtype, np.float64)
+        expected = X - X.mean(1, keepdims=True)
+        expected /= expected.std(1, keepdims=True) + 1e-8
+        np.testing.assert_allclose(out, expected)
+        self.assertFalse(np.may_share_memory(out, X))
+
+        # Integer data is converted to float32
+        out = prep.apply(np.arange(20).reshape(4, 5))
+        self.assertEqual(out.dtype, np.float32)
+
+    def test_moments(self):
+        # Large enough samples to be read by several chunks
+        X = np.random.rand(300, 64, 64, 3).astype('float32')
+        prep = ImagePreprocessing(num_workers=2)
+        mean, var = prep._compute_moments(X)
+        self.assertAlmostEqual(mean, np.mean(X, dtype=np.float64), places=6)
+        self.assertAlmostEqual(np.sqrt(var), np.std(X, dtype=np.float64),
+                               places=6)
+        mean, var = prep._compute_moments(X, limit=100)
+        self.assertAlmostEqual(mean, np.mean(X[:100], dtype=np.float64),
+                               places=6)
+        mean, var = prep._compute_moments(X, per_channel=True)
+        np.testing.assert_allclose(mean, np.mean(X, axis=(0, 1, 2),
+                                                 dtype=np.float64))
+        np.testing.assert_allclose(np.sqrt(var), np.std(
+            X, axis=(0, 1, 2), dtype=np.float64))
+
+        # Moments of modified data are not taken from the last computation
+        X *= 2
+        mean, var = prep._compute_moments(X)
+        self.assertAlmostEqual(mean, np.mean(X, dtype=np.float64), places=6)
+
+    def test_pc(self):
+        def exact_pc(X):
+            flat = np.reshape(X, (len(X), -1)).astype(np.float64)
+            sigma = np.dot(flat.T, flat) / flat.shape[1]
+            U, S, V = np.linalg.svd(sigma)
+            return np.dot(np.dot(U, np.diag(1. / np.sqrt(S + 1e-8))), U.T)
+
+        # Exact PCA, over several chunks
+        X = np.random.rand(3000, 16, 16, 3).astype('float32')
+        prep = ImagePreprocessing(num_workers=2)
+        prep.add_zca_whitening()
+        pc = prep._compute_pc(X)
+        np.testing.assert_allclose(pc, exact_pc(X), rtol=1e-6, atol=1e-6)
+
+        # Randomized PCA finds the principal components of low rank data
+        basis = np.random.randn(5, 768)
+        X = np.dot(np.random.randn(3000, 5), basis).reshape(3000, 16, 16, 3)
+        prep = ImagePreprocessing(num_workers=2)
+        prep.add_zca_whitening(n_components=5)
+        pc = prep._compute_pc(X)
+        expected = exact_pc(X)
+        np.testing.assert_allclose(pc, expected, rtol=1e-4,
+                                   atol=1e-4 * np.abs(expected).max())
+        # Whitened data has unit variance along principal components
+        flat = np.reshape(X, (len(X), -1))
+        white = np.dot(flat, pc)
+        S = np.linalg.svd(np.dot(white.T, white) / 768, compute_uv=False)
+        np.testing.assert_allclose(S[:5], 1., rtol=1e-4)
+
+        # With noise, top principal components are whitened, and other
+        # directions are scaled by their mean variance
+        X = X + 0.01 * np.random.randn(*X.shape)
+        pc = prep._compute_pc(X)
+        flat = np.reshape(X, (len(X), -1))
+        sigma = np.dot(flat.T, flat) / 768
+        U = np.linalg.svd(sigma)[0][:, :5]
+        white = np.dot(np.dot(pc.T, sigma), pc)
+        np.testing.assert_allclose(np.dot(np.dot(U.T, white), U), np.eye(5),
+                                   atol=1e-3)
+        self.assertAlmostEqual(np.trace(white) / 768, 1., places=4)
+
+    def test_stats_disk_cache(self):
+        X = np.random.rand(50, 4, 4).astype('float32')
+        cache_dir = os.path.join(tempfile.mkdtemp(), 'stats')
+        prep = DataPreprocessing(cache_dir=cache_dir)
+        moments = prep._compute_moments(X)
+        path = os.path.join(cache_dir, 'moments_%s.npy' %
+                            dataset_fingerprint(X))
+        self.assertTrue(os.path.exists(path))
+        np.testing.assert_array_equal(np.load(path), moments)
+
+        # Cached statistics are loaded (data isn't read again)
+        def fail(*args):
+            raise AssertionError("Statistics computed again")
+        prep = DataPreprocessing(cache_dir=cache_dir)
+        prep._map_chunks = fail
+        np.testing.assert_array_equal(prep._compute_moments(X), moments)
+        # But other data statistics are computed
+        with self.assertRaises(AssertionError):
+            prep._compute_moments(X[:40])
+
+
+if __name__ == "__main__":
+    unittest.main()
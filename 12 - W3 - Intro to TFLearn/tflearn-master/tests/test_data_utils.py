@@ -0,0 +1,400 @@
+'''
+    This file contains test cases for tflearn/data_utils.py
+'''
+
+import os
+import pickle
+import tempfile
+import numpy as np
+import unittest
+
+from tflearn.data_utils import to_categorical, pad_sequences, \
+    string_to_semi_redundant_sequences, OneHotPreloader, CSVReader, \
+    build_tfrecords_dataset, hdf5_to_tfrecords, TextFileSequences, \
+    textfile_to_semi_redundant_sequences, build_hdf5_image_dataset, \
+    NormalizedArray, ImageCache, Preloader, ImagePreloader, LabelPreloader, \
+    load_npy_cache, _bounded_imap
+
+
+def square(x):
+    return np.full((2,), x * x)
+
+
+class Elements(list):
+    """ Elements that can't be pickled (to be sent to workers). """
+
+    def __reduce__(self):
+        raise pickle.PicklingError("Elements must not be pickled")
+
+
+class TestDataUtils(unittest.TestCase):
+
+    def test_to_categorical(self):
+        y = [0, 2, 1, 2]
+        Y = to_categorical(y, 3)
+        self.assertEqual(Y.dtype, np.float64)
+        np.testing.assert_array_equal(Y, np.eye(3)[y])
+
+        Y = to_categorical(y, None, dtype='bool')
+        self.assertEqual(Y.dtype, np.bool_)
+        np.testing.assert_array_equal(Y, np.eye(3, dtype=bool)[y])
+
+        out = np.ones((4, 3), dtype='uint8')
+        Y = to_categorical(np.reshape(y, (-1, 1)), 3, out=out)
+        self.assertIs(Y, out)
+        np.testing.assert_array_equal(out, np.eye(3)[y])
+
+        with self.assertRaises(ValueError):
+            to_categorical(y, 3, out=np.zeros((4, 4)))
+
+    def test_pad_sequences(self):
+        seqs = [[1, 2, 3], [], [4, 5, 6, 7, 8], [9]]
+
+        x = pad_sequences(seqs)
+        self.assertEqual(x.shape, (4, 5))
+        np.testing.assert_array_equal(x[0], [1, 2, 3, 0, 0])
+        np.testing.assert_array_equal(x[1], [0, 0, 0, 0, 0])
+
+        x = pad_sequences(seqs, maxlen=3, padding='pre', truncating='pre',
+                          value=-1)
+        np.testing.assert_array_equal(x, [[1, 2, 3], [-1, -1, -1],
+                                          [6, 7, 8], [-1, -1, 9]])
+
+        x = pad_sequences(seqs, maxlen=3, padding='pre', truncating='post')
+        np.testing.assert_array_equal(x[2], [4, 5, 6])
+        np.testing.assert_array_equal(x[3], [0, 0, 9])
+
+        out = np.zeros((4, 2), dtype='float32')
+        x = pad_sequences(seqs, maxlen=2, out=out)
+        self.assertIs(x, out)
+        np.testing.assert_array_equal(out, [[1, 2], [0, 0], [4, 5], [9, 0]])
+
+        with self.assertRaises(ValueError):
+            pad_sequences(seqs, padding='middle')
+
+    def test_semi_redundant_sequences_indexes(self):
+        text = "the quick brown fox jumps over the lazy dog" * 3
+        X, Y, char_idx = string_to_semi_redundant_sequences(
+            text, seq_maxlen=10, redun_step=4)
+        Xi, Yi, _ = string_to_semi_redundant_sequences(
+            text, seq_maxlen=10, redun_step=4, char_idx=char_idx,
+            one_hot=False)
+        self.assertEqual(Xi.shape, X.shape[:2])
+        self.assertEqual(Yi.shape, Y.shape[:1])
+        self.assertFalse(Xi.flags.writeable)
+        self.assertEqual(Xi[1, 0], char_idx[text[4]])
+        self.assertEqual(Yi[1], char_idx[text[14]])
+
+        ids = [0, 5, 7]
+        np.testing.assert_array_equal(
+            OneHotPreloader(Xi, len(char_idx))[ids], X[ids])
+        np.testing.assert_array_equal(
+            OneHotPreloader(Yi, len(char_idx))[ids], Y[ids])
+
+    def test_text_file_sequences(self):
+        path = os.path.join(tempfile.mkdtemp(), 'text.txt')
+        with open(path, 'w') as f:
+            f.write("the quick brown fox jumps over the lazy dog\n" * 5)
+        X, Y, char_idx = textfile_to_semi_redundant_sequences(
+            path, seq_maxlen=10, redun_step=3, one_hot=False)
+        # Small chunks, so sequences span several chunks
+        sequences = TextFileSequences(path, seq_maxlen=10, redun_step=3,
+                                      chunk_size=16)
+        self.assertEqual(sequences.char_idx, char_idx)
+        self.assertEqual(len(sequences), len(X))
+        chunks = list(sequences)
+        self.assertTrue(len(chunks) > 1)
+        np.testing.assert_array_equal(np.concatenate([c[0] for c in chunks]),
+                                      X)
+        np.testing.assert_array_equal(np.concatenate([c[1] for c in chunks]),
+                                      Y)
+
+        # No chars dictionary can be built from an empty file
+        open(path, 'w').close()
+        with self.assertRaises(ValueError):
+            TextFileSequences(path)
+        with self.assertRaises(ValueError):
+            list(TextFileSequences(path, pre_defined_char_idx={}))
+        os.remove(path)
+
+    def test_csv_reader(self):
+        path = os.path.join(tempfile.mkdtemp(), 'data.csv')
+        with open(path, 'w') as f:
+            f.write('survived,name,sex,age\n'
+                    '1,"Doe, Jane",female,29\n'
+                    '0,"Doe,\nJohn",male,\n'
+                    '\n'
+                    '1,Smith,female,4.5\n')
+        for chunk_size in [1, 2, 10]:
+            reader = CSVReader(path, target_column=0, columns_to_ignore=[1],
+                               categorical_columns=[-2],
+                               chunk_size=chunk_size)
+            data, target = reader.read()
+            self.assertEqual(data.dtype, np.float32)
+            np.testing.assert_array_equal(data[[0, 2]], [[0, 29], [0, 4.5]])
+            self.assertEqual(data[1, 0], 1)
+            self.assertTrue(np.isnan(data[1, 1]))
+            np.testing.assert_array_equal(target, [1, 0, 1])
+            self.assertEqual(reader.vocabularies, {2: {'female': 0,
+                                                       'male': 1}})
+            self.assertEqual(reader.header, ['survived', 'name', 'sex',
+                                             'age'])
+
+        # Categorical target, streamed by chunks
+        reader = CSVReader(path, target_column=2, columns_to_ignore=[1],
+                           categorical_columns=[2], categorical_labels=True,
+                           n_classes=2, chunk_size=2)
+        chunks = list(reader)
+        self.assertEqual(len(chunks), 2)
+        np.testing.assert_array_equal(chunks[1][1], [[1, 0]])
+        self.assertEqual(len(reader), 3)
+
+        with self.assertRaises(ValueError):
+            CSVReader(path, categorical_columns=[0]).read()
+        os.remove(path)
+
+    def test_build_hdf5_image_dataset(self):
+        import h5py
+        from PIL import Image
+        tmp = tempfile.mkdtemp()
+        images = []
+        for i in range(20):
+            path = os.path.join(tmp, '%d.png' % i)
+            pixels = np.random.randint(0, 256, (12, 10, 3)).astype('uint8')
+            Image.fromarray(pixels).save(path)
+            images.append(path)
+        listing = os.path.join(tmp, 'images.txt')
+        with open(listing, 'w') as f:
+            for i, path in enumerate(images):
+                f.write('%s %d\n' % (path, i % 3))
+
+        # Reference: float32, decoded in the current process
+        ref_path = os.path.join(tmp, 'ref.h5')
+        build_hdf5_image_dataset(listing, (8, 8), ref_path, num_workers=0)
+        with h5py.File(ref_path, 'r') as h5f:
+            refX, refY = h5f['X'][:], h5f['Y'][:]
+        self.assertEqual(refX.dtype, np.float32)
+        self.assertEqual(refX.shape, (20, 8, 8, 3))
+        self.assertLessEqual(refX.max(), 1.)
+
+        # uint8 storage, compressed, decoded by worker processes and read
+        # through a NormalizedArray
+        path = os.path.join(tmp, 'uint8.h5')
+        build_hdf5_image_dataset(listing, (8, 8), path, dtype='uint8',
+                                 compression='gzip', num_workers=2,
+                                 slab_size=3)
+        with h5py.File(path, 'r') as h5f:
+            self.assertEqual(h5f['X'].dtype, np.uint8)
+            X = NormalizedArray(h5f['X'])
+            self.assertEqual(X[:].dtype, np.float32)
+            np.testing.assert_allclose(X[:], refX, rtol=1e-6)
+            np.testing.assert_allclose(X[[1, 7]], refX[[1, 7]], rtol=1e-6)
+            np.testing.assert_array_equal(h5f['Y'][:], refY)
+
+        # Interrupted build (after 2 slabs), resumed: images already
+        # written are not loaded again
+        with h5py.File(path, 'r+') as h5f:
+            h5f.attrs['n_built'] = 6
+            h5f['X'][6:] = 0
+        for image in images[:6]:
+            os.remove(image)
+        build_hdf5_image_dataset(listing, (8, 8), path, dtype='uint8',
+                                 compression='gzip', num_workers=2,
+                                 slab_size=3, resume=True)
+        with h5py.File(path, 'r') as h5f:
+            self.assertEqual(h5f.attrs['n_built'], 20)
+            np.testing.assert_allclose(NormalizedArray(h5f['X'])[:], refX,
+                                       rtol=1e-6)
+        # A different build starts over (and needs all images)
+        with self.assertRaises(IOError):
+            build_hdf5_image_dataset(listing, (6, 6), path, num_workers=0,
+                                     resume=True)
+
+    def test_bounded_imap(self):
+
+        class Pool(object):
+            submitted = 0
+
+            def apply_async(self, func, args):
+                Pool.submitted += 1
+                result = func(*args)
+
+                class Result(object):
+                    def get(self):
+                        return result
+                return Result()
+
+        results = _bounded_imap(Pool(), lambda x: 2 * x, range(10), 3)
+        for i, r in enumerate(results):
+            self.assertEqual(r, 2 * i)
+            # At most 3 tasks in flight
+            self.assertLessEqual(Pool.submitted, i + 1 + 3)
+        self.assertEqual(Pool.submitted, 10)
+
+    def test_load_npy_cache(self):
+        cache_dir = os.path.join(tempfile.mkdtemp(), 'npy_cache')
+        X = np.arange(24, dtype=np.uint8).reshape(2, 3, 4)
+        Y = np.array([1, 0])
+        builds = []
+
+        def build():
+            builds.append(1)
+            return [X, Y]
+
+        # Built and saved on first use only
+        for mmap_mode in [None, 'r']:
+            x, y = load_npy_cache(cache_dir, ['X', 'Y'], build, mmap_mode)
+            np.testing.assert_array_equal(x, X)
+            np.testing.assert_array_equal(y, Y)
+            self.assertEqual(x.dtype, X.dtype)
+        self.assertEqual(len(builds), 1)
+        self.assertIsInstance(x, np.memmap)
+        self.assertEqual(sorted(os.listdir(cache_dir)), ['X.npy', 'Y.npy'])
+
+        # Rebuilt if a file is missing, the directory already existing
+        os.remove(os.path.join(cache_dir, 'Y.npy'))
+        x, y = load_npy_cache(cache_dir, ['X', 'Y'], build)
+        np.testing.assert_array_equal(y, Y)
+        self.assertEqual(len(builds), 2)
+
+    def test_preloader(self):
+        from multiprocessing.pool import Pool
+        X = Elements(range(10))
+        expected = np.array([[i * i] * 2 for i in [7, 2, 3, 5, 0]])
+        ids = [7, 2, 3, 5, 0]
+        np.testing.assert_array_equal(Preloader(X, square)[ids], expected)
+        np.testing.assert_array_equal(Preloader(X, square, 2)[ids], expected)
+        np.testing.assert_array_equal(Preloader(X, square, 2)[7:8],
+                                      expected[:1])
+        # Worker processes only get the elements of their chunk
+        pool = Pool(2)
+        try:
+            np.testing.assert_array_equal(Preloader(X, square, pool)[ids],
+                                          expected)
+            self.assertEqual(Preloader(X, square, pool).n_workers, 2)
+        finally:
+            pool.terminate()
+        self.assertEqual(Preloader(X, square).n_workers, 1)
+        self.assertEqual(Preloader(X, square, 3).n_workers, 3)
+        self.assertEqual(Preloader(X, square).select([2, 5]).array,
+                         {2: 2, 5: 5})
+        # Selected image preloaders don't carry the whole paths list
+        sizes = []
+        for n in [10, 10000]:
+            paths = ['/data/images/%08d.jpg' % i for i in range(n)]
+            for cache_size in [0, 2 << 20]:
+                X = ImagePreloader(paths, (32, 32), cache_size=cache_size)
+                sizes.append(len(pickle.dumps(X.select([1, 2]))))
+                self.assertGreater(len(pickle.dumps(X)), n * 20)
+        # (only the cache number of slots grows, by a few bytes)
+        for small, large in zip(sizes[:2], sizes[2:]):
+            self.assertLess(large - small, 8)
+
+        Y = LabelPreloader([2, 0, 1, 2], n_class=3)
+        np.testing.assert_array_equal(Y[[3, 1]], [[0, 0, 1], [1, 0, 0]])
+        np.testing.assert_array_equal(Y[2], [0, 1, 0])
+        Y = LabelPreloader([2, 0, 1, 2], categorical_label=False)
+        np.testing.assert_array_equal(Y[1:3], [0, 1])
+
+    def test_image_cache(self):
+        images = [np.full((2, 2, 3), i, dtype=np.uint8) for i in range(4)]
+        loads = []
+
+        def get(cache, i, key=None):
+            def load():
+                loads.append(i)
+                return images[i]
+            return cache.get(i, key or i + 1, load)
+
+        # In-memory LRU cache of 2 images (12 bytes each)
+        cache = ImageCache(4, (2, 2, 3), max_size=24)
+        for i in [0, 1, 0, 2, 0, 1]:
+            np.testing.assert_array_equal(get(cache, i), images[i])
+        # 1 was evicted by 2 (least recently used), then 2 by 1
+        self.assertEqual(loads, [0, 1, 2, 1])
+        self.assertEqual(list(cache.entries), [0, 1])
+        info = cache.info()
+        self.assertEqual((info['hits'], info['misses']), (2, 4))
+        self.assertEqual(info['hit_ratio'], 2 / 6.)
+        self.assertEqual((info['size'], info['n_cached']), (24, 2))
+        # Another key (modified image) is loaded again
+        get(cache, 0, key=10)
+        self.assertEqual(loads[-1], 0)
+        self.assertEqual(cache.info()['size'], 24)
+
+        # Disk spill: images are loaded once, even by another cache
+        path = os.path.join(tempfile.mkdtemp(), 'cache')
+        cache = ImageCache(4, (2, 2, 3), path=path)
+        loads = []
+        for i in [0, 1, 2, 3, 0, 1]:
+            np.testing.assert_array_equal(get(cache, i), images[i])
+        self.assertEqual(loads, [0, 1, 2, 3])
+        self.assertEqual(cache.info()['n_cached'], 0)
+        self.assertEqual(cache.info()['disk_hits'], 2)
+        cache = ImageCache(4, (2, 2, 3), max_size=12, path=path)
+        for i in [3, 2, 3]:
+            np.testing.assert_array_equal(get(cache, i), images[i])
+        self.assertEqual(loads, [0, 1, 2, 3])
+        info = cache.info()
+        self.assertEqual((info['hits'], info['disk_hits'], info['misses']),
+                         (0, 3, 0))
+        self.assertEqual(info['hit_ratio'], 1.)
+        # Images of another shape are not spilled
+        cache.get(0, 20, lambda: np.zeros((3, 3, 3), dtype=np.uint8))
+        cache.get(0, 20, lambda: np.zeros((3, 3, 3), dtype=np.uint8))
+        self.assertEqual(cache.info()['misses'], 2)
+
+        # Memory cache is emptied, and disk cache reopened, when unpickled
+        cache = pickle.loads(pickle.dumps(cache))
+        self.assertEqual((cache.info()['size'], cache.info()['n_cached']),
+                         (0, 0))
+        np.testing.assert_array_equal(get(cache, 1), images[1])
+        self.assertEqual(loads, [0, 1, 2, 3])
+
+    def test_tfrecords_round_trip(self):
+        import h5py
+        import tensorflow as tf
+        from tflearn.data_flow import TFRecordsFlow
+
+        tmp = tempfile.mkdtemp()
+        X = np.random.random((50, 4, 3)).astype('float32')
+        Y = np.random.randint(0, 10, 50)
+        h5_path = os.path.join(tmp, 'data.h5')
+        with h5py.File(h5_path, 'w') as h5f:
+            h5f.create_dataset('X', data=X)
+            h5f.create_dataset('Y', data=Y)
+        build_tfrecords_dataset(X, Y, os.path.join(tmp, 'arrays'),
+                                n_shards=3, chunk_size=16)
+        hdf5_to_tfrecords(h5_path, os.path.join(tmp, 'hdf5'), n_shards=2,
+                          chunk_size=16)
+
+        for name in ['arrays', 'hdf5']:
+            with tf.Graph().as_default():
+                session = tf.Session()
+                flow = TFRecordsFlow(os.path.join(tmp, name), batch_size=10,
+                                     ensure_data_order=True,
+                                     feed_keys={'X': 'X', 'Y': 'Y'},
+                                     session=session)
+                flow.start()
+                batches = [flow.next(timeout=30) for i in range(5)]
+                self.assertFalse(flow.next(timeout=30))
+                np.testing.assert_array_equal(
+                    np.concatenate([b['X'] for b in batches]), X)
+                np.testing.assert_array_equal(
+                    np.concatenate([b['Y'] for b in batches]), Y)
+
+                # Starting again waits for the previous fill thread
+                thread = flow.thread
+                flow.interrupt()
+                flow.reset()
+                flow.start()
+                self.assertFalse(thread.is_alive())
+                np.testing.assert_array_equal(flow.next(timeout=30)['Y'],
+                                              Y[:10])
+                flow.interrupt()
+                flow.coord.request_stop()
+                session.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
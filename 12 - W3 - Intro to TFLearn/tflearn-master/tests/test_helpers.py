@@ -1,3 +1,4 @@
+import numpy as np
 import tensorflow as tf
 import tflearn
 import unittest
@@ -37,6 +38,80 @@ class TestHelpers(unittest.TestCase):
             s.summarize_variables([W])
             s.summarize_activations(tf.get_collection(tf.GraphKeys.ACTIVATIONS))
             s.summarize(x, 'histogram', "test_summary")
+    def test_evaluator(self):
+        X = np.arange(15, dtype='float32').reshape(5, 3)
+        W = np.array([[1., 0.], [0., 1.], [1., 1.]], dtype='float32')
+        with tf.Graph().as_default():
+            x = tflearn.input_data([None, 3])
+            w = tf.Variable(W)
+            y1 = tf.matmul(x, w)
+            y2 = tf.reduce_sum(x, 1)
+            with tf.Session() as sess:
+                sess.run(tf.global_variables_initializer())
+                single = tflearn.Evaluator([y1], session=sess)
+                multi = tflearn.Evaluator([y1, y2], session=sess)
+                Y1, Y2 = X.dot(W), X.sum(1)
+
+                # Per-sample lists by default (predictions of multiple
+                # tensors concatenated per sample)
+                for batch_size in [None, 2, 5, 10]:
+                    pred = single.predict({x: X}, batch_size)
+                    self.assertIsInstance(pred, list)
+                    np.testing.assert_allclose(pred, Y1)
+                    pred = multi.predict({x: X}, batch_size)
+                    self.assertEqual(len(pred), 5)
+                    for p, y1_, y2_ in zip(pred, Y1, Y2):
+                        np.testing.assert_allclose(p[0], y1_)
+                        self.assertAlmostEqual(p[1], y2_)
+
+                    # Arrays (one per tensor) if requested
+                    pred = single.predict({x: X}, batch_size, as_array=True)
+                    self.assertIsInstance(pred, np.ndarray)
+                    np.testing.assert_allclose(pred, Y1)
+                    pred = multi.predict({x: X}, batch_size, as_array=True)
+                    np.testing.assert_allclose(pred[0], Y1)
+                    np.testing.assert_allclose(pred[1], Y2)
+
+                preds = list(multi.predict_generator({x: X}, 2,
+                                                     as_array=True))
+                self.assertEqual([len(p[0]) for p in preds], [2, 2, 1])
+                np.testing.assert_allclose(
+                    np.concatenate([p[1] for p in preds]), Y2)
+                preds = list(single.predict_generator({x: X}, 2))
+                self.assertEqual(sum(preds, []), Y1.tolist())
+
+    def test_async_evaluator(self):
+        from tflearn.data_flow import ValidationFlow, BatchCache
+        from tflearn.helpers.trainer import AsyncEvaluator
+        X = np.random.rand(200, 3).astype('float32')
+        mean_sum = X.sum(1).mean()
+        with tf.Graph().as_default():
+            x = tflearn.input_data([None, 3])
+            w = tf.Variable(1.)
+            step = tf.Variable(0)
+            new_w = tf.placeholder(tf.float32, [])
+            update = [w.assign(new_w), step.assign_add(1)]
+            y = tf.reduce_mean(tf.reduce_sum(x, 1)) * w
+            coord = tf.train.Coordinator()
+            # Flows of concurrent evaluations share the batch cache
+            cache = BatchCache()
+            with tf.Session() as sess:
+                sess.run(tf.global_variables_initializer())
+                tflearn.is_training(False, sess)
+                evaluator = AsyncEvaluator(
+                    sess, [y], lambda: ValidationFlow(
+                        {x: X}, coord, batch_size=16, cache=cache),
+                    max_pending=2)
+                for i in range(10):
+                    sess.run(update, {new_w: float(i)})
+                    evaluator.submit(step)
+                res = evaluator.results(wait=True)
+                evaluator.close()
+        self.assertEqual([r[0] for r in res], list(range(1, 11)))
+        for i, (s, r) in enumerate(res):
+            self.assertAlmostEqual(r[0], mean_sum * i, places=3)
+        self.assertEqual(len(cache), 13)
+
 
 if __name__ == "__main__":
     unittest.main()
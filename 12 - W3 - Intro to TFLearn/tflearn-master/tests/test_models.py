@@ -3,6 +3,8 @@ import numpy as np
 import tflearn
 import unittest
 import os
+import glob
+import tempfile
 
 class TestModels(unittest.TestCase):
     """
@@ -112,6 +114,17 @@ class TestModels(unittest.TestCase):
             res_str = " ".join(res[-2:])
             self.assertEqual(res_str, "hello world", "SequenceGenerator (word level) test failed! Generated sequence: " + res_str + " expected 'hello world'")
 
+            # Testing batched and stateful generation
+            for stateful in [False, True]:
+                res = m.generate_batch(4, [["hello", "world"]] * 3,
+                                       temperature=[.1, .5, .5],
+                                       stateful=stateful)
+                self.assertEqual(len(res), 3)
+                for r in res:
+                    self.assertEqual(len(r), 6)
+                    res_str = " ".join(r[-2:])
+                    self.assertEqual(res_str, "hello world", "SequenceGenerator (batch) test failed! Generated sequence: " + res_str + " expected 'hello world'")
+
             # Testing save method
             m.save("test_seqgen_word.tflearn")
             self.assertTrue(os.path.exists("test_seqgen_word.tflearn.index"))
@@ -122,5 +135,98 @@ class TestModels(unittest.TestCase):
             res_str = " ".join(res[-2:])
             self.assertEqual(res_str, "hello world", "Reloaded SequenceGenerator (word level) test failed! Generated sequence: " + res_str + " expected 'hello world'")
 
+    def test_profiler(self):
+
+        with tf.Graph().as_default():
+            X = np.random.random((64, 4))
+            Y = np.random.random((64, 1))
+            input = tflearn.input_data(shape=[None, 4])
+            linear = tflearn.fully_connected(input, 1)
+            regression = tflearn.regression(linear, optimizer='sgd',
+                                            loss='mean_square', batch_size=8)
+            m = tflearn.DNN(regression)
+            profiler = tflearn.callbacks.Profiler(trace_path="profile.csv",
+                                                  log_step=4)
+            m.fit(X, Y, n_epoch=2, callbacks=profiler)
+
+            timings = list(profiler.timings.values())[0]
+            self.assertEqual(len(timings['run']), 16)
+            stats = profiler.stats(list(profiler.timings)[0])
+            self.assertLessEqual(stats['data']['share'] + stats['run']['share'],
+                                 1.)
+            with open("profile.csv") as f:
+                self.assertEqual(len(f.readlines()), 17)
+    def test_summary_step(self):
+
+        class StepValues(tflearn.callbacks.Callback):
+            def __init__(self):
+                self.values = []
+
+            def on_batch_end(self, training_state, snapshot=False):
+                self.values.append((training_state.loss_value,
+                                    training_state.acc_value))
+
+        with tf.Graph().as_default():
+            X = np.random.random((64, 4))
+            Y = tflearn.data_utils.to_categorical(
+                np.random.randint(2, size=64), 2)
+            input = tflearn.input_data(shape=[None, 4])
+            softmax = tflearn.fully_connected(input, 2, activation='softmax')
+            regression = tflearn.regression(softmax, batch_size=8)
+            logdir = tempfile.mkdtemp()
+            m = tflearn.DNN(regression, tensorboard_dir=logdir,
+                            summary_step=4)
+            values = StepValues()
+            m.fit(X, Y, n_epoch=2, show_metric=True, run_id='summ',
+                  callbacks=values)
+
+            # Loss and metric are retrieved at every step
+            self.assertEqual(len(values.values), 16)
+            self.assertTrue(all(l is not None and a is not None
+                                for l, a in values.values))
+            # Training summaries are only written every 4 steps
+            steps = []
+            for path in glob.glob(os.path.join(logdir, 'summ', 'events.*')):
+                for event in tf.train.summary_iterator(path):
+                    if event.HasField('summary') and event.summary.value:
+                        steps.append(event.step)
+            self.assertEqual(sorted(steps), [4, 8, 12, 16])
+
+    def test_async_validation(self):
+
+        class BatchCounter(tflearn.callbacks.Callback):
+            def __init__(self):
+                self.begin, self.end = 0, 0
+
+            def on_batch_begin(self, training_state):
+                self.begin += 1
+
+            def on_batch_end(self, training_state, snapshot=False):
+                self.end += 1
+
+        with tf.Graph().as_default():
+            X = np.random.random((64, 4))
+            Y = tflearn.data_utils.to_categorical(
+                np.random.randint(2, size=64), 2)
+            input = tflearn.input_data(shape=[None, 4])
+            softmax = tflearn.fully_connected(input, 2, activation='softmax')
+            regression = tflearn.regression(softmax, optimizer='sgd',
+                                            batch_size=8)
+            best_path = os.path.join(tempfile.mkdtemp(), 'best')
+            m = tflearn.DNN(regression, best_checkpoint_path=best_path)
+            counter = BatchCounter()
+            m.fit(X, Y, n_epoch=2, validation_set=(X, Y), show_metric=True,
+                  snapshot_step=3, async_validation=2, callbacks=counter)
+
+            # No step is reported once training is over
+            self.assertEqual(counter.begin, 16)
+            self.assertEqual(counter.end, 16)
+            # Last validation (at the end of training) is reported
+            val_acc = m.trainer.training_state.val_acc
+            self.assertAlmostEqual(val_acc, m.evaluate(X, Y)[0], places=5)
+            # Best checkpoints can't be saved from late results
+            self.assertEqual(glob.glob(best_path + '*'), [])
+
+
 if __name__ == "__main__":
     unittest.main()
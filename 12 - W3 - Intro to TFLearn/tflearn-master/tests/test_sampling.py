@@ -0,0 +1,43 @@
+'''
+    This file contains test cases for tflearn/sampling.py
+'''
+
+import numpy as np
+import unittest
+
+from tflearn.sampling import sample
+
+
+class TestSampling(unittest.TestCase):
+
+    def test_sample(self):
+        # float32 probabilities slightly summing over 1
+        p = np.array([[0.7, 0.2, 0.1, 0.0000002]] * 1000, dtype='float32')
+
+        idx = sample(p, random_state=0)
+        self.assertEqual(idx.shape, (1000,))
+        self.assertTrue(np.all(idx < 4))
+
+        # Greedy and per row temperature
+        self.assertEqual(sample(p[0], temperature=0.), 0)
+        np.testing.assert_array_equal(
+            sample(p[:3], temperature=[0., 1., 0.])[[0, 2]], [0, 0])
+
+        # Top-k and nucleus sampling
+        idx = sample(p, top_k=2, random_state=1)
+        self.assertEqual(set(idx), set([0, 1]))
+        idx = sample(p, top_p=0.5, random_state=2)
+        self.assertEqual(set(idx), set([0]))
+        # Disabled top-k
+        for top_k in [0, -1, 4, 10]:
+            np.testing.assert_array_equal(
+                sample(p, top_k=top_k, random_state=4),
+                sample(p, random_state=4))
+
+        # Logits
+        idx = sample(np.log(p), logits=True, top_k=1, random_state=3)
+        self.assertTrue(np.all(idx == 0))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,30 @@
+'''
+    This file contains test cases for tflearn/utils.py
+'''
+
+import numpy as np
+import unittest
+
+from tflearn.utils import read_rows, ChunkCache
+
+
+class TestUtils(unittest.TestCase):
+
+    def test_read_rows(self):
+        X = np.arange(500 * 3).reshape(500, 3)
+        ids = [7, 3, 4, 5, 499, 3, 120, 0, 250]
+        np.testing.assert_array_equal(read_rows(X, ids), X[ids])
+
+        out = np.zeros((len(ids), 3), dtype=X.dtype)
+        self.assertIs(read_rows(X, ids, out=out), out)
+        np.testing.assert_array_equal(out, X[ids])
+
+        cache = ChunkCache(X, max_chunks=2, chunk_rows=16)
+        np.testing.assert_array_equal(cache[ids], X[ids])
+        self.assertEqual(len(cache.chunks), 2)
+        np.testing.assert_array_equal(cache[10:20], X[10:20])
+        np.testing.assert_array_equal(cache[42], X[42])
+
+
+if __name__ == "__main__":
+    unittest.main()
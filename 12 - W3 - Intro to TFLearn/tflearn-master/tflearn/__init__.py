@@ -60,6 +60,7 @@ from . import datasets
 
 # Utils
 from . import data_utils
+from . import sampling
 from . import utils
 from .utils import get_layer_by_name
 
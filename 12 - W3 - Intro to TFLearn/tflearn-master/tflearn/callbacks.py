@@ -1,7 +1,19 @@
 from __future__ import division, print_function, absolute_import
 
+import csv
+import json
 import time
 import sys
+import threading
+from array import array
+
+import numpy as np
+try:
+    # Python 2
+    import Queue as queue
+except Exception:
+    # Python 3
+    import queue
 
 # Verify curses module for Windows and Notebooks Support
 try:
@@ -90,8 +102,36 @@ class ChainCallback(Callback):
         self.callbacks.append(callback)
 
 
+def _interactive_stdout():
+    """ Whether stdout is a terminal or a notebook (not a pipe or a file) """
+    try:
+        if sys.stdout.isatty():
+            return True
+    except Exception:
+        pass
+    ipython = sys.modules.get('IPython')
+    return ipython is not None and \
+        getattr(ipython, 'get_ipython', lambda: None)() is not None
+
+
 class TermLogger(Callback):
-    def __init__(self):
+    """ TermLogger.
+
+    Display training progress. Display is rate limited (at most
+    `refresh_rate` updates per second, snapshots are always displayed), and
+    logs are formatted and written by a background thread.
+
+    Arguments:
+        refresh_rate: `float`. Maximum number of updates per second. If 0,
+            display every step. Default: 10 for 'text' logs, 1 for 'json'.
+        log_format: `str`. 'text' (terminal display, default), 'json' (one
+            JSON object per update, for logs collection) or 'auto' ('text'
+            if stdout is a terminal or a notebook, 'json' otherwise).
+        background: `bool`. If True, logs are written by a background
+            thread (then all terminal writes are done by that thread).
+
+    """
+    def __init__(self, refresh_rate=None, log_format='text', background=True):
         self.data = []
         self.has_ipython = True
         self.display_type = "multi"
@@ -99,8 +139,22 @@ class TermLogger(Callback):
         self.global_val_data_size = 0
         self.snapped = False
 
+        if log_format == 'auto':
+            log_format = 'text' if _interactive_stdout() else 'json'
+        if log_format not in ['text', 'json']:
+            raise ValueError("Unknown log format: " + str(log_format))
+        self.log_format = log_format
+        if refresh_rate is None:
+            refresh_rate = 10. if log_format == 'text' else 1.
+        self.refresh_rate = refresh_rate
+        self.last_log = 0.
+        self.pending_log = False
+        self.background = background
+        self.log_queue = None
+        self.log_thread = None
+
         global CURSES_SUPPORTED
-        if CURSES_SUPPORTED:
+        if CURSES_SUPPORTED and log_format == 'text':
             try:
                 curses.setupterm()
                 sys.stdout.write(curses.tigetstr('civis').decode())
@@ -124,7 +178,8 @@ class TermLogger(Callback):
             'loss': None,
             'acc': None,
             'val_loss': None,
-            'val_acc': None
+            'val_acc': None,
+            'data_stats': None
         })
         self.global_data_size += data_size
         self.global_val_data_size += val_size
@@ -144,8 +199,12 @@ class TermLogger(Callback):
         training_state.step_time_total += time.time() - training_state.step_time
         if snapshot:
             self.snapshot_termlogs(training_state)
-        else:
+        elif not self.refresh_rate or \
+                time.time() - self.last_log >= 1. / self.refresh_rate:
             self.print_termlogs(training_state)
+        else:
+            # Displayed at next update (or at the end of training)
+            self.pending_log = True
 
     def on_sub_batch_start(self, training_state):
         pass
@@ -158,32 +217,56 @@ class TermLogger(Callback):
         self.data[train_index]['val_acc'] = training_state.val_acc
         self.data[train_index]['epoch'] = training_state.epoch
         self.data[train_index]['step'] = training_state.current_iter
+        self.data[train_index]['data_stats'] = training_state.data_stats
+        # Displayed at next update (or at the end of training)
+        self.pending_log = True
 
     def on_train_begin(self, training_state):
-        print("---------------------------------")
-        print("Training samples: " + str(self.global_data_size))
-        print("Validation samples: " + str(self.global_val_data_size))
-        print("--")
         if len(self.data) == 1:
             self.display_type = "single"
+        self.last_log = 0.
+        self.pending_log = False
+        if self.background:
+            self.log_queue = queue.Queue()
+            self.log_thread = threading.Thread(target=self.write_loop)
+            self.log_thread.daemon = True
+            self.log_thread.start()
+        if self.log_format == 'json':
+            self.output(json.dumps({
+                'training_samples': self.global_data_size,
+                'validation_samples': self.global_val_data_size}) + "\n")
+            return
+        self.output("---------------------------------\n"
+                    "Training samples: " + str(self.global_data_size) + "\n"
+                    "Validation samples: " + str(self.global_val_data_size) +
+                    "\n--\n")
 
     def on_train_end(self, training_state):
-        # Reset caret to last position
-        to_be_printed = ""
-        if CURSES_SUPPORTED: #if not self.has_ipython #TODO:check bug here
-            for i in range(len(self.data) + 2):
-                to_be_printed += "\033[B"
-            if not self.snapped:
-                to_be_printed += "--\n"
-        sys.stdout.write(to_be_printed)
-        sys.stdout.flush()
-
-        # Set caret visible if possible
-        if CURSES_SUPPORTED:
-            sys.stdout.write(curses.tigetstr('cvvis').decode())
-
-    def termlogs(self, step=0, global_loss=None, global_acc=None, step_time=None):
-
+        # Display last step
+        if self.pending_log:
+            self.print_termlogs(training_state)
+        if self.log_format == 'text':
+            # Reset caret to last position
+            to_be_printed = ""
+            if CURSES_SUPPORTED: #if not self.has_ipython #TODO:check bug here
+                for i in range(len(self.data) + 2):
+                    to_be_printed += "\033[B"
+                if not self.snapped:
+                    to_be_printed += "--\n"
+                # Set caret visible
+                to_be_printed += curses.tigetstr('cvvis').decode()
+            self.output(to_be_printed)
+        # Wait for all logs to be written
+        if self.log_thread is not None:
+            self.log_queue.put(None)
+            self.log_thread.join()
+            self.log_queue, self.log_thread = None, None
+
+    def termlogs(self, step=0, global_loss=None, global_acc=None,
+                 step_time=None, data=None):
+
+        if data is None:
+            data = self.data
         termlogs = "Training Step: " + str(step) + " "
         if global_loss:
             termlogs += " | total loss: \033[1m\033[32m" + \
@@ -193,11 +276,12 @@ class TermLogger(Callback):
         if step_time:
             termlogs += " | time: %.3fs" % step_time
         termlogs += "\n"
-        for i, data in enumerate(self.data):
+        for i, data in enumerate(data):
             print_loss = ""
             print_acc = ""
             print_val_loss = ""
             print_val_acc = ""
+            print_data = ""
             if data['loss'] is not None:
                 print_loss = " | loss: " + "%.5f" % data['loss']
             if data['acc'] is not None:
@@ -207,6 +291,13 @@ class TermLogger(Callback):
                 print_val_loss = " | val_loss: " + "%.5f" % data['val_loss']
             if data['val_acc'] is not None:
                 print_val_acc = " - val_acc: " + "%.4f" % data['val_acc']
+            if data['data_stats']:
+                # Step time breakdown: waiting for data vs. training
+                stats = data['data_stats']
+                print_data = " | step: %.1fms (data wait: %.1fms) - " \
+                             "workers: %d" % (
+                                 1000 * (stats['step'] + stats['wait']),
+                                 1000 * stats['wait'], stats['workers'])
             # fix diplay, if step reached the whole epoch, display epoch - 1, as epoch has been updated
             print_epoch = data['epoch']
             # Smoothing display, so we show display at step + 1 to show data_size/data_size at end
@@ -221,41 +312,83 @@ class TermLogger(Callback):
                              + "/" + str(data['data_size'])
             termlogs += "\x1b[2K\r| " + data['name'] + " | epoch: " + \
                         "%03d" % print_epoch + print_loss + print_acc + \
-                        print_val_loss + print_val_acc + print_step + "\n"
+                        print_val_loss + print_val_acc + print_data + \
+                        print_step + "\n"
 
         return termlogs
 
     def print_termlogs(self, training_state):
+        self.log(training_state, snapshot=False)
 
-        termlogs = self.termlogs(
-            step=training_state.step,
-            global_loss=training_state.global_loss,
-            global_acc=training_state.global_acc,
-            step_time=training_state.step_time_total)
+    def snapshot_termlogs(self, training_state):
+        self.log(training_state, snapshot=True)
+        self.snapped = True
 
-        if self.has_ipython and not CURSES_SUPPORTED:
+    def log(self, training_state, snapshot=False):
+        """ Log current training state (written by the logging thread, if
+        any, from a copy of it) """
+        self.last_log = time.time()
+        self.pending_log = False
+        record = (snapshot, training_state.step, training_state.global_loss,
+                  training_state.global_acc, training_state.step_time_total,
+                  [dict(d) for d in self.data])
+        if self.log_queue is not None:
+            self.log_queue.put(record)
+        else:
+            self.write_record(record)
+
+    def output(self, logs):
+        """ Write `logs` text (by the logging thread, if any, so that all
+        terminal writes are ordered) """
+        if self.log_queue is not None:
+            self.log_queue.put(logs)
+        elif logs:
+            self.write(logs)
+
+    def write_loop(self):
+        while True:
+            record = self.log_queue.get()
+            if record is None:
+                break
+            try:
+                if isinstance(record, tuple):
+                    self.write_record(record)
+                elif record:
+                    self.write(record)
+            except Exception as e:
+                print("TermLogger: " + str(e))
+
+    def write_record(self, record):
+        snapshot, step, global_loss, global_acc, step_time, data = record
+        if self.log_format == 'json':
+            self.write(json.dumps({
+                'step': step, 'snapshot': snapshot, 'time': step_time,
+                'total_loss': global_loss, 'avg_acc': global_acc,
+                'train_ops': [{
+                    'name': d['name'], 'epoch': d['epoch'],
+                    'iter': d['step'], 'data_size': d['data_size'],
+                    'loss': d['loss'], d['metric_name']: d['acc'],
+                    'val_loss': d['val_loss'], 'val_acc': d['val_acc'],
+                    'data_stats': d['data_stats']} for d in data]},
+                default=float) + "\n")
+            return
+
+        termlogs = self.termlogs(step=step, global_loss=global_loss,
+                                 global_acc=global_acc, step_time=step_time,
+                                 data=data)
+        if snapshot:
+            termlogs += "--\n"
+        elif self.has_ipython and not CURSES_SUPPORTED:
             clear_output(wait=True)
         else:
-            for i in range(len(self.data) + 1):
+            for i in range(len(data) + 1):
                 termlogs += "\033[A"
+        self.write(termlogs)
 
-        sys.stdout.write(termlogs)
+    def write(self, logs):
+        sys.stdout.write(logs)
         sys.stdout.flush()
 
-    def snapshot_termlogs(self, training_state):
-
-        termlogs = self.termlogs(
-            step=training_state.step,
-            global_loss=training_state.global_loss,
-            global_acc=training_state.global_acc,
-            step_time=training_state.step_time_total)
-
-        termlogs += "--\n"
-
-        sys.stdout.write(termlogs)
-        sys.stdout.flush()
-        self.snapped = True
-
 
 class ModelSaver(Callback):
     def __init__(self, save_func, snapshot_path, best_snapshot_path,
@@ -307,3 +440,245 @@ class ModelSaver(Callback):
         if self.best_snapshot_path:
             snapshot_path = self.best_snapshot_path + str(val_accuracy)
             self.save_func(snapshot_path)
+
+
+class Profiler(Callback):
+    """ Profiler.
+
+    Record the time spent in every phase of the training steps, to find out
+    whether training is input-bound (waiting for data) or compute-bound.
+    Phases are timed by every train op at each step:
+        - 'data': waiting for the next batch from the data flow.
+        - 'run': running the training op (`session.run`).
+        - 'parse': retrieving loss and metric values.
+        - 'validation': evaluating (or collecting) validation.
+        - 'write': writing summaries.
+    The whole step time (all train ops and callbacks) is recorded as 'step',
+    and the number of batches ready in the data flow queue before fetching
+    the next one as 'queue' (a queue that is always empty means training is
+    waiting for data).
+
+    Every `log_step` steps, percentiles, means and histograms of all phases
+    (over the last `log_step` steps) are written to TensorBoard, in the run
+    log directory (under 'Profiler/'). If `trace_path` is provided, timings
+    of every step are also written to that file (CSV if it ends with '.csv',
+    one JSON object per line otherwise). A summary is printed at the end of
+    training.
+
+    Timings are stored in memory (8 bytes per phase and step) to compute
+    percentiles over the whole training.
+
+    Examples:
+        ```python
+        profiler = tflearn.callbacks.Profiler(trace_path='trace.csv')
+        model.fit(X, Y, n_epoch=10, callbacks=profiler)
+        ```
+
+    Arguments:
+        trace_path: `str`. Trace file path. If None, no trace is written.
+        log_step: `int`. Write summaries to TensorBoard every `log_step`
+            steps. If None or 0, nothing is written to TensorBoard.
+        percentiles: `list` of `int`. Percentiles to report.
+        verbose: `bool`. If True, print a summary at the end of training.
+
+    Attributes:
+        timings: `dict`. For each train op name, a `dict` of
+            {phase: `array` of timings (in seconds)}.
+
+    """
+
+    phases = ['data', 'run', 'parse', 'validation', 'write']
+    columns = ['step', 'train_op'] + phases + ['step_time', 'queue']
+
+    def __init__(self, trace_path=None, log_step=100,
+                 percentiles=(50, 90, 99), verbose=True):
+        self.trace_path = trace_path
+        self.log_step = log_step
+        self.percentiles = list(percentiles)
+        self.verbose = verbose
+        self.timings = {}
+        self.names = []
+        self.trace = None
+        self.trace_writer = None
+        self.writer = None
+        self.pending = []
+        self.logged = 0
+        self.batch_start = None
+
+    def on_train_begin(self, training_state):
+        self.timings = {}
+        self.names = []
+        self.logged = 0
+        if self.log_step:
+            self.writer = getattr(training_state, 'summary_writer', None)
+        if self.trace_path:
+            self.trace = open(self.trace_path, 'w')
+            if self.trace_path.endswith('.csv'):
+                self.trace_writer = csv.writer(self.trace)
+                self.trace_writer.writerow(self.columns)
+            else:
+                self.trace_writer = None
+
+    def on_batch_begin(self, training_state):
+        self.pending = []
+        self.batch_start = time.time()
+
+    def on_sub_batch_end(self, training_state, train_index=0):
+        # Called again (without timings) when collecting final validations
+        if self.batch_start is None or not training_state.step_timings:
+            return
+        name = training_state.train_op_name
+        if not name:
+            name = "Train op. " + str(train_index)
+        self.pending.append((name, training_state.step_timings))
+
+    def on_batch_end(self, training_state, snapshot=False):
+        if self.batch_start is None:
+            return
+        step_time = time.time() - self.batch_start
+        self.batch_start = None
+        for name, step_timings in self.pending:
+            if name not in self.timings:
+                self.names.append(name)
+                self.timings[name] = dict(
+                    (k, array('d')) for k in self.columns[2:])
+            timings = self.timings[name]
+            for k in self.phases:
+                timings[k].append(step_timings.get(k, 0.))
+            timings['step_time'].append(step_time)
+            timings['queue'].append(step_timings.get('queue', 0))
+            if self.trace is not None:
+                self.write_trace(training_state.step, name, step_timings,
+                                 step_time)
+        self.pending = []
+
+        if self.log_step and training_state.step % self.log_step == 0:
+            self.write_summaries(training_state.step)
+
+    def on_train_end(self, training_state):
+        if self.trace is not None:
+            self.trace.close()
+            self.trace = None
+        if self.verbose and self.timings:
+            sys.stdout.write(self.report())
+            sys.stdout.flush()
+
+    def write_trace(self, step, name, step_timings, step_time):
+        row = [step, name] + [step_timings.get(k, 0.) for k in self.phases] \
+              + [step_time, step_timings.get('queue', 0)]
+        if self.trace_writer is not None:
+            self.trace_writer.writerow(row)
+        else:
+            self.trace.write(json.dumps(dict(zip(self.columns, row))) + "\n")
+
+    def stats(self, name, start=0):
+        """ stats.
+
+        Compute timings statistics of a train op.
+
+        Arguments:
+            name: `str`. The train op name.
+            start: `int`. Only consider steps from this index.
+
+        Returns:
+            A `dict` of {phase: `dict` of statistics ('mean', 'pX' for each
+            percentile X, and 'share' of the step time)}, with an extra
+            'other' phase for the rest of the step time (callbacks,
+            global step update...) when there is a single train op.
+
+        """
+        timings = self.timings[name]
+        step_time = np.array(timings['step_time'][start:])
+        total = max(np.sum(step_time), 1e-12)
+        stats = {}
+        other = step_time.copy()
+        for k in self.phases + ['step_time', 'queue']:
+            values = np.array(timings[k][start:])
+            if k in self.phases:
+                other -= values
+            stats[k] = self._describe(values, total)
+        if len(self.names) == 1:
+            stats['other'] = self._describe(np.maximum(other, 0.), total)
+        return stats
+
+    def _describe(self, values, total):
+        d = {'mean': float(np.mean(values)),
+             'share': float(np.sum(values) / total)}
+        for p, v in zip(self.percentiles,
+                        np.percentile(values, self.percentiles)):
+            d['p%d' % p] = float(v)
+        return d
+
+    def write_summaries(self, step):
+        if self.writer is None:
+            return
+        import tensorflow as tf
+        values = []
+        for name in self.names:
+            timings = self.timings[name]
+            start = self.logged
+            if start >= len(timings['step_time']):
+                continue
+            stats = self.stats(name, start)
+            for k, d in stats.items():
+                tag = "Profiler/%s/%s/" % (name, k)
+                values += [tf.Summary.Value(tag=tag + s, simple_value=v)
+                           for s, v in d.items()]
+                if k in timings:
+                    values.append(tf.Summary.Value(
+                        tag=tag + "histogram",
+                        histo=self._histogram(timings[k][start:])))
+            values.append(tf.Summary.Value(
+                tag="Profiler/%s/input_bound" % name,
+                simple_value=float(stats['data']['mean'] >
+                                   stats['run']['mean'])))
+        self.logged = len(self.timings[self.names[0]]['step_time']) \
+            if self.names else 0
+        if values:
+            self.writer.add_summary(tf.Summary(value=values), step)
+
+    @staticmethod
+    def _histogram(values):
+        import tensorflow as tf
+        values = np.array(values)
+        counts, edges = np.histogram(values, bins=30)
+        return tf.HistogramProto(min=float(values.min()),
+                                 max=float(values.max()),
+                                 num=len(values), sum=float(values.sum()),
+                                 sum_squares=float(np.dot(values, values)),
+                                 bucket_limit=edges[1:].tolist(),
+                                 bucket=counts.tolist())
+
+    def report(self):
+        """ report.
+
+        Returns a summary of timings of all train ops (in ms), and whether
+        training is input-bound (more time waiting for data than training)
+        or compute-bound.
+
+        """
+        percentiles = ['p%d' % p for p in self.percentiles]
+        report = "Profiler (ms)\n"
+        for name in self.names:
+            stats = self.stats(name)
+            n_steps = len(self.timings[name]['step_time'])
+            report += "| %s | %d steps | queue: %.1f batches\n" % (
+                name, n_steps, stats['queue']['mean'])
+            report += "%12s %9s" % ("phase", "mean") + \
+                      "".join("%9s" % p for p in percentiles) + \
+                      "%8s\n" % "share"
+            for k in self.phases + ['other', 'step_time']:
+                if k not in stats:
+                    continue
+                d = stats[k]
+                report += "%12s %9.2f" % (k, 1000 * d['mean']) + \
+                          "".join("%9.2f" % (1000 * d[p])
+                                  for p in percentiles) + \
+                          "%7.1f%%\n" % (100 * d['share'])
+            bound = "input" if stats['data']['mean'] > stats['run']['mean'] \
+                else "compute"
+            report += "| %s is %s-bound (waiting for data %.1f%% of the " \
+                      "step time)\n" % (name, bound,
+                                         100 * stats['data']['share'])
+        report += "--\n"
+        return report
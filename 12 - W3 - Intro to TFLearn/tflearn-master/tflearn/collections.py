@@ -42,3 +42,8 @@ tf.GraphKeys.DATA_AUG = 'data_augmentation'
 
 # Collection to store all custom learning rate variable
 tf.GraphKeys.LR_VARIABLES = 'lr_variables'
+
+# Collection to store RNN layers last step states (a dict per layer, with
+# 'dynamic', 'last_state' (the state fed to the last timestep) and
+# 'final_state' keys), used for stateful sequence generation.
+tf.GraphKeys.RNN_STATES = 'rnn_states'
@@ -1,7 +1,6 @@
 # -*- coding: utf-8 -*-
 from __future__ import division, print_function, absolute_import
 
-import random
 import numpy as np
 try:
     import scipy.ndimage
@@ -20,17 +19,34 @@ class DataAugmentation(object):
     but applies at both training time and testing time.
 
     Arguments:
-        None
+        seed: `int`. Optional seed of the random generator (`np.random.
+            Generator`) driving augmentation, for reproducible runs.
 
     Parameters:
         methods: `list of function`. The augmentation methods to apply.
         args: A `list` of arguments list to use for these methods.
+        rng: `np.random.Generator`. The random generator.
 
     """
 
-    def __init__(self):
+    def __init__(self, seed=None):
         self.methods = []
         self.args = []
+        self.rng = np.random.default_rng(seed)
+
+    def reseed(self, seed):
+        """ reseed.
+
+        Derive a new random generator from the current one and `seed` (for
+        example to get different random streams in every data flow worker
+        process).
+
+        Arguments:
+            seed: `int`. The seed.
+
+        """
+        self.rng = np.random.default_rng(
+            [seed, int(self.rng.integers(2**32))])
 
     def apply(self, batch):
         for i, m in enumerate(self.methods):
@@ -51,17 +67,22 @@ class ImageAugmentation(DataAugmentation):
     time only. Note that ImagePreprocessing is similar to ImageAugmentation,
     but applies at both training time and testing time.
 
+    Augmentation methods are applied to whole batches at once (batches are
+    converted to a single array of shape [batch, height, width(, channels)]).
+
     Arguments:
-        None.
+        seed: `int`. Optional seed of the random generator (`np.random.
+            Generator`) driving augmentation, for reproducible runs.
 
     Parameters:
         methods: `list of function`. The augmentation methods to apply.
         args: A `list` of arguments list to use for these methods.
+        rng: `np.random.Generator`. The random generator.
 
     """
 
-    def __init__(self):
-        super(ImageAugmentation, self).__init__()
+    def __init__(self, seed=None):
+        super(ImageAugmentation, self).__init__(seed)
 
     # ----------------------------
     #  Image Augmentation Methods
@@ -122,7 +143,8 @@ class ImageAugmentation(DataAugmentation):
     def add_random_90degrees_rotation(self, rotations=[0, 1, 2, 3]):
         """ add_random_90degrees_rotation
 
-        Randomly perform 90 degrees rotations.
+        Randomly perform 90 degrees rotations. Images must be square if 90
+        or 270 degrees rotations are allowed.
 
         Arguments:
             rotations: `list`. Allowed 90 degrees rotations.
@@ -173,57 +195,61 @@ class ImageAugmentation(DataAugmentation):
     # --------------------------
 
     def _random_crop(self, batch, crop_shape, padding=None):
-        oshape = np.shape(batch[0])
+        batch = np.asarray(batch)
         if padding:
-            oshape = (oshape[0] + 2*padding, oshape[1] + 2*padding)
-        new_batch = []
-        npad = ((padding, padding), (padding, padding), (0, 0))
-        for i in range(len(batch)):
-            new_batch.append(batch[i])
-            if padding:
-                new_batch[i] = np.lib.pad(batch[i], pad_width=npad,
-                                          mode='constant', constant_values=0)
-            nh = random.randint(0, oshape[0] - crop_shape[0])
-            nw = random.randint(0, oshape[1] - crop_shape[1])
-            new_batch[i] = new_batch[i][nh:nh + crop_shape[0],
-                                        nw:nw + crop_shape[1]]
-        return new_batch
+            # Pad the whole batch at once
+            npad = ((0, 0), (padding, padding), (padding, padding)) + \
+                ((0, 0),) * (batch.ndim - 3)
+            batch = np.pad(batch, pad_width=npad, mode='constant',
+                           constant_values=0)
+        n, height, width = batch.shape[:3]
+        nh = self.rng.integers(0, height - crop_shape[0] + 1, n)
+        nw = self.rng.integers(0, width - crop_shape[1] + 1, n)
+        # View of every crop window, then gather one window per image
+        strides = batch.strides
+        windows = np.lib.stride_tricks.as_strided(
+            batch, shape=(n, height - crop_shape[0] + 1,
+                          width - crop_shape[1] + 1) + tuple(crop_shape) +
+            batch.shape[3:],
+            strides=strides[:3] + strides[1:3] + strides[3:],
+            writeable=False)
+        return windows[np.arange(n), nh, nw]
 
     def _random_flip_leftright(self, batch):
-        for i in range(len(batch)):
-            if bool(random.getrandbits(1)):
-                batch[i] = np.fliplr(batch[i])
+        batch = np.asarray(batch)
+        flip = self.rng.random(len(batch)) < 0.5
+        batch[flip] = batch[flip, :, ::-1]
         return batch
 
     def _random_flip_updown(self, batch):
-        for i in range(len(batch)):
-            if bool(random.getrandbits(1)):
-                batch[i] = np.flipud(batch[i])
+        batch = np.asarray(batch)
+        flip = self.rng.random(len(batch)) < 0.5
+        batch[flip] = batch[flip, ::-1]
         return batch
 
     def _random_90degrees_rotation(self, batch, rotations=[0, 1, 2, 3]):
-        for i in range(len(batch)):
-            num_rotations = random.choice(rotations)
-            batch[i] = np.rot90(batch[i], num_rotations)
-
+        batch = np.asarray(batch)
+        num_rotations = self.rng.choice(rotations, len(batch))
+        for k in np.unique(num_rotations):
+            if k % 4:
+                rotate = num_rotations == k
+                batch[rotate] = np.rot90(batch[rotate], k, axes=(1, 2))
         return batch
 
     def _random_rotation(self, batch, max_angle):
-        for i in range(len(batch)):
-            if bool(random.getrandbits(1)):
-                # Random angle
-                angle = random.uniform(-max_angle, max_angle)
-                batch[i] = scipy.ndimage.interpolation.rotate(batch[i], angle,
-                                                              reshape=False)
+        batch = np.asarray(batch)
+        angles = self.rng.uniform(-max_angle, max_angle, len(batch))
+        for i in np.flatnonzero(self.rng.random(len(batch)) < 0.5):
+            batch[i] = scipy.ndimage.interpolation.rotate(batch[i], angles[i],
+                                                          reshape=False)
         return batch
 
     def _random_blur(self, batch, sigma_max):
-        for i in range(len(batch)):
-            if bool(random.getrandbits(1)):
-                # Random sigma
-                sigma = random.uniform(0., sigma_max)
-                batch[i] = \
-                    scipy.ndimage.filters.gaussian_filter(batch[i], sigma)
+        batch = np.asarray(batch)
+        sigmas = self.rng.uniform(0., sigma_max, len(batch))
+        for i in np.flatnonzero(self.rng.random(len(batch)) < 0.5):
+            batch[i] = \
+                scipy.ndimage.filters.gaussian_filter(batch[i], sigmas[i])
         return batch
 
 
@@ -1,17 +1,29 @@
 # -*- coding: utf-8 -*-
 from __future__ import division, print_function, absolute_import
 
+import os
+import json
 import numpy as np
+import random
+import time
 import threading
+import multiprocessing
 try:
     # Python 2
     import Queue as queue
 except Exception:
     # Python 3
     import queue
+try:
+    # Python 3.8+
+    from multiprocessing import shared_memory
+    SHARED_MEMORY_SUPPORTED = True
+except Exception:
+    SHARED_MEMORY_SUPPORTED = False
 
 import tensorflow as tf
 from . import utils
+from .data_preprocessing import DataPreprocessing
 
 
 class DataFlow(object):
@@ -35,12 +47,16 @@ class DataFlow(object):
         daug_dict: dict. Optional data augmentation parameter for performing
             real time data augmentation. Keys must be placeholders and values
             `DataAugmentation` subclass object.
+        use_processes: `bool`. If True, batches are built (retrieved,
+            augmented and pre-processed) by `num_threads` worker processes
+            instead of threads, avoiding the GIL for heavy python data
+            processing.
 
     """
 
     def __init__(self, coord, num_threads=8, max_queue=32, shuffle=False,
                  continuous=False, ensure_data_order=False,
-                 dprep_dict=None, daug_dict=None):
+                 dprep_dict=None, daug_dict=None, use_processes=False):
         self.coord = coord
         self.num_threads = num_threads
         self.max_queue = max_queue
@@ -51,8 +67,21 @@ class DataFlow(object):
             self.max_queue = 1
         self.dprep_dict = dprep_dict
         self.daug_dict = daug_dict
+        self.use_processes = use_processes
         self.interrupted = False
 
+    def release(self, feed_batch):
+        """ release.
+
+        Hand back a batch retrieved with `next`, once it has been consumed
+        (only needed for data flows reusing batch buffers).
+
+        Arguments:
+            feed_batch: `dict`. The batch to release.
+
+        """
+        pass
+
 
 class FeedDictFlow(DataFlow):
 
@@ -63,13 +92,42 @@ class FeedDictFlow(DataFlow):
     processing. If continuous is `True`, data flow will never ends until `stop`
     is invoked, or `coord` interrupt threads.
 
+    If `use_processes` is True, batch ids are sent to worker processes
+    (forked, so they share the dataset with the main process) that build
+    the batches and return them through shared memory. Batches are then
+    re-ordered, so batch order is the same as with a single thread.
+
+    If `reuse_buffers` is True, batches are written into a fixed pool of
+    `max_queue` preallocated buffers instead of new arrays. Every batch
+    retrieved with `next` must then be handed back with `release` once
+    consumed, otherwise the data flow will stall when the pool is empty.
+
+    If `shuffle` is 'block', samples are shuffled by blocks of `block_size`
+    consecutive samples: blocks order is shuffled, then samples are shuffled
+    within windows of `shuffle_window` blocks. Every batch then only reads a
+    few contiguous regions of data, which is much faster for chunked HDF5
+    datasets and memory-mapped arrays than a full shuffle. HDF5 datasets are
+    then read through a `ChunkCache` holding `shuffle_window + 1` blocks.
+
+    Time spent by the consumer waiting for batches, between batches (i.e.
+    training step) and by workers to build a batch is recorded, and
+    averaged every `stats_interval` batches into `data_stats`. If
+    `num_threads` is 'auto', the number of workers is adapted at runtime
+    from these times (between 1 and `max_threads`): a worker is added when
+    the consumer waits for batches, and one is removed when fewer workers
+    would still keep up with it. Note that with several thread workers,
+    batches may be fed slightly out of order.
+
     Arguments:
         feed_dict: `dict`. A TensorFlow formatted feed dict (with placeholders
             as keys and data as values).
         coord: `Coordinator`. A Tensorflow coordinator.
-        num_threads: `int`. Total number of simultaneous threads to process data.
+        num_threads: `int` or 'auto'. Total number of simultaneous threads
+            (or processes) to process data. If 'auto', it is adapted at
+            runtime (see above).
         max_queue: `int`. Maximum number of data stored in a queue.
-        shuffle: `bool`. If True, data will be shuffle.
+        shuffle: `bool` or `str`. If True, data will be shuffle. If 'block',
+            data will be shuffled by blocks (see above).
         continuous: `bool`. If True, when an epoch is over, same data will be
             feeded again.
         ensure_data_order: `bool`. Ensure that data order is keeped when using
@@ -82,26 +140,84 @@ class FeedDictFlow(DataFlow):
             `DataAugmentation` subclass object.
         index_array: `list`. An optional list of index to be used instead of
             using the whole dataset indexes (Useful for validation split).
+        use_processes: `bool`. If True, use `num_threads` worker processes
+            instead of threads to build batches. Data augmentation and
+            pre-processing objects are copied in every worker, so they must
+            be initialized before the data flow is started.
+        reuse_buffers: `bool`. If True, use a pool of `max_queue` reusable
+            batch buffers (shaped from the feed dict placeholders) instead
+            of allocating new arrays for every batch.
+        block_size: `int`. Number of consecutive samples per block, when
+            `shuffle` is 'block'. Default: the HDF5 dataset chunk size if any,
+            `batch_size` otherwise.
+        shuffle_window: `int`. Number of blocks whose samples are shuffled
+            together, when `shuffle` is 'block'. The higher, the more random
+            are batches, but the more data regions every batch reads.
+        max_threads: `int`. Maximum number of workers if `num_threads` is
+            'auto'. Default: the number of CPUs.
+        stats_interval: `int`. Number of batches over which times are
+            averaged (and workers adapted).
+
+    Attributes:
+        data_stats: `dict`. Times averaged over the last `stats_interval`
+            batches (None before): 'wait' (consumer wait per batch), 'step'
+            (consumer time between batches), 'produce' (time to build a
+            batch), in seconds, and 'workers' (number of workers).
 
     """
 
     def __init__(self, feed_dict, coord, batch_size=128, num_threads=8,
                  max_queue=32, shuffle=False, continuous=False,
                  ensure_data_order=False, dprep_dict=None, daug_dict=None,
-                 index_array=None):
+                 index_array=None, use_processes=False, reuse_buffers=False,
+                 block_size=None, shuffle_window=8, max_threads=None,
+                 stats_interval=20):
+        adaptive = num_threads == 'auto' and not ensure_data_order
+        if num_threads == 'auto':
+            num_threads = 1
         super(FeedDictFlow, self).__init__(coord, num_threads, max_queue,
                                            shuffle, continuous,
                                            ensure_data_order,
                                            dprep_dict,
-                                           daug_dict)
+                                           daug_dict,
+                                           use_processes)
+        self.adaptive = adaptive
+        self.max_threads = max_threads or multiprocessing.cpu_count()
+        self.stats = DataFlowStats()
+        self.stats_interval = stats_interval
+        self.data_stats = None
+        # Number of worker threads asked to stop
+        self.n_retiring = 0
+        self.stopping = False
+        self.workers_lock = threading.RLock()
         self.feed_dict = feed_dict
         self.batch_size = batch_size
         self.n_samples = len(utils.get_dict_first_element(feed_dict))
 
-        # Queue holding batch ids
-        self.batch_ids_queue = queue.Queue(self.max_queue)
+        if self.use_processes:
+            # Workers are forked, so they inherit the dataset without copy
+            self.mp_context = get_mp_context()
+            # Queue holding (batch number, batch ids)
+            self.batch_ids_queue = self.mp_context.Queue(self.max_queue)
+            # Queue holding (batch number, shared batch) built by workers
+            self.results_queue = self.mp_context.Queue(self.max_queue)
+            # Workers can't send placeholders, so data keys are indexed
+            self.feed_keys = list(feed_dict.keys())
+            self.processes = []
+            # Number of active workers (others are idle, waiting on
+            # `active_cond` to be notified of a change)
+            self.n_active = self.mp_context.Value('i', 0)
+            self.active_cond = self.mp_context.Condition()
+        else:
+            # Queue holding batch ids
+            self.batch_ids_queue = queue.Queue(self.max_queue)
         # Queue holding data ready feed dicts
         self.feed_dict_queue = queue.Queue(self.max_queue)
+        # Pool of reusable batch buffers
+        self.buffer_pool = None
+        if reuse_buffers:
+            self.buffer_pool = BatchBufferPool(self.max_queue,
+                                               self.batch_size)
 
         # Create samples index array
         self.index_array = np.arange(self.n_samples)
@@ -109,6 +225,23 @@ class FeedDictFlow(DataFlow):
             self.index_array = index_array
             self.n_samples = len(index_array)
 
+        # Block shuffling
+        if shuffle not in [True, False, None, 'block']:
+            raise ValueError("Unknown shuffle mode: " + str(shuffle))
+        if block_size is None:
+            chunks = getattr(utils.get_dict_first_element(feed_dict),
+                             'chunks', None)
+            block_size = chunks[0] if chunks else batch_size
+        self.block_size = block_size
+        self.shuffle_window = shuffle_window
+        if shuffle == 'block':
+            # Keep the blocks of the current window in memory
+            self.feed_dict = dict(feed_dict)
+            for k in feed_dict:
+                if utils.is_hdf5_dataset(feed_dict[k]):
+                    self.feed_dict[k] = utils.ChunkCache(
+                        feed_dict[k], shuffle_window + 1, block_size)
+
         # Create batches
         self.batches = self.make_batches()
         self.reset_batches()
@@ -126,7 +259,29 @@ class FeedDictFlow(DataFlow):
 
         """
         self.data_status.update()
-        return self.feed_dict_queue.get(timeout=timeout)
+        request_time = time.time()
+        feed_batch = self.feed_dict_queue.get(timeout=timeout)
+        self.stats.consumed(request_time, time.time() - request_time)
+        if self.stats.n_consumed >= self.stats_interval:
+            self.data_stats = self.stats.summary()
+            self.data_stats['workers'] = self.num_threads
+            self.stats.reset()
+            if self.adaptive:
+                self.adapt_workers()
+        return feed_batch
+
+    def release(self, feed_batch):
+        """ release.
+
+        Hand back a batch retrieved with `next`, so its buffer can be
+        reused (no effect if `reuse_buffers` is False).
+
+        Arguments:
+            feed_batch: `dict`. The batch to release.
+
+        """
+        if self.buffer_pool and feed_batch:
+            self.buffer_pool.release(feed_batch)
 
     def start(self, reset_status=True):
         """ start.
@@ -140,27 +295,186 @@ class FeedDictFlow(DataFlow):
         # Start to process data and fill queues
         self.clear_queues()
         self.interrupted = False
+        if self.buffer_pool:
+            # Batches left in queues are dropped, so all buffers are free
+            self.buffer_pool.reset()
         # Reset Data Status
         if reset_status:
             self.data_status.reset()
+        self.batch_count = 0
+        self.n_retiring = 0
+        self.stopping = False
+        self.stats.reset()
+        self.stats.last_batch_time = None
         # Only a single thread needed for batches ids
         bi_threads = [threading.Thread(target=self.fill_batch_ids_queue)]
-        # Multiple threads available for feed batch pre-processing
-        fd_threads = [threading.Thread(target=self.fill_feed_dict_queue)
-                      for i in range(self.num_threads)]
+        if self.use_processes:
+            self.start_processes()
+            # A single thread collects workers results, in order
+            fd_threads = [threading.Thread(target=self.collect_results)]
+        else:
+            # Multiple threads available for feed batch pre-processing
+            fd_threads = [threading.Thread(target=self.fill_feed_dict_queue)
+                          for i in range(self.num_threads)]
         self.threads = bi_threads + fd_threads
         for t in self.threads:
             t.daemon = True
             t.start()
 
+    def start_processes(self):
+        """ start_processes.
+
+        Start `num_threads` worker processes, building batches.
+
+        """
+        self.terminate_processes()
+        # Terminated workers may have left queues in an unsafe state
+        self.batch_ids_queue = self.mp_context.Queue(self.max_queue)
+        self.results_queue = self.mp_context.Queue(self.max_queue)
+        if SHARED_MEMORY_SUPPORTED:
+            # Workers and main process must share the same resource tracker,
+            # so shared memory created by a worker can be released by main.
+            try:
+                from multiprocessing import resource_tracker
+                resource_tracker.ensure_running()
+            except Exception:
+                pass
+        # Forking while threads run is unsafe, so when adapting workers,
+        # `max_threads` workers are all started now, and only the first
+        # `n_active` ones are building batches (others are idle).
+        n_processes = self.num_threads
+        if self.adaptive:
+            n_processes = max(self.max_threads, self.num_threads)
+        self.set_active_workers(self.num_threads)
+        # Forked workers inherit the same random state, so each one is
+        # given its own seed (drawn from main process random state).
+        seeds = np.random.randint(0, 2**31 - 1, size=n_processes)
+        self.processes = [
+            self.mp_context.Process(target=self.fill_results_queue,
+                                    args=(int(seeds[i]), i))
+            for i in range(n_processes)]
+        for p in self.processes:
+            p.daemon = True
+            p.start()
+
+    def stop_processes(self, timeout=5.):
+        """ stop_processes.
+
+        Ask worker processes to stop, releasing batches they already
+        shared, and terminate the ones still running after `timeout`.
+
+        """
+        clear_mp_queue(self.batch_ids_queue)
+        # Idle workers must stop too
+        self.set_active_workers(len(self.processes))
+        for p in self.processes:
+            self.batch_ids_queue.put(False)
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            try:
+                res = self.results_queue.get(timeout=0.1)
+            except queue.Empty:
+                if not any(p.is_alive() for p in self.processes):
+                    break
+                continue
+            if res is not False:
+                [from_shared_array(s) for s in res[1]]
+        self.terminate_processes()
+
+    def terminate_processes(self):
+        """ terminate_processes.
+
+        Terminate all worker processes (if any).
+
+        """
+        for p in getattr(self, 'processes', []):
+            if p.is_alive():
+                p.terminate()
+            p.join()
+        self.processes = []
+
+    def adapt_workers(self):
+        """ adapt_workers.
+
+        Add a worker if the consumer waited for batches, or remove one if
+        fewer workers would still keep up with the consumer (according to
+        the last `data_stats`).
+
+        """
+        stats = self.data_stats
+        if stats['wait'] > 0.05 * (stats['wait'] + stats['step']):
+            if self.num_threads < self.max_threads:
+                self.add_worker()
+        elif self.num_threads > 1 and stats['wait'] < 0.01 * stats['step'] \
+                and stats['produce'] < 0.8 * (self.num_threads - 1) * \
+                stats['step']:
+            self.remove_worker()
+
+    def add_worker(self):
+        """ add_worker.
+
+        Start one more worker thread (or process).
+
+        """
+        with self.workers_lock:
+            # Workers are fixed once stopping
+            if self.stopping:
+                return
+            self.num_threads += 1
+            if self.use_processes:
+                self.set_active_workers(self.num_threads)
+            else:
+                t = threading.Thread(target=self.fill_feed_dict_queue)
+                t.daemon = True
+                self.threads.append(t)
+                t.start()
+
+    def remove_worker(self):
+        """ remove_worker.
+
+        Stop a worker thread (or make a process idle), once done with its
+        current batch.
+
+        """
+        with self.workers_lock:
+            if self.stopping:
+                return
+            self.num_threads -= 1
+            if self.use_processes:
+                self.set_active_workers(self.num_threads)
+            else:
+                self.n_retiring += 1
+
+    def set_active_workers(self, n_active):
+        """ Set the number of active worker processes, and wake up idle
+        ones. """
+        with self.active_cond:
+            self.n_active.value = n_active
+            self.active_cond.notify_all()
+
+    def retire_worker(self):
+        """ Returns True if the calling worker thread must stop. """
+        with self.workers_lock:
+            if self.n_retiring > 0:
+                self.n_retiring -= 1
+                return True
+        return False
+
     def stop(self):
         """ stop.
 
         Stop the queue from creating more feed_dict.
 
         """
+        with self.workers_lock:
+            self.stopping = True
+            n_workers = self.num_threads
+            if self.use_processes:
+                # Idle workers must stop too
+                n_workers = len(self.processes)
+                self.set_active_workers(n_workers)
         # Send stop signal to processing queue
-        for i in range(self.num_threads):
+        for i in range(n_workers):
             self.batch_ids_queue.put(False)
         # Launch a Thread to wait for processing scripts to finish
         t = threading.Thread(target=self.wait_for_threads)
@@ -177,30 +491,133 @@ class FeedDictFlow(DataFlow):
     def interrupt(self):
         # Send interruption signal to processing queue
         self.interrupted = True
+        if self.use_processes:
+            self.stop_processes()
         self.clear_queues()
 
     def fill_feed_dict_queue(self):
         while not self.coord.should_stop() and not self.interrupted:
+            if self.adaptive and self.retire_worker():
+                break
             batch_ids = self.batch_ids_queue.get()
             if batch_ids is False:
                 break
-            data = self.retrieve_data(batch_ids)
-            # Apply augmentation according to daug dict
-            if self.daug_dict:
-                for k in self.daug_dict:
-                    data[k] = self.daug_dict[k].apply(data[k])
-            # Apply preprocessing according to dprep dict
-            if self.dprep_dict:
-                for k in self.dprep_dict:
-                    data[k] = self.dprep_dict[k].apply(data[k])
+            if self.buffer_pool:
+                buffer_id = self.buffer_pool.acquire(self.is_running)
+                if buffer_id is None:
+                    break
+                buffers = self.buffer_pool.buffers[buffer_id]
+                start = time.time()
+                data = self.process_batch(batch_ids, buffers)
+                data = self.buffer_pool.fill(buffer_id, data)
+            else:
+                start = time.time()
+                data = self.process_batch(batch_ids)
+            self.stats.produced(time.time() - start)
             #all prepped, put the data into the queue
             self.feed_dict_queue.put(data)
 
+    def is_running(self):
+        return not self.coord.should_stop() and not self.interrupted
+
+    def process_batch(self, batch_ids, buffers=None):
+        """ process_batch.
+
+        Retrieve a batch of data, and apply data augmentation and
+        pre-processing.
+
+        Arguments:
+            batch_ids: `array`. The batch samples ids.
+            buffers: `dict`. Optional buffers to retrieve data into.
+
+        Returns:
+            A `dict` with placeholders as keys and batch data as values.
+
+        """
+        data = self.retrieve_data(batch_ids, buffers)
+        # Apply augmentation according to daug dict
+        if self.daug_dict:
+            for k in self.daug_dict:
+                data[k] = self.daug_dict[k].apply(data[k])
+        # Apply preprocessing according to dprep dict
+        if self.dprep_dict:
+            for k in self.dprep_dict:
+                data[k] = preprocess(self.dprep_dict[k], data[k])
+        return data
+
+    def fill_results_queue(self, seed=None, index=0):
+        """ Worker process loop: build batches and share them. """
+        if seed is not None:
+            random.seed(seed)
+            np.random.seed(seed)
+            if self.daug_dict:
+                for k in self.daug_dict:
+                    self.daug_dict[k].reseed(seed)
+        while True:
+            # Wait while idle
+            with self.active_cond:
+                while index >= self.n_active.value:
+                    self.active_cond.wait()
+            batch = self.batch_ids_queue.get()
+            if batch is False:
+                break
+            batch_count, batch_ids = batch
+            start = time.time()
+            data = self.process_batch(batch_ids)
+            shared = [to_shared_array(data[k]) for k in self.feed_keys]
+            self.results_queue.put((batch_count, shared,
+                                    time.time() - start))
+        # Notify main process that this worker is done
+        self.results_queue.put(False)
+
+    def collect_results(self):
+        """ Collect workers results, and feed them in order. """
+        next_count = 0
+        pending = {}
+        running = len(self.processes)
+        while running > 0 and not self.coord.should_stop() \
+                and not self.interrupted:
+            try:
+                res = self.results_queue.get(timeout=1.)
+            except queue.Empty:
+                if not any(p.is_alive() for p in self.processes):
+                    break
+                continue
+            if res is False:
+                running -= 1
+                continue
+            batch_count, shared, produce_time = res
+            self.stats.produced(produce_time)
+            pending[batch_count] = shared
+            # Workers may finish out of order, so only release batches
+            # following the last one released.
+            while next_count in pending:
+                buffers, buffer_id = {}, None
+                if self.buffer_pool:
+                    buffer_id = self.buffer_pool.acquire(self.is_running)
+                    if buffer_id is None:
+                        break
+                    buffers = self.buffer_pool.buffers[buffer_id]
+                shared = pending.pop(next_count)
+                data = {}
+                for k, s in zip(self.feed_keys, shared):
+                    data[k] = from_shared_array(s, buffers.get(k))
+                if buffer_id is not None:
+                    data = self.buffer_pool.fill(buffer_id, data)
+                self.feed_dict_queue.put(data)
+                next_count += 1
+        # Release shared memory of batches that will never be fed
+        for shared in pending.values():
+            [from_shared_array(s) for s in shared]
+
     def fill_batch_ids_queue(self):
         while not self.coord.should_stop() and not self.interrupted:
             ids = self.next_batch_ids()
             if ids is False:
                 break
+            if self.use_processes:
+                ids = (self.batch_count, ids)
+            self.batch_count += 1
             self.batch_ids_queue.put(ids)
 
     def next_batch_ids(self):
@@ -215,9 +632,16 @@ class FeedDictFlow(DataFlow):
         batch_start, batch_end = self.batches[self.batch_index]
         return self.index_array[batch_start:batch_end]
 
-    def retrieve_data(self, batch_ids):
+    def retrieve_data(self, batch_ids, buffers=None):
         feed_batch = {}
         for key in self.feed_dict:
+            buf = buffers.get(key) if buffers else None
+            if buf is not None:
+                # Gather samples directly into the batch buffer
+                feed_batch[key] = take_into(self.feed_dict[key], batch_ids,
+                                            buf)
+                if feed_batch[key] is not None:
+                    continue
             feed_batch[key] = \
                     utils.slice_array(self.feed_dict[key], batch_ids)
         return feed_batch
@@ -233,11 +657,19 @@ class FeedDictFlow(DataFlow):
         return utils.make_batches(self.n_samples, self.batch_size)
 
     def shuffle_samples(self):
-        np.random.shuffle(self.index_array)
+        if self.shuffle == 'block':
+            self.index_array = block_shuffle(self.index_array,
+                                             self.block_size,
+                                             self.shuffle_window)
+        else:
+            np.random.shuffle(self.index_array)
 
     def wait_for_threads(self):
         # Wait for threads to finish computation (max 120s)
         self.coord.join(self.threads)
+        if self.use_processes:
+            for p in self.processes:
+                p.join()
         # Send end signal to indicate no more data in feed queue
         self.feed_dict_queue.put(False)
 
@@ -249,15 +681,757 @@ class FeedDictFlow(DataFlow):
         """
         while not self.feed_dict_queue.empty():
             self.feed_dict_queue.get()
-        while not self.batch_ids_queue.empty():
-            self.batch_ids_queue.get()
+        if self.use_processes:
+            clear_mp_queue(self.batch_ids_queue)
+            # Release shared memory of batches never collected
+            for res in clear_mp_queue(self.results_queue):
+                if res is not False:
+                    [from_shared_array(s) for s in res[1]]
+        else:
+            while not self.batch_ids_queue.empty():
+                self.batch_ids_queue.get()
+
+
+class ValidationFlow(FeedDictFlow):
+
+    """ ValidationFlow.
+
+    A `FeedDictFlow` meant to go over the same data many times, such as
+    validation data (evaluated at every snapshot). Worker threads are only
+    started once, and stay idle between passes: every `start` begins a new
+    pass over all batches, and `next` returns False once all of them have
+    been fed (batches may be fed out of order if `num_threads` > 1).
+
+    Data is not shuffled nor augmented, so batches (pre-processing
+    included) are the same for every pass. If all of them fit in
+    `cache_size` bytes, they are cached in memory during the first pass,
+    and next passes feed them directly (no data is retrieved nor
+    pre-processed anymore). Batch ids and built batches queues both hold at
+    most `max_queue` items.
+
+    Arguments:
+        feed_dict: `dict`. A TensorFlow formatted feed dict (with placeholders
+            as keys and data as values).
+        coord: `Coordinator`. A Tensorflow coordinator.
+        batch_size: `int`. The batch size.
+        num_threads: `int`. Total number of simultaneous threads to process
+            data.
+        max_queue: `int`. Maximum number of batches built in advance.
+        dprep_dict: dict. Optional data pre-processing parameter for performing
+            real time data pre-processing. Keys must be placeholders and values
+            `DataPreprocessing` subclass object.
+        index_array: `list`. An optional list of index to be used instead of
+            using the whole dataset indexes (Useful for validation split).
+        cache_size: `int`. Maximum size (in bytes) of cached batches. If all
+            batches don't fit, none is cached. Default: 512MB (0 to disable).
+        cache: `BatchCache`. Optional cache, to share cached batches between
+            several flows over the same data (and batch size), even running
+            concurrently. If provided, its own maximum size is used.
+
+    """
+
+    def __init__(self, feed_dict, coord, batch_size=128, num_threads=1,
+                 max_queue=32, dprep_dict=None, index_array=None,
+                 cache_size=512 * 2**20, cache=None):
+        super(ValidationFlow, self).__init__(feed_dict, coord,
+                                             batch_size=batch_size,
+                                             num_threads=num_threads,
+                                             max_queue=max_queue,
+                                             dprep_dict=dprep_dict,
+                                             index_array=index_array)
+        # Queues hold (pass id, batch number, batch ids or data)
+        self.cache = cache if cache is not None else BatchCache(cache_size)
+        # Whether batches fit in cache (None until the first batch is built)
+        self.caching = None if self.cache.max_size > 0 else False
+        self.pass_id = 0
+        self.n_fed = 0
+        # Cached batches fed by the current pass (if all are cached)
+        self.cached = None
+        self.threads = []
+        self.thread_stop = threading.Event()
+
+    def start(self, reset_status=True):
+        """ start.
+
+        Start a new pass over data (starting worker threads if needed).
+
+        Arguments:
+            reset_status: `bool`. If True, `DataStatus` will be reset.
+
+        """
+        self.interrupted = False
+        self.pass_id += 1
+        self.n_fed = 0
+        if reset_status:
+            self.data_status.reset()
+        # Drop batches of an unfinished previous pass
+        self.clear_queues()
+        self.cached = None
+        if self.caching is not False:
+            self.cached = self.cache.batches(len(self.batches))
+        if self.cached is not None:
+            return
+        if not any(t.is_alive() for t in self.threads):
+            self.thread_stop = threading.Event()
+            self.threads = [threading.Thread(target=self.fill_feed_dict_queue,
+                                             args=(self.thread_stop,))
+                            for i in range(self.num_threads)]
+            for t in self.threads:
+                t.daemon = True
+                t.start()
+        # Batch ids of this pass are queued as workers consume them
+        t = threading.Thread(target=self.fill_batch_ids_queue,
+                             args=(self.pass_id, self.thread_stop))
+        t.daemon = True
+        t.start()
+
+    def next(self, timeout=None):
+        """ next.
+
+        Get the next feed dict of the current pass.
+
+        Returns:
+            A TensorFlow feed dict, or 'False' if the pass is over.
+
+        """
+        if self.n_fed == len(self.batches):
+            return False
+        self.data_status.update()
+        if self.cached is not None:
+            data = self.cached[self.n_fed]
+        else:
+            pass_id = None
+            while pass_id != self.pass_id:
+                pass_id, i, data = self.feed_dict_queue.get(timeout=timeout)
+            if self.caching is not False:
+                self.cache_batch(i, data)
+        self.n_fed += 1
+        return data
+
+    def cache_batch(self, i, data):
+        """ Cache batch `i`, unless all batches don't fit in the cache. """
+        if self.caching is None:
+            # Estimated from the first batch
+            self.caching = batch_nbytes(data) * len(self.batches) <= \
+                self.cache.max_size
+        if self.caching:
+            self.caching = self.cache.add(i, data)
+
+    def fill_batch_ids_queue(self, pass_id, stop_event):
+        for i, (batch_start, batch_end) in enumerate(self.batches):
+            batch_ids = self.index_array[batch_start:batch_end]
+            if not self.put(self.batch_ids_queue, (pass_id, i, batch_ids),
+                            pass_id, stop_event):
+                break
+
+    def fill_feed_dict_queue(self, stop_event):
+        while not self.coord.should_stop() and not stop_event.is_set():
+            try:
+                pass_id, i, batch_ids = self.batch_ids_queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            # Skip batches of a previous pass
+            if pass_id != self.pass_id:
+                continue
+            data = self.process_batch(batch_ids)
+            self.put(self.feed_dict_queue, (pass_id, i, data), pass_id,
+                     stop_event)
+
+    def put(self, q, item, pass_id, stop_event):
+        """ Put `item` in queue `q`, unless workers are stopped, the flow
+        interrupted, or pass `pass_id` over. Returns True if done. """
+        while not stop_event.is_set() and self.is_running() and \
+                pass_id == self.pass_id:
+            try:
+                q.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def stop(self):
+        """ stop.
+
+        Stop worker threads.
+
+        """
+        self.thread_stop.set()
+        self.threads = []
+
+    def interrupt(self):
+        self.interrupted = True
+        self.stop()
+        self.clear_queues()
 
 
 class TFRecordsFlow(DataFlow):
+    """ TFRecordsFlow.
+
+    Stream batches from a sharded TFRecords dataset (as built by
+    `data_utils.build_tfrecords_dataset` or `data_utils.hdf5_to_tfrecords`),
+    so datasets larger than memory can be used for training. Records are
+    read and decoded by `num_threads` parallel TensorFlow readers into a
+    (shuffling, if `shuffle` is True) queue, and a data flow thread
+    prefetches batches out of it, applying data augmentation and
+    pre-processing.
+
+    A `TFRecordsFlow` can directly be provided to `DNN.fit` as training data
+    (inputs and targets are both read from records). Dataset inputs and
+    targets are matched with the model inputs and targets by creation
+    order (the same way arrays are).
+
+    Note that records are streamed, so an epoch is defined as `n_samples`
+    samples, whatever the records they are from. With multiple readers or
+    shuffling, an epoch may not contain every sample exactly once (use
+    `ensure_data_order` for exact evaluation).
+
+    Examples:
+        ```python
+        build_tfrecords_dataset(X, Y, output_path='dataset', n_shards=8)
+        df = TFRecordsFlow('dataset', batch_size=128, shuffle=True,
+                           continuous=True)
+        model.fit(df, None, n_epoch=10, validation_set=(testX, testY))
+        ```
+
+    Arguments:
+        records_path: `str`. The dataset path (the same `output_path`
+            used to build the dataset).
+        coord: `Coordinator`. A Tensorflow coordinator. If None, a new one
+            is created.
+        batch_size: `int`. The batch size.
+        num_threads: `int`. Number of parallel records readers.
+        max_queue: `int`. Maximum number of batches stored in queues.
+        shuffle: `bool`. If True, shards and records are shuffled.
+        continuous: `bool`. If True, when an epoch is over, data continue
+            to be feeded.
+        ensure_data_order: `bool`. Ensure that data order is keeped (a
+            single reader is used and data isn't shuffled).
+        dprep_dict: dict. Optional data pre-processing parameter for performing
+            real time data pre-processing. Keys must be placeholders and values
+            `DataPreprocessing` subclass object.
+        daug_dict: dict. Optional data augmentation parameter for performing
+            real time data augmentation. Keys must be placeholders and values
+            `DataAugmentation` subclass object.
+        shuffle_buffer: `int`. Minimum number of samples in the shuffling
+            queue (the higher, the better the shuffling but the higher the
+            memory usage). Default: 8 batches.
+        feed_keys: `dict`. Optional dict with placeholders as keys and
+            records feature names ('X', 'Y', or 'X0', 'X1'... for multiple
+            inputs) as values. Automatically set when used with `DNN.fit`.
+        session: `Session`. The session to read records with. Automatically
+            set when used for training.
+
+    """
+
+    def __init__(self, records_path, coord=None, batch_size=128,
+                 num_threads=4, max_queue=32, shuffle=False,
+                 continuous=False, ensure_data_order=False, dprep_dict=None,
+                 daug_dict=None, shuffle_buffer=None, feed_keys=None,
+                 session=None):
+        if coord is None:
+            coord = tf.train.Coordinator()
+        super(TFRecordsFlow, self).__init__(coord, num_threads, max_queue,
+                                            shuffle, continuous,
+                                            ensure_data_order,
+                                            dprep_dict,
+                                            daug_dict)
+        if ensure_data_order:
+            self.shuffle = False
+        with open(records_path + '.json') as f:
+            self.meta = json.load(f)
+        records_dir = os.path.dirname(records_path)
+        self.shards = [os.path.join(records_dir, s)
+                       for s in self.meta['shards']]
+        self.features = self.meta['features']
+        self.n_samples = self.meta['n_samples']
+        self.batch_size = batch_size
+        self.shuffle_buffer = shuffle_buffer or 8 * batch_size
+        self.feed_keys = feed_keys
+        self.session = session
+        self.batch_op = None
+        self.queue_runners = []
+        self.thread = None
+        # Stop signal of the current fill thread
+        self.thread_stop = threading.Event()
+
+        self.feed_dict_queue = queue.Queue(self.max_queue)
+        self.batches = utils.make_batches(self.n_samples, self.batch_size)
+        self.batch_index = -1
+
+        # Data Recording
+        self.data_status = DataFlowStatus(self.batch_size, self.n_samples)
+
+    @property
+    def input_names(self):
+        """ Records inputs feature name (or list of names). """
+        return self._feature_names('X')
+
+    @property
+    def target_names(self):
+        """ Records targets feature name (or list of names). """
+        return self._feature_names('Y')
+
+    def _feature_names(self, prefix):
+        names = sorted([n for n in self.features if n.startswith(prefix)],
+                       key=lambda n: int(n[1:] or 0))
+        if len(names) == 0:
+            return None
+        return names[0] if len(names) == 1 else names
+
+    def set_feed_keys(self, feed_keys):
+        """ set_feed_keys.
 
-    def __init__(self, coord):
-        super(TFRecordsFlow, self).__init__(coord)
-        raise NotImplementedError
+        Set which placeholder is fed by which records feature.
+
+        Arguments:
+            feed_keys: `dict`. Placeholders as keys and feature names as
+                values.
+
+        """
+        self.feed_keys = feed_keys
+
+    def build(self):
+        """ build.
+
+        Build the records reading pipeline (in the session graph).
+
+        """
+        assert self.session is not None, "A session is required to read " \
+                                         "TFRecords."
+        assert self.feed_keys, "Feed keys must be set (see `set_feed_keys`)."
+        graph = self.session.graph
+        with graph.as_default(), tf.name_scope('TFRecordsFlow'):
+            qr_before = tf.get_collection(tf.GraphKeys.QUEUE_RUNNERS)
+            filename_queue = tf.train.string_input_producer(
+                self.shards, shuffle=self.shuffle,
+                capacity=max(32, len(self.shards)))
+            names = list(self.features.keys())
+            parse_dict = {n: tf.FixedLenFeature([], tf.string) for n in names}
+            samples = []
+            for i in range(self.num_threads):
+                reader = tf.TFRecordReader()
+                _, serialized = reader.read(filename_queue)
+                parsed = tf.parse_single_example(serialized, parse_dict)
+                sample = {}
+                for n in names:
+                    raw = tf.decode_raw(parsed[n],
+                                        tf.as_dtype(self.features[n]['raw_dtype']))
+                    sample[n] = tf.reshape(raw, self.features[n]['shape'])
+                samples.append(sample)
+            capacity = self.max_queue * self.batch_size
+            if self.shuffle:
+                self.batch_op = tf.train.shuffle_batch_join(
+                    samples, self.batch_size,
+                    capacity=capacity + self.shuffle_buffer,
+                    min_after_dequeue=self.shuffle_buffer)
+            else:
+                self.batch_op = tf.train.batch_join(samples, self.batch_size,
+                                                    capacity=capacity)
+            self.queue_runners = [
+                qr for qr in tf.get_collection(tf.GraphKeys.QUEUE_RUNNERS)
+                if qr not in qr_before]
+
+    def next(self, timeout=None):
+        """ next.
+
+        Get the next feed dict.
+
+        Returns:
+            A TensorFlow feed dict, or 'False' if it has no more data.
+
+        """
+        self.data_status.update()
+        return self.feed_dict_queue.get(timeout=timeout)
+
+    def start(self, reset_status=True):
+        """ start.
+
+        Arguments:
+            reset_status: `bool`. If True, `DataStatus` will be reset.
+
+        """
+        if self.batch_op is None:
+            self.build()
+        # A previous fill thread may still be reading a batch: it must be
+        # done before a new one starts, so they never run side by side.
+        self.stop_thread()
+        self.clear_queues()
+        self.interrupted = False
+        if reset_status:
+            self.data_status.reset()
+        # Start records readers (Queue runners do not start threads that
+        # are already running).
+        for qr in self.queue_runners:
+            qr.create_threads(self.session, coord=self.coord, daemon=True,
+                              start=True)
+        self.thread_stop = threading.Event()
+        self.thread = threading.Thread(target=self.fill_feed_dict_queue,
+                                       args=(self.thread_stop,))
+        self.thread.daemon = True
+        self.thread.start()
+
+    def stop_thread(self, timeout=10.):
+        """ stop_thread.
+
+        Signal the fill thread to stop, and wait for it (at most `timeout`
+        seconds, after which it can't update the data flow anymore).
+
+        """
+        self.thread_stop.set()
+        if self.thread is not None and self.thread.is_alive():
+            # Unblock it if waiting for room in the queue
+            self.clear_queues()
+            self.thread.join(timeout)
+        self.thread = None
+
+    def stop(self):
+        """ stop.
+
+        Stop the data flow from creating more feed dicts.
+
+        """
+        self.interrupted = True
+        self.thread_stop.set()
+
+    def reset(self):
+        """ reset.
+
+        Reset batch index.
+        """
+        self.batch_index = -1
+
+    def interrupt(self):
+        # Records readers keep running (parked on full queues), so the data
+        # flow can be started again.
+        self.interrupted = True
+        self.thread_stop.set()
+        self.clear_queues()
+
+    def fill_feed_dict_queue(self, stop_event):
+        while not self.coord.should_stop() and not stop_event.is_set():
+            if self.batch_index + 1 == len(self.batches) \
+                    and not self.continuous:
+                self.put(False, stop_event)
+                break
+            batch = self.session.run(self.batch_op)
+            # The data flow may have been interrupted (and started again)
+            # while reading, then this thread is done.
+            if stop_event.is_set():
+                break
+            self.batch_index += 1
+            if self.batch_index == len(self.batches):
+                self.batch_index = 0
+            batch_start, batch_end = self.batches[self.batch_index]
+            data = {}
+            for k, name in self.feed_keys.items():
+                # Discard samples over the epoch size
+                data[k] = batch[name][:batch_end - batch_start]
+                dtype = self.features[name]['dtype']
+                if data[k].dtype != dtype:
+                    data[k] = data[k].astype(dtype)
+            # Apply augmentation according to daug dict
+            if self.daug_dict:
+                for k in self.daug_dict:
+                    data[k] = self.daug_dict[k].apply(data[k])
+            # Apply preprocessing according to dprep dict
+            if self.dprep_dict:
+                for k in self.dprep_dict:
+                    data[k] = preprocess(self.dprep_dict[k], data[k])
+            self.put(data, stop_event)
+
+    def put(self, data, stop_event):
+        """ Put data in the feed dict queue, unless stopped. """
+        while not stop_event.is_set():
+            try:
+                self.feed_dict_queue.put(data, timeout=0.5)
+                return
+            except queue.Full:
+                pass
+
+    def clear_queues(self):
+        """ clear_queues.
+
+        Clear queues.
+
+        """
+        while not self.feed_dict_queue.empty():
+            self.feed_dict_queue.get()
+
+
+class ChunkFlow(DataFlow):
+    """ ChunkFlow.
+
+    Stream batches from a dataset read by chunks (such as a `CSVReader` or
+    a `TextFileSequences`), so datasets larger than memory can be used for
+    training. A data flow thread reads chunks in order, and builds batches
+    out of them (a batch may span two consecutive chunks, so all batches
+    are full but the last one of an epoch), applying data augmentation and
+    pre-processing.
+
+    `DNN.fit` (for a `CSVReader`) and `SequenceGenerator.fit` (for a
+    `TextFileSequences`) stream data through a `ChunkFlow`, so a whole
+    training runs over all chunks (as a single epoch).
+
+    Note that chunks are read in order, so samples are only shuffled
+    within chunks.
+
+    Examples:
+        ```python
+        reader = CSVReader('dataset.csv', target_column=0)
+        df = ChunkFlow(reader, batch_size=128, shuffle=True)
+        model.fit(df, None, n_epoch=10, validation_set=(testX, testY))
+        ```
+
+    Arguments:
+        chunks: An iterable of (inputs, targets) arrays tuples. It is
+            iterated once per epoch, and its `len` must be the total number
+            of samples.
+        coord: `Coordinator`. A Tensorflow coordinator. If None, a new one
+            is created.
+        batch_size: `int`. The batch size.
+        max_queue: `int`. Maximum number of batches stored in queue.
+        shuffle: `bool`. If True, samples are shuffled within chunks.
+        continuous: `bool`. If True, when an epoch is over, data continue
+            to be feeded.
+        dprep_dict: dict. Optional data pre-processing parameter for performing
+            real time data pre-processing. Keys must be placeholders and values
+            `DataPreprocessing` subclass object.
+        daug_dict: dict. Optional data augmentation parameter for performing
+            real time data augmentation. Keys must be placeholders and values
+            `DataAugmentation` subclass object.
+        feed_keys: `dict`. Optional dict with placeholders as keys and 'X'
+            (inputs) or 'Y' (targets) as values. Automatically set when used
+            with `DNN.fit`.
+
+    """
+
+    def __init__(self, chunks, coord=None, batch_size=128, max_queue=32,
+                 shuffle=False, continuous=False, dprep_dict=None,
+                 daug_dict=None, feed_keys=None):
+        if coord is None:
+            coord = tf.train.Coordinator()
+        super(ChunkFlow, self).__init__(coord, 1, max_queue, shuffle,
+                                        continuous, False, dprep_dict,
+                                        daug_dict)
+        self.chunks = chunks
+        self.n_samples = len(chunks)
+        self.batch_size = batch_size
+        self.feed_keys = feed_keys
+        self.input_names = 'X'
+        self.target_names = 'Y'
+        self.thread = None
+        # Stop signal of the current fill thread
+        self.thread_stop = threading.Event()
+
+        self.feed_dict_queue = queue.Queue(self.max_queue)
+        self.batches = utils.make_batches(self.n_samples, self.batch_size)
+
+        # Data Recording
+        self.data_status = DataFlowStatus(self.batch_size, self.n_samples)
+
+    def set_feed_keys(self, feed_keys):
+        """ set_feed_keys.
+
+        Set which placeholder is fed by inputs ('X') or targets ('Y').
+
+        Arguments:
+            feed_keys: `dict`. Placeholders as keys and 'X' or 'Y' as
+                values.
+
+        """
+        self.feed_keys = feed_keys
+
+    def next(self, timeout=None):
+        """ next.
+
+        Get the next feed dict.
+
+        Returns:
+            A TensorFlow feed dict, or 'False' if it has no more data.
+
+        """
+        self.data_status.update()
+        data = self.feed_dict_queue.get(timeout=timeout)
+        # Errors reading chunks are raised to the consumer
+        if isinstance(data, Exception):
+            raise data
+        return data
+
+    def start(self, reset_status=True):
+        """ start.
+
+        Start a new epoch (from the first chunk).
+
+        Arguments:
+            reset_status: `bool`. If True, `DataStatus` will be reset.
+
+        """
+        assert self.feed_keys, "Feed keys must be set (see `set_feed_keys`)."
+        # A previous fill thread must be done before a new one starts
+        self.stop_thread()
+        self.clear_queues()
+        self.interrupted = False
+        if reset_status:
+            self.data_status.reset()
+        self.thread_stop = threading.Event()
+        self.thread = threading.Thread(target=self.fill_feed_dict_queue,
+                                       args=(self.thread_stop,))
+        self.thread.daemon = True
+        self.thread.start()
+
+    def stop_thread(self, timeout=10.):
+        """ stop_thread.
+
+        Signal the fill thread to stop, and wait for it (at most `timeout`
+        seconds, after which it can't update the data flow anymore).
+
+        """
+        self.thread_stop.set()
+        if self.thread is not None and self.thread.is_alive():
+            # Unblock it if waiting for room in the queue
+            self.clear_queues()
+            self.thread.join(timeout)
+        self.thread = None
+
+    def stop(self):
+        """ stop.
+
+        Stop the data flow from creating more feed dicts.
+
+        """
+        self.interrupted = True
+        self.thread_stop.set()
+
+    def interrupt(self):
+        self.interrupted = True
+        self.thread_stop.set()
+        self.clear_queues()
+
+    def fill_feed_dict_queue(self, stop_event):
+        try:
+            while not self.coord.should_stop() and not stop_event.is_set():
+                for batch in self.iter_batches():
+                    if self.coord.should_stop() or stop_event.is_set():
+                        return
+                    data = {}
+                    for k, name in self.feed_keys.items():
+                        data[k] = batch[name]
+                    # Apply augmentation according to daug dict
+                    if self.daug_dict:
+                        for k in self.daug_dict:
+                            data[k] = self.daug_dict[k].apply(data[k])
+                    # Apply preprocessing according to dprep dict
+                    # (batches may be views of the chunks, so they are
+                    # not overwritten)
+                    if self.dprep_dict:
+                        for k in self.dprep_dict:
+                            data[k] = preprocess(self.dprep_dict[k], data[k],
+                                                 inplace=False)
+                    self.put(data, stop_event)
+                if not self.continuous:
+                    self.put(False, stop_event)
+                    break
+        except Exception as e:
+            self.put(e, stop_event)
+
+    def iter_batches(self):
+        """ Yield the batches (as {'X': inputs, 'Y': targets}) of an
+        epoch. """
+        names = set(self.feed_keys.values())
+        parts, n_parts = [], 0
+        for chunk in self.chunks:
+            chunk = dict((n, d) for n, d in zip(('X', 'Y'), chunk)
+                         if n in names)
+            n = len(chunk['X' if 'X' in chunk else 'Y'])
+            ids = np.random.permutation(n) if self.shuffle else None
+            start = 0
+            while start < n:
+                stop = min(n, start + self.batch_size - n_parts)
+                if ids is None:
+                    parts.append(dict((name, d[start:stop]) for name, d in
+                                      chunk.items()))
+                else:
+                    parts.append(dict(
+                        (name, utils.slice_array(d, ids[start:stop]))
+                        for name, d in chunk.items()))
+                n_parts += stop - start
+                start = stop
+                if n_parts == self.batch_size:
+                    yield self.concat_parts(parts)
+                    parts, n_parts = [], 0
+        if parts:
+            yield self.concat_parts(parts)
+
+    def concat_parts(self, parts):
+        if len(parts) == 1:
+            return parts[0]
+        return dict((name, np.concatenate([p[name] for p in parts]))
+                    for name in parts[0])
+
+    def put(self, data, stop_event):
+        """ Put data in the feed dict queue, unless stopped. """
+        while not stop_event.is_set():
+            try:
+                self.feed_dict_queue.put(data, timeout=0.5)
+                return
+            except queue.Full:
+                pass
+
+    def clear_queues(self):
+        """ clear_queues.
+
+        Clear queues.
+
+        """
+        while not self.feed_dict_queue.empty():
+            self.feed_dict_queue.get()
+
+
+class DataFlowStats(object):
+    """ Data Flow Stats
+
+    Record the time the consumer waits for batches, the time it spends
+    between batches, and the time workers spend to build a batch.
+
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.last_batch_time = None
+        self.mean_produce_time = 0.
+        self.reset()
+
+    def consumed(self, request_time, wait_time):
+        # The first batch only starts the clock (it includes start up time)
+        if self.last_batch_time is not None:
+            self.step_time += request_time - self.last_batch_time
+            self.wait_time += wait_time
+            self.n_consumed += 1
+        self.last_batch_time = request_time + wait_time
+
+    def produced(self, produce_time):
+        with self.lock:
+            self.produce_time += produce_time
+            self.n_produced += 1
+
+    def summary(self):
+        """ Returns mean times per batch, as a `dict`. """
+        n_consumed = max(self.n_consumed, 1)
+        with self.lock:
+            # Keep the previous estimate if all batches were built before
+            if self.n_produced > 0:
+                self.mean_produce_time = self.produce_time / self.n_produced
+        return {'wait': self.wait_time / n_consumed,
+                'step': self.step_time / n_consumed,
+                'produce': self.mean_produce_time}
+
+    def reset(self):
+        with self.lock:
+            self.wait_time = 0.
+            self.step_time = 0.
+            self.produce_time = 0.
+            self.n_consumed = 0
+            self.n_produced = 0
 
 
 class DataFlowStatus(object):
@@ -287,6 +1461,362 @@ class DataFlowStatus(object):
         self.epoch = 0
 
 
+def preprocess(dprep, batch, inplace=True):
+    """ preprocess.
+
+    Apply a data pre-processing to a batch built by a data flow. Built-in
+    `DataPreprocessing` methods are fused, and may overwrite the batch (if
+    `inplace`), while a custom `apply(batch)` method is called as is.
+
+    Arguments:
+        dprep: `DataPreprocessing`. The data pre-processing.
+        batch: `array`. The batch.
+        inplace: `bool`. If True, the batch may be overwritten.
+
+    Returns:
+        The pre-processed batch.
+
+    """
+    apply = getattr(type(dprep), 'apply', None)
+    if isinstance(dprep, DataPreprocessing) and \
+            getattr(apply, '__code__', None) is \
+            DataPreprocessing.apply.__code__:
+        return dprep._apply(batch, inplace=inplace)
+    return dprep.apply(batch)
+
+
+def batch_nbytes(data):
+    """ Returns the size (in bytes) of a batch `dict`. """
+    return sum(np.asarray(v).nbytes for v in data.values())
+
+
+class BatchCache(object):
+    """ BatchCache.
+
+    Thread-safe cache of batches (by batch number), that can be shared by
+    several `ValidationFlow` over the same data. If batches don't all fit in
+    `max_size` bytes, the cache is emptied, and no more batch is cached.
+
+    Arguments:
+        max_size: `int`. Maximum size (in bytes) of cached batches.
+
+    """
+
+    def __init__(self, max_size=512 * 2**20):
+        self.max_size = max_size
+        self.size = 0
+        self.overflowed = False
+        self.cache = {}
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        with self.lock:
+            return len(self.cache)
+
+    def add(self, i, data):
+        """ Cache batch `i`. Returns False if batches don't fit. """
+        with self.lock:
+            if self.overflowed:
+                return False
+            if i not in self.cache:
+                nbytes = batch_nbytes(data)
+                if self.size + nbytes > self.max_size:
+                    self.overflowed = True
+                    self.cache.clear()
+                    self.size = 0
+                    return False
+                self.cache[i] = data
+                self.size += nbytes
+            return True
+
+    def batches(self, n_batches):
+        """ Returns the list of cached batches if all `n_batches` batches
+        are cached, None otherwise. """
+        with self.lock:
+            if len(self.cache) != n_batches:
+                return None
+            return [self.cache[i] for i in range(n_batches)]
+
+
+# ------------------------
+#  Shuffling Utils
+# ------------------------
+
+def block_shuffle(index_array, block_size, window=8):
+    """ block_shuffle.
+
+    Shuffle an index array by blocks: indexes are grouped by aligned blocks
+    of `block_size` consecutive indexes (`index // block_size`), blocks order
+    is shuffled, then indexes are shuffled within every window of `window`
+    consecutive blocks.
+
+    Arguments:
+        index_array: `array`. The indexes to shuffle.
+        block_size: `int`. Number of indexes per block.
+        window: `int`. Number of blocks whose indexes are shuffled together.
+
+    Returns:
+        The shuffled indexes `array`.
+
+    """
+    index_array = np.asarray(index_array)
+    uniques, blocks = np.unique(index_array // block_size,
+                                return_inverse=True)
+    block_rank = np.random.permutation(len(uniques))
+    window_ids = block_rank[blocks] // window
+    return index_array[np.lexsort((np.random.random_sample(len(blocks)),
+                                   window_ids))]
+
+
+# ------------------------
+#  Multiprocessing Utils
+# ------------------------
+
+def get_mp_context():
+    """ Returns a 'fork' multiprocessing context (if supported), so worker
+    processes share parent data without pickling it. """
+    try:
+        return multiprocessing.get_context('fork')
+    except Exception:
+        return multiprocessing
+
+
+def clear_mp_queue(q):
+    """ Empty a multiprocessing queue, and returns its items. """
+    items = []
+    while True:
+        try:
+            items.append(q.get(timeout=0.01))
+        except queue.Empty:
+            return items
+
+
+def to_shared_array(data):
+    """ to_shared_array.
+
+    Copy an array into a new shared memory block, so it can be sent to
+    another process without being pickled. Data that isn't a numerical
+    array (or if shared memory isn't supported) is returned as it is.
+
+    Arguments:
+        data: `array`. The data to share.
+
+    Returns:
+        A description of the shared data, to be used with
+        `from_shared_array`.
+
+    """
+    if not SHARED_MEMORY_SUPPORTED:
+        return ('raw', data)
+    try:
+        arr = np.ascontiguousarray(data)
+    except Exception:
+        return ('raw', data)
+    if arr.dtype.hasobject or arr.nbytes == 0:
+        return ('raw', data)
+    shm = shared_memory.SharedMemory(create=True, size=arr.nbytes)
+    np.ndarray(arr.shape, dtype=arr.dtype, buffer=shm.buf)[...] = arr
+    desc = ('shm', shm.name, arr.shape, arr.dtype.str)
+    shm.close()
+    return desc
+
+
+def from_shared_array(desc, out=None):
+    """ from_shared_array.
+
+    Retrieve data shared with `to_shared_array`, and release its shared
+    memory block.
+
+    Arguments:
+        desc: `tuple`. The shared data description.
+        out: `array`. An optional batch buffer to copy data into. It is
+            ignored if data doesn't fit in it.
+
+    Returns:
+        The data (a numpy array if it was shared through shared memory).
+
+    """
+    if desc[0] == 'raw':
+        return desc[1]
+    _, name, shape, dtype = desc
+    shm = shared_memory.SharedMemory(name=name)
+    try:
+        arr = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+        if out is not None and fits_buffer(arr, out):
+            np.copyto(out[:len(arr)], arr, casting='unsafe')
+            arr = out[:len(arr)]
+        else:
+            arr = np.array(arr)
+    finally:
+        shm.close()
+        shm.unlink()
+    return arr
+
+
+# ------------------------
+#  Batch Buffers
+# ------------------------
+
+class FeedBatch(dict):
+    """ A feed dict holding views of a `BatchBufferPool` buffer. """
+    buffer_id = None
+
+
+class BatchBufferPool(object):
+    """ Batch Buffer Pool.
+
+    A fixed pool of reusable batch buffers. Producers acquire a free buffer,
+    fill it in place, and consumers release it once the batch has been used.
+    Buffers are allocated on first use, with their shape and dtype inferred
+    from the placeholders (or from the data if the placeholder shape isn't
+    fully defined). Data that doesn't fit a buffer (i.e. variable shape or
+    non numerical data) is passed through as it is.
+
+    Arguments:
+        size: `int`. The number of buffers in the pool.
+        batch_size: `int`. The maximum number of samples per batch.
+
+    """
+
+    def __init__(self, size, batch_size):
+        self.size = max(1, size)
+        self.batch_size = batch_size
+        self.buffers = [{} for i in range(self.size)]
+        # Buffer spec per key: (sample shape, dtype), or False if the key
+        # can't be buffered.
+        self.specs = {}
+        self.lock = threading.Lock()
+        self.free = queue.Queue()
+        self.reset()
+
+    def reset(self):
+        """ Mark all buffers as free. """
+        while not self.free.empty():
+            self.free.get()
+        for i in range(self.size):
+            self.free.put(i)
+
+    def acquire(self, is_running=None):
+        """ acquire.
+
+        Wait for a free buffer.
+
+        Arguments:
+            is_running: `function`. Optional function returning False to
+                stop waiting.
+
+        Returns:
+            The buffer id, or None if `is_running` returned False.
+
+        """
+        while is_running is None or is_running():
+            try:
+                return self.free.get(timeout=0.5)
+            except queue.Empty:
+                pass
+        return None
+
+    def release(self, feed_batch):
+        """ Hand back the buffer holding `feed_batch`. """
+        if getattr(feed_batch, 'buffer_id', None) is not None:
+            self.free.put(feed_batch.buffer_id)
+            feed_batch.buffer_id = None
+
+    def fill(self, buffer_id, data):
+        """ fill.
+
+        Copy a batch into a buffer (data that has already been retrieved
+        into that buffer is not copied).
+
+        Arguments:
+            buffer_id: `int`. The buffer id, as returned by `acquire`.
+            data: `dict`. The batch data.
+
+        Returns:
+            A `FeedBatch`, holding views of the buffer.
+
+        """
+        buffers = self.buffers[buffer_id]
+        feed_batch = FeedBatch()
+        feed_batch.buffer_id = buffer_id
+        for k, v in data.items():
+            if k not in buffers:
+                buffers[k] = self.allocate(k, v)
+            buf = buffers[k]
+            if buf is None:
+                feed_batch[k] = v
+            elif isinstance(v, np.ndarray) and v.base is buf:
+                # Already retrieved in place
+                feed_batch[k] = v
+            else:
+                v = np.asarray(v)
+                if fits_buffer(v, buf):
+                    np.copyto(buf[:len(v)], v, casting='unsafe')
+                    feed_batch[k] = buf[:len(v)]
+                else:
+                    feed_batch[k] = v
+        return feed_batch
+
+    def allocate(self, key, data):
+        """ Allocate a buffer for `key`, returns None if data can't be
+        buffered. """
+        with self.lock:
+            if key not in self.specs:
+                self.specs[key] = get_buffer_spec(key, data)
+            spec = self.specs[key]
+        if not spec:
+            return None
+        shape, dtype = spec
+        return np.empty([self.batch_size] + list(shape), dtype=dtype)
+
+
+def get_buffer_spec(placeholder, data):
+    """ Returns (sample shape, dtype) for buffering placeholder data,
+    or False if it can't be buffered. """
+    try:
+        data = np.asarray(data)
+    except Exception:
+        return False
+    if data.dtype.hasobject or data.ndim == 0:
+        return False
+    shape, dtype = list(data.shape[1:]), data.dtype
+    try:
+        p_shape = placeholder.get_shape().as_list()[1:]
+        if len(p_shape) == len(shape) and None not in p_shape:
+            shape = p_shape
+        dtype = np.dtype(placeholder.dtype.as_numpy_dtype)
+    except Exception:
+        # Not a placeholder, or unknown shape
+        pass
+    return shape, dtype
+
+
+def fits_buffer(data, buf):
+    """ Check if a batch fits in a batch buffer. """
+    return data.shape[1:] == buf.shape[1:] and len(data) <= len(buf) \
+        and np.can_cast(data.dtype, buf.dtype, casting='same_kind')
+
+
+def take_into(data, batch_ids, buf):
+    """ Gather `data[batch_ids]` into a batch buffer. Returns the filled
+    buffer view, or None if data can't be gathered into that buffer. """
+    readable = isinstance(data, utils.ChunkCache) or \
+        utils.is_hdf5_dataset(data)
+    if not (isinstance(data, np.ndarray) or readable) \
+            or data.dtype != buf.dtype \
+            or tuple(data.shape[1:]) != buf.shape[1:] \
+            or np.ndim(batch_ids) != 1 or len(batch_ids) > len(buf):
+        return None
+    out = buf[:len(batch_ids)]
+    if isinstance(data, utils.ChunkCache):
+        data.read(batch_ids, out=out)
+    elif readable:
+        utils.read_rows(data, batch_ids, out=out)
+    else:
+        np.take(data, batch_ids, axis=0, out=out)
+    return out
+
+
 class ArrayFlow(object):
     """ ArrayFlow.
 
@@ -1,8 +1,11 @@
 # -*- coding: utf-8 -*-
 from __future__ import division, print_function, absolute_import
 
+import os
+import hashlib
 import numpy as np
 import pickle
+from multiprocessing.pool import ThreadPool
 import tensorflow as tf
 
 _EPSILON = 1e-8
@@ -18,8 +21,25 @@ class DataPreprocessing(object):
     training and testing time. Note that DataAugmentation is similar to
     DataPreprocessing, but only applies at training time.
 
+    Preprocessing methods are applied to whole batches at once. Consecutive
+    element-wise methods (such as featurewise zero centering and std
+    normalization) are fused into a single scale and shift, and ZCA
+    whitening is performed with a single matrix product. Float batches keep
+    their data type (integer batches are converted to float32 by arithmetic
+    methods).
+
+    Global statistics (mean, std and principal components) are computed in a
+    single streaming pass over chunks of the dataset (by `num_workers`
+    threads), so datasets larger than memory (such as HDF5 datasets) are
+    supported. Principal components can also be estimated with a randomized
+    method, in a few passes (see `add_zca_whitening`). If `cache_dir` is
+    provided, computed statistics are cached on disk, keyed by a fingerprint
+    of the dataset.
+
     Arguments:
-        None.
+        name: `str`. The preprocessing name scope.
+        num_workers: `int`. Number of threads computing statistics.
+        cache_dir: `str`. Optional directory to cache statistics in.
 
     Parameters:
         methods: `list of function`. Augmentation methods to apply.
@@ -27,24 +47,93 @@ class DataPreprocessing(object):
 
     """
 
-    def __init__(self, name="DataPreprocessing"):
+    def __init__(self, name="DataPreprocessing", num_workers=4,
+                 cache_dir=None):
         self.methods = []
         self.args = []
         self.session = None
+        self.num_workers = num_workers
+        self.cache_dir = cache_dir
         # Data Persistence
         with tf.name_scope(name) as scope:
             self.scope = scope
         self.global_mean = self.PersistentParameter(scope, name="mean")
         self.global_std = self.PersistentParameter(scope, name="std")
         self.global_pc = self.PersistentParameter(scope, name="pc")
+        # Number of principal components estimated (None: exact PCA)
+        self.pc_components = None
+        # float32 copy of the principal components (pc, pc_float32)
+        self._pc_cache = (None, None)
+        # Last computed moments (name, dataset fingerprint, moments)
+        self._moments = None
 
     def apply(self, batch):
-        for i, m in enumerate(self.methods):
-            if self.args[i]:
-                batch = m(batch, *self.args[i])
+        """ apply.
+
+        Apply all preprocessing methods to a batch, in a single pass.
+
+        Arguments:
+            batch: `array` or `list`. The batch of samples.
+
+        Returns:
+            The preprocessed batch (an `array`). Float data keeps its type,
+            other data is converted to float32 by element-wise methods.
+
+        """
+        return self._apply(batch)
+
+    def _apply(self, batch, inplace=False):
+        """ Apply all preprocessing methods, overwriting the batch if
+        `inplace` (data flows entry point, see `data_flow.preprocess`). """
+        if not self.methods:
+            return batch
+        ops = self._compile()
+        if any(m == self._scale_shift for m, args in ops):
+            # Fused element-wise methods are computed in the batch float type
+            x = _to_float(batch)
+        else:
+            x = np.asarray(batch)
+        if not inplace and isinstance(batch, np.ndarray) and \
+                np.may_share_memory(x, batch):
+            x = x.copy()
+        for m, args in ops:
+            x = m(x, *args)
+        return x
+
+    def _compile(self):
+        """ Returns the list of (method, args) to apply, where consecutive
+        element-wise affine methods are fused into a single `_scale_shift`. """
+        ops = []
+        scale, shift = None, None
+        for m, args in zip(self.methods, self.args):
+            affine = self._affine_params(m)
+            if affine is None:
+                if scale is not None:
+                    ops.append((self._scale_shift, [scale, shift]))
+                    scale, shift = None, None
+                ops.append((m, args or []))
+            elif scale is None:
+                scale, shift = affine
             else:
-                batch = m(batch)
-        return batch
+                # (x * scale + shift) * a + b
+                scale, shift = scale * affine[0], shift * affine[0] + affine[1]
+        if scale is not None:
+            ops.append((self._scale_shift, [scale, shift]))
+        return ops
+
+    def _affine_params(self, method):
+        """ Returns (scale, shift) if `method` is an element-wise affine
+        method (x * scale + shift), None otherwise. """
+        if getattr(method, '__self__', None) is not self:
+            return None
+        name = method.__name__
+        if name == '_featurewise_zero_center':
+            return np.float32(1.), -np.asarray(self.global_mean.value,
+                                              dtype=np.float32)
+        if name == '_featurewise_stdnorm':
+            return 1. / (np.asarray(self.global_std.value, dtype=np.float32)
+                         + _EPSILON), np.float32(0.)
+        return None
 
     def restore_params(self, session):
         self.global_mean.is_restored(session)
@@ -63,6 +152,7 @@ class DataPreprocessing(object):
                 print("---------------------------------")
                 print("Preprocessing... Calculating mean over all dataset "
                       "(this may take long)...")
+                self._check_dataset(dataset, 'mean')
                 self._compute_global_mean(dataset, session, limit)
                 print("Mean: " + str(self.global_mean.value) + " (To avoid "
                       "repetitive computation, add it to argument 'mean' of "
@@ -76,6 +166,7 @@ class DataPreprocessing(object):
                 print("---------------------------------")
                 print("Preprocessing... Calculating std over all dataset "
                       "(this may take long)...")
+                self._check_dataset(dataset, 'std')
                 self._compute_global_std(dataset, session, limit)
                 print("STD: " + str(self.global_std.value) + " (To avoid "
                       "repetitive computation, add it to argument 'std' of "
@@ -89,6 +180,7 @@ class DataPreprocessing(object):
                 print("---------------------------------")
                 print("Preprocessing... PCA over all dataset "
                       "(this may take long)...")
+                self._check_dataset(dataset, 'pc')
                 self._compute_global_pc(dataset, session, limit)
                 with open('PC.pkl', 'wb') as f:
                     pickle.dump(self.global_pc.value, f)
@@ -96,6 +188,12 @@ class DataPreprocessing(object):
                       "load this pickle file and assign its value to 'pc' "
                       "argument of `add_zca_whitening`)")
 
+    def _check_dataset(self, dataset, stat_name):
+        if dataset is None:
+            raise ValueError("Global %s can't be computed on streamed data, "
+                             "please provide its value to the "
+                             "preprocessing method." % stat_name)
+
     # -----------------------
     #  Preprocessing Methods
     # -----------------------
@@ -164,14 +262,24 @@ class DataPreprocessing(object):
         self.methods.append(self._featurewise_stdnorm)
         self.args.append(None)
 
-    def add_zca_whitening(self, pc=None):
+    def add_zca_whitening(self, pc=None, n_components=None):
         """ add_zca_whitening.
 
         Apply ZCA Whitening to data.
 
+        By default, principal components are computed exactly, from the
+        (features x features) covariance accumulated over chunks. If
+        `n_components` is set, only the top `n_components` principal
+        components are estimated, with a randomized range finder (a few
+        passes over chunks, without building the covariance), and other
+        directions are scaled by their mean variance. This is much faster
+        when there are many features.
+
         Arguments:
             pc: `array` (optional). Use the provided pre-computed principal
                 component instead of computing it.
+            n_components: `int` (optional). Number of principal components
+                to estimate (randomized PCA).
 
         Returns:
             Nothing.
@@ -179,6 +287,7 @@ class DataPreprocessing(object):
         """
         self.global_pc.is_required = True
         self.global_pc.value = pc
+        self.pc_components = n_components
         self.methods.append(self._zca_whitening)
         self.args.append(None)
 
@@ -187,31 +296,45 @@ class DataPreprocessing(object):
     # ---------------------------
 
     def _samplewise_zero_center(self, batch):
-        for i in range(len(batch)):
-            batch[i] -= np.mean(batch[i], axis=0)
+        batch = _to_float(batch)
+        batch -= np.mean(batch, axis=1, keepdims=True)
         return batch
 
     def _samplewise_stdnorm(self, batch):
-        for i in range(len(batch)):
-            batch[i] /= (np.std(batch[i], axis=0) + _EPSILON)
+        batch = _to_float(batch)
+        batch /= (np.std(batch, axis=1, keepdims=True) + _EPSILON)
         return batch
 
     def _featurewise_zero_center(self, batch):
-        for i in range(len(batch)):
-            batch[i] -= self.global_mean.value
+        batch = _to_float(batch)
+        batch -= np.asarray(self.global_mean.value, dtype=batch.dtype)
         return batch
 
     def _featurewise_stdnorm(self, batch):
-        for i in range(len(batch)):
-            batch[i] /= (self.global_std.value + _EPSILON)
+        batch = _to_float(batch)
+        batch /= (np.asarray(self.global_std.value, dtype=batch.dtype) +
+                  _EPSILON)
         return batch
 
     def _zca_whitening(self, batch):
-        for i in range(len(batch)):
-            flat = np.reshape(batch[i], batch[i].size)
-            white = np.dot(flat, self.global_pc.value)
-            s1, s2, s3 = batch[i].shape[0], batch[i].shape[1], batch[i].shape[2]
-            batch[i] = np.reshape(white, (s1, s2, s3))
+        batch = _to_float(batch)
+        pc, pc_float32 = self._pc_cache
+        if pc is not self.global_pc.value:
+            pc = self.global_pc.value
+            pc_float32 = np.asarray(pc, dtype=np.float32)
+            self._pc_cache = (pc, pc_float32)
+        # Whole batch at once
+        flat = np.reshape(batch, (len(batch), -1))
+        if batch.dtype != np.float32:
+            pc_float32 = np.asarray(pc, dtype=batch.dtype)
+        return np.reshape(np.dot(flat, pc_float32), batch.shape)
+
+    def _scale_shift(self, batch, scale, shift):
+        """ Element-wise `batch * scale + shift`, in place. """
+        if np.any(scale != 1.):
+            np.multiply(batch, scale, out=batch)
+        if np.any(shift != 0.):
+            np.add(batch, shift, out=batch)
         return batch
 
     # ---------------------------------------
@@ -221,48 +344,140 @@ class DataPreprocessing(object):
     def _compute_global_mean(self, dataset, session, limit=None):
         """ Compute mean of a dataset. A limit can be specified for faster
         computation, considering only 'limit' first elements. """
-        _dataset = dataset
-        mean = 0.
-        if isinstance(limit, int):
-            _dataset = _dataset[:limit]
-        if isinstance(_dataset, np.ndarray):
-            mean = np.mean(_dataset)
-        else:
-            # Iterate in case of non numpy data
-            for i in range(len(dataset)):
-                mean += np.mean(dataset[i]) / len(dataset)
+        mean = self._compute_moments(dataset, limit)[0]
         self.global_mean.assign(mean, session)
         return mean
 
     def _compute_global_std(self, dataset, session, limit=None):
         """ Compute std of a dataset. A limit can be specified for faster
         computation, considering only 'limit' first elements. """
-        _dataset = dataset
-        std = 0.
-        if isinstance(limit, int):
-            _dataset = _dataset[:limit]
-        if isinstance(_dataset, np.ndarray):
-            std = np.std(_dataset)
-        else:
-            for i in range(len(dataset)):
-                std += np.std(dataset[i]) / len(dataset)
+        std = np.sqrt(self._compute_moments(dataset, limit)[1])
         self.global_std.assign(std, session)
         return std
 
     def _compute_global_pc(self, dataset, session, limit=None):
         """ Compute the Principal Component. """
-        _dataset = dataset
-        if isinstance(limit, int):
-            _dataset = _dataset[:limit]
-        d = _dataset
-        s0, s1, s2, s3 = d.shape[0], d.shape[1], d.shape[2], d.shape[3]
-        flat = np.reshape(d, (s0, s1 * s2 * s3))
-        sigma = np.dot(flat.T, flat) / flat.shape[1]
-        U, S, V = np.linalg.svd(sigma)
-        pc = np.dot(np.dot(U, np.diag(1. / np.sqrt(S + _EPSILON))), U.T)
+        pc = self._compute_pc(dataset, limit)
         self.global_pc.assign(pc, session)
         return pc
 
+    def _compute_pc(self, dataset, limit=None):
+        """ Compute the ZCA whitening matrix of a dataset (exact, or
+        randomized if `pc_components` is set). """
+        def compute():
+            if self.pc_components:
+                return self._randomized_pc(dataset, limit,
+                                           self.pc_components)
+            # Accumulate the (features x features) matrix chunk by chunk (it
+            # is the size of the whitening matrix anyway)
+            sigma, n_features = 0., 1
+            for gram, n_features in self._map_chunks(_chunk_gram, dataset,
+                                                     limit):
+                sigma += gram
+            sigma /= n_features
+            S, U = np.linalg.eigh(sigma)
+            S = np.maximum(S, 0.)
+            return np.dot(U / np.sqrt(S + _EPSILON), U.T)
+        name = 'pc_%d' % self.pc_components if self.pc_components else 'pc'
+        return self._cached_stat(name, dataset, limit, compute)
+
+    def _randomized_pc(self, dataset, limit, n_components, n_iter=2,
+                       oversampling=10):
+        """ Whitening matrix of the top `n_components` principal
+        components, estimated by a randomized range finder (Halko et al.):
+        the covariance is only multiplied by a few vectors, chunk by chunk,
+        in `n_iter + 2` passes. Other directions are scaled by their mean
+        variance. """
+        n_features = np.asarray(dataset[0]).size
+        size = min(n_features, n_components + oversampling)
+        # Fixed seed, so that results are the same for the same data
+        Q = np.random.RandomState(0).normal(size=(n_features, size))
+
+        def covariance_product(Q):
+            product, trace, n = 0., 0., 1
+            for c_product, c_trace, n in self._map_chunks(
+                    _chunk_covariance_product, dataset, limit, Q):
+                product += c_product
+                trace += c_trace
+            return product / n, trace / n
+
+        # Range of the covariance (with power iterations)
+        for i in range(n_iter + 1):
+            Q = np.linalg.qr(covariance_product(Q)[0])[0]
+        product, trace = covariance_product(Q)
+        S, V = np.linalg.eigh(np.dot(Q.T, product))
+        S = np.maximum(S[::-1][:n_components], 0.)
+        U = np.dot(Q, V[:, ::-1][:, :n_components])
+        residual = max(trace - np.sum(S), 0.) / max(n_features - len(S), 1)
+        pc = np.dot(U / np.sqrt(S + _EPSILON), U.T)
+        pc += (np.eye(n_features) - np.dot(U, U.T)) / \
+            np.sqrt(residual + _EPSILON)
+        return pc
+
+    def _compute_moments(self, dataset, limit=None, per_channel=False):
+        """ Compute (mean, variance) of a dataset in a single pass, merging
+        chunks moments (Chan et al. parallel algorithm). """
+        def compute():
+            n, mean, m2 = 0, 0., 0.
+            for c_n, c_mean, c_m2 in self._map_chunks(
+                    _chunk_moments, dataset, limit, per_channel):
+                delta = c_mean - mean
+                total = n + c_n
+                mean = mean + delta * c_n / total
+                m2 = m2 + c_m2 + delta ** 2 * n * c_n / total
+                n = total
+            return np.array([mean, m2 / max(n, 1)])
+        key = 'moments_pc' if per_channel else 'moments'
+        fingerprint = dataset_fingerprint(dataset, limit)
+        # Mean and std share the same pass
+        if self._moments is not None and \
+                self._moments[:2] == (key, fingerprint):
+            return self._moments[2]
+        moments = self._cached_stat(key, dataset, limit, compute, fingerprint)
+        self._moments = (key, fingerprint, moments)
+        return moments
+
+    def _map_chunks(self, fn, dataset, limit=None, *args):
+        """ Apply `fn(chunk, *args)` to chunks of the dataset (read and
+        processed by `num_workers` threads), yields results in order. """
+        n_samples = len(dataset)
+        if isinstance(limit, int):
+            n_samples = min(limit, n_samples)
+        # Chunks of about 16MB (float64)
+        sample_size = np.asarray(dataset[0]).size
+        chunk_size = max(1, (1 << 21) // max(1, sample_size))
+        def process(start):
+            end = min(start + chunk_size, n_samples)
+            chunk = np.asarray(dataset[start:end], dtype=np.float64)
+            return fn(chunk, *args)
+        starts = range(0, n_samples, chunk_size)
+        if self.num_workers and self.num_workers > 1:
+            pool = ThreadPool(self.num_workers)
+            try:
+                for r in pool.imap(process, starts):
+                    yield r
+            finally:
+                pool.terminate()
+        else:
+            for start in starts:
+                yield process(start)
+
+    def _cached_stat(self, name, dataset, limit, compute, fingerprint=None):
+        """ Returns a statistic from the disk cache (if `cache_dir` is set),
+        or compute (and cache) it. """
+        if not self.cache_dir:
+            return compute()
+        if fingerprint is None:
+            fingerprint = dataset_fingerprint(dataset, limit)
+        path = os.path.join(self.cache_dir, "%s_%s.npy" % (name, fingerprint))
+        if os.path.exists(path):
+            return np.load(path)
+        value = compute()
+        if not os.path.exists(self.cache_dir):
+            os.makedirs(self.cache_dir)
+        np.save(path, value)
+        return value
+
     # -----------------------
     #  Persistent Parameters
     # -----------------------
@@ -308,10 +523,15 @@ class ImagePreprocessing(DataPreprocessing):
     training and testing time. Note that ImageAugmentation is similar to
     ImagePreprocessing, but only applies at training time.
 
+    Arguments:
+        num_workers: `int`. Number of threads computing statistics.
+        cache_dir: `str`. Optional directory to cache statistics in.
+
     """
 
-    def __init__(self):
-        super(ImagePreprocessing, self).__init__()
+    def __init__(self, num_workers=4, cache_dir=None):
+        super(ImagePreprocessing, self).__init__(num_workers=num_workers,
+                                                 cache_dir=cache_dir)
         self.global_mean_pc = False
         self.global_std_pc = False
 
@@ -357,16 +577,22 @@ class ImagePreprocessing(DataPreprocessing):
     # -----------------------
 
     def _normalize_image(self, batch):
-        return np.array(batch) / 255.
+        batch = _to_float(batch)
+        batch /= 255.
+        return batch
 
     def _crop_center(self, batch, shape):
-        oshape = np.shape(batch[0])
+        batch = np.asarray(batch)
+        oshape = batch.shape[1:]
         nh = int((oshape[0] - shape[0]) * 0.5)
         nw = int((oshape[1] - shape[1]) * 0.5)
-        new_batch = []
-        for i in range(len(batch)):
-            new_batch.append(batch[i][nh: nh + shape[0], nw: nw + shape[1]])
-        return new_batch
+        return batch[:, nh: nh + shape[0], nw: nw + shape[1]]
+
+    def _affine_params(self, method):
+        if getattr(method, '__self__', None) is self and \
+                method.__name__ == '_normalize_image':
+            return np.float32(1. / 255.), np.float32(0.)
+        return super(ImagePreprocessing, self)._affine_params(method)
 
     # ----------------------------------------------
     #  Preprocessing Methods (Overwritten from Base)
@@ -453,22 +679,24 @@ class ImagePreprocessing(DataPreprocessing):
     # --------------------------------------------------
 
     def _samplewise_zero_center(self, batch, per_channel=False):
-        for i in range(len(batch)):
-            if not per_channel:
-                batch[i] -= np.mean(batch[i])
-            else:
-                batch[i] -= np.mean(batch[i], axis=(0, 1, 2), keepdims=True)
+        batch = _to_float(batch)
+        batch -= np.mean(batch, axis=self._sample_axes(batch, per_channel),
+                         keepdims=True)
         return batch
 
     def _samplewise_stdnorm(self, batch, per_channel=False):
-        for i in range(len(batch)):
-            if not per_channel:
-                batch[i] /= (np.std(batch[i]) + _EPSILON)
-            else:
-                batch[i] /= (np.std(batch[i], axis=(0, 1, 2),
-                                    keepdims=True) + _EPSILON)
+        batch = _to_float(batch)
+        batch /= (np.std(batch, axis=self._sample_axes(batch, per_channel),
+                         keepdims=True) + _EPSILON)
         return batch
 
+    def _sample_axes(self, batch, per_channel=False):
+        """ Axes of every sample (without the channel axis if
+        `per_channel`). """
+        if per_channel and batch.ndim == 4:
+            return (1, 2)
+        return tuple(range(1, batch.ndim))
+
     # --------------------------------------------------------------
     #  Calulation with Persistent Parameters (Overwritten from Base)
     # --------------------------------------------------------------
@@ -476,43 +704,81 @@ class ImagePreprocessing(DataPreprocessing):
     def _compute_global_mean(self, dataset, session, limit=None):
         """ Compute mean of a dataset. A limit can be specified for faster
         computation, considering only 'limit' first elements. """
-        _dataset = dataset
-        mean = 0.
-        if isinstance(limit, int):
-            _dataset = _dataset[:limit]
-        if isinstance(_dataset, np.ndarray) and not self.global_mean_pc:
-            mean = np.mean(_dataset)
-        else:
-            # Iterate in case of non numpy data
-            for i in range(len(dataset)):
-                if not self.global_mean_pc:
-                    mean += np.mean(dataset[i]) / len(dataset)
-                else:
-                    mean += (np.mean(dataset[i], axis=(0, 1),
-                             keepdims=True) / len(dataset))[0][0]
+        mean = self._compute_moments(dataset, limit, self.global_mean_pc)[0]
         self.global_mean.assign(mean, session)
         return mean
 
     def _compute_global_std(self, dataset, session, limit=None):
         """ Compute std of a dataset. A limit can be specified for faster
         computation, considering only 'limit' first elements. """
-        _dataset = dataset
-        std = 0.
-        if isinstance(limit, int):
-            _dataset = _dataset[:limit]
-        if isinstance(_dataset, np.ndarray) and not self.global_std_pc:
-            std = np.std(_dataset)
-        else:
-            for i in range(len(dataset)):
-                if not self.global_std_pc:
-                    std += np.std(dataset[i]) / len(dataset)
-                else:
-                    std += (np.std(dataset[i], axis=(0, 1),
-                             keepdims=True) / len(dataset))[0][0]
+        std = np.sqrt(self._compute_moments(dataset, limit,
+                                            self.global_std_pc)[1])
         self.global_std.assign(std, session)
         return std
 
 
+def _to_float(batch):
+    """ Returns a batch as a float array (float32, unless it already is a
+    float array). """
+    batch = np.asarray(batch)
+    if not np.issubdtype(batch.dtype, np.floating):
+        batch = batch.astype(np.float32)
+    return batch
+
+
+def _chunk_moments(chunk, per_channel=False):
+    """ Returns (count, mean, sum of squared deviations) of a chunk, per
+    channel (last axis) if `per_channel`. """
+    axis = tuple(range(chunk.ndim - 1)) if per_channel else None
+    mean = np.mean(chunk, axis=axis)
+    return chunk.size // np.size(mean), mean, \
+        np.sum(np.square(chunk - mean), axis=axis)
+
+
+def _chunk_gram(chunk):
+    """ Returns (flat.T . flat, n_features) of a flattened chunk. """
+    flat = np.reshape(chunk, (len(chunk), -1))
+    return np.dot(flat.T, flat), flat.shape[1]
+
+
+def _chunk_covariance_product(chunk, Q):
+    """ Returns (flat.T . flat . Q, squared norm, n_features) of a flattened
+    chunk. """
+    flat = np.reshape(chunk, (len(chunk), -1))
+    return np.dot(flat.T, np.dot(flat, Q)), np.sum(np.square(flat)), \
+        flat.shape[1]
+
+
+def dataset_fingerprint(dataset, limit=None, n_probes=8):
+    """ dataset_fingerprint.
+
+    Returns a fingerprint of a dataset, computed from its type, shape, data
+    type, (HDF5) file and a few evenly spaced samples, without reading the
+    whole dataset.
+
+    Arguments:
+        dataset: `array`, HDF5 dataset or any indexable data.
+        limit: `int`. Only consider the 'limit' first samples.
+        n_probes: `int`. Number of samples to hash.
+
+    Returns:
+        A `str` (hexadecimal digest).
+
+    """
+    n_samples = len(dataset)
+    if isinstance(limit, int):
+        n_samples = min(limit, n_samples)
+    h = hashlib.md5()
+    h.update(repr((type(dataset).__name__, n_samples,
+                   tuple(getattr(dataset, 'shape', (None,))[1:]),
+                   str(getattr(dataset, 'dtype', None)),
+                   getattr(getattr(dataset, 'file', None), 'filename', None),
+                   getattr(dataset, 'name', None))).encode('utf-8'))
+    for i in np.unique(np.linspace(0, n_samples - 1, n_probes).astype(int)):
+        h.update(np.ascontiguousarray(dataset[i]).tobytes())
+    return h.hexdigest()
+
+
 class SequencePreprocessing(DataPreprocessing):
 
     def __init__(self):
@@ -2,7 +2,16 @@
 from __future__ import division, print_function, absolute_import
 
 import os
+import copy
+import mmap
+import codecs
 import random
+import hashlib
+import functools
+import itertools
+import threading
+import warnings
+import collections
 import numpy as np
 from PIL import Image
 import pickle
@@ -24,7 +33,7 @@ _EPSILON = 1e-8
 # =======================
 
 
-def to_categorical(y, nb_classes):
+def to_categorical(y, nb_classes, dtype='float64', out=None):
     """ to_categorical.
 
     Convert class vector (integers from 0 to nb_classes)
@@ -33,14 +42,25 @@ def to_categorical(y, nb_classes):
     Arguments:
         y: `array`. Class vector to convert.
         nb_classes: `int`. Total number of classes.
+        dtype: `str` or `dtype`. The binary matrix type (such as 'float32',
+            'uint8' or 'bool'). Ignored if `out` is provided.
+        out: `array`. Optional array of shape (len(y), nb_classes) to write
+            the binary matrix into (avoid allocating a new one).
 
     """
-    y = np.asarray(y, dtype='int32')
+    y = np.asarray(y, dtype='int32').ravel()
     if not nb_classes:
         nb_classes = np.max(y)+1
-    Y = np.zeros((len(y), nb_classes))
-    for i in range(len(y)):
-        Y[i, y[i]] = 1.
+    if out is None:
+        Y = np.zeros((len(y), nb_classes), dtype=dtype)
+    else:
+        if out.shape != (len(y), nb_classes):
+            raise ValueError("'out' shape " + str(out.shape) + " doesn't "
+                             "match expected shape " +
+                             str((len(y), nb_classes)))
+        Y = out
+        Y.fill(0)
+    Y[np.arange(len(y)), y] = 1
     return Y
 
 
@@ -50,7 +70,7 @@ def to_categorical(y, nb_classes):
 
 
 def pad_sequences(sequences, maxlen=None, dtype='int32', padding='post',
-                  truncating='post', value=0.):
+                  truncating='post', value=0., out=None):
     """ pad_sequences.
 
     Pad each sequence to the same length: the length of the longest sequence.
@@ -61,54 +81,86 @@ def pad_sequences(sequences, maxlen=None, dtype='int32', padding='post',
     Arguments:
         sequences: list of lists where each element is a sequence.
         maxlen: int, maximum length.
-        dtype: type to cast the resulting sequence.
+        dtype: type to cast the resulting sequence. Ignored if `out` is
+            provided.
         padding: 'pre' or 'post', pad either before or after each sequence.
         truncating: 'pre' or 'post', remove values from sequences larger than
             maxlen either in the beginning or in the end of the sequence
         value: float, value to pad the sequences to the desired value.
+        out: `array`. Optional array of shape (number_of_sequences, maxlen)
+            to write the padded sequences into (avoid allocating a new one).
 
     Returns:
         x: `numpy array` with dimensions (number_of_sequences, maxlen)
 
     Credits: From Keras `pad_sequences` function.
     """
-    lengths = [len(s) for s in sequences]
+    if padding not in ['pre', 'post']:
+        raise ValueError("Padding type '%s' not understood" % padding)
+    if truncating not in ['pre', 'post']:
+        raise ValueError("Truncating type '%s' not understood" % truncating)
+
+    lengths = np.array([len(s) for s in sequences], dtype='int64')
 
     nb_samples = len(sequences)
     if maxlen is None:
-        maxlen = np.max(lengths)
-
-    x = (np.ones((nb_samples, maxlen)) * value).astype(dtype)
-    for idx, s in enumerate(sequences):
-        if len(s) == 0:
-            continue  # empty list was found
-        if truncating == 'pre':
-            trunc = s[-maxlen:]
-        elif truncating == 'post':
-            trunc = s[:maxlen]
-        else:
-            raise ValueError("Truncating type '%s' not understood" % padding)
+        maxlen = np.max(lengths) if nb_samples else 0
 
-        if padding == 'post':
-            x[idx, :len(trunc)] = trunc
-        elif padding == 'pre':
-            x[idx, -len(trunc):] = trunc
+    if out is None:
+        x = np.empty((nb_samples, maxlen), dtype=dtype)
+    else:
+        if out.shape != (nb_samples, maxlen):
+            raise ValueError("'out' shape " + str(out.shape) + " doesn't "
+                             "match expected shape " +
+                             str((nb_samples, maxlen)))
+        x = out
+    x.fill(value)
+    kept = np.minimum(lengths, maxlen)
+    total = int(np.sum(kept))
+    if total == 0:
+        return x
+
+    # Flatten all (truncated) sequences into a single array, in a single pass
+    if total < np.sum(lengths):
+        if truncating == 'post':
+            sequences = (s[:maxlen] for s in sequences)
         else:
-            raise ValueError("Padding type '%s' not understood" % padding)
+            sequences = (s[len(s) - maxlen:] if len(s) > maxlen else s
+                         for s in sequences)
+    values = np.fromiter(itertools.chain.from_iterable(sequences),
+                         dtype=x.dtype, count=total)
+
+    # Row-major mask of the non-padded positions
+    cols = np.arange(maxlen)
+    if padding == 'post':
+        mask = cols < kept[:, None]
+    else:
+        mask = cols >= (maxlen - kept)[:, None]
+    x[mask] = values
     return x
 
 
-def string_to_semi_redundant_sequences(string, seq_maxlen=25, redun_step=3, char_idx=None):
+def string_to_semi_redundant_sequences(string, seq_maxlen=25, redun_step=3,
+                                       char_idx=None, one_hot=True):
     """ string_to_semi_redundant_sequences.
 
     Vectorize a string and returns parsed sequences and targets, along with
     the associated dictionary.
 
+    If `one_hot` is False, sequences and targets are returned as chars
+    indexes instead of one-hot encoded arrays: inputs are a read-only
+    strided view (of shape (n_sequences, seq_maxlen)) over the encoded text,
+    so they take no more memory than the text itself. They can be one-hot
+    encoded per batch with `OneHotPreloader` (`SequenceGenerator.fit`
+    directly accepts them).
+
     Arguments:
         string: `str`. Lower-case text from input text file.
         seq_maxlen: `int`. Maximum length of a sequence. Default: 25.
         redun_step: `int`. Redundancy step. Default: 3.
         char_idx: 'dict'. A dictionary to convert chars to positions. Will be automatically generated if None
+        one_hot: `bool`. If True, sequences and targets are one-hot encoded,
+            otherwise chars indexes are returned. Default: True.
 
     Returns:
         A tuple: (inputs, targets, dictionary)
@@ -121,33 +173,63 @@ def string_to_semi_redundant_sequences(string, seq_maxlen=25, redun_step=3, char
 
     len_chars = len(char_idx)
 
-    sequences = []
-    next_chars = []
-    for i in range(0, len(string) - seq_maxlen, redun_step):
-        sequences.append(string[i: i + seq_maxlen])
-        next_chars.append(string[i + seq_maxlen])
+    encoded = encode_string(string, char_idx)
+    n_seq = max(0, (len(string) - seq_maxlen + redun_step - 1) // redun_step)
+    # Sequences are overlapping windows over the encoded text
+    step = encoded.strides[0]
+    X = np.lib.stride_tricks.as_strided(encoded, shape=(n_seq, seq_maxlen),
+                                        strides=(redun_step * step, step))
+    X.flags.writeable = False
+    Y = encoded[seq_maxlen::redun_step][:n_seq]
 
-    X = np.zeros((len(sequences), seq_maxlen, len_chars), dtype=np.bool)
-    Y = np.zeros((len(sequences), len_chars), dtype=np.bool)
-    for i, seq in enumerate(sequences):
-        for t, char in enumerate(seq):
-            X[i, t, char_idx[char]] = 1
-        Y[i, char_idx[next_chars[i]]] = 1
+    if one_hot:
+        X = OneHotPreloader(X, len_chars, dtype=bool)[:]
+        Y = OneHotPreloader(Y, len_chars, dtype=bool)[:]
 
     print("Text total length: {:,}".format(len(string)))
     print("Distinct chars   : {:,}".format(len_chars))
-    print("Total sequences  : {:,}".format(len(sequences)))
+    print("Total sequences  : {:,}".format(n_seq))
 
     return X, Y, char_idx
 
 
 def textfile_to_semi_redundant_sequences(path, seq_maxlen=25, redun_step=3,
-                                         to_lower_case=False, pre_defined_char_idx=None):
-    """ Vectorize Text file """
+                                         to_lower_case=False, pre_defined_char_idx=None,
+                                         one_hot=True):
+    """ Vectorize Text file (see `string_to_semi_redundant_sequences`). """
     text = open(path).read()
     if to_lower_case:
         text = text.lower()
-    return string_to_semi_redundant_sequences(text, seq_maxlen, redun_step, pre_defined_char_idx)
+    return string_to_semi_redundant_sequences(text, seq_maxlen, redun_step,
+                                              pre_defined_char_idx, one_hot)
+
+
+def encode_string(string, char_idx):
+    """ Convert a string to an array of chars indexes (using the smallest
+    integer type that fits the dictionary). """
+    if isinstance(string, bytes):
+        codes = np.frombuffer(string, dtype=np.uint8)
+    else:
+        codes = np.frombuffer(string.encode('utf-32-le'), dtype='<u4')
+    if not char_idx:
+        raise ValueError("'char_idx' is empty (no chars to encode with), "
+                         "is the text file empty?")
+    if len(char_idx) <= 256:
+        dtype = np.uint8
+    elif len(char_idx) <= 65536:
+        dtype = np.uint16
+    else:
+        dtype = np.int32
+    # Lookup table from char code to char index
+    table = np.zeros(max(ord(c) for c in char_idx) + 1, dtype=dtype)
+    known = np.zeros(len(table), dtype=bool)
+    for c, i in char_idx.items():
+        table[ord(c)] = i
+        known[ord(c)] = True
+    if len(codes) and (codes.max() >= len(table) or
+                       not known[codes].all()):
+        raise ValueError("String contains chars that are not in 'char_idx'.")
+    return table[codes]
 
 
 def chars_to_dictionary(string):
@@ -158,14 +240,164 @@ def chars_to_dictionary(string):
     return char_idx
 
 
+def textfile_to_chars_dictionary(path, to_lower_case=False,
+                                 chunk_size=1 << 20):
+    """ Creates a dictionary char:integer for each unique character of a
+    text file, in a single streaming pass (the file isn't loaded in
+    memory). """
+    chars = set()
+    for text in iter_textfile_chunks(path, chunk_size):
+        if to_lower_case:
+            text = text.lower()
+        chars.update(text)
+    if not chars:
+        raise ValueError("Text file '%s' is empty, no chars dictionary can "
+                         "be built." % path)
+    return {c: i for i, c in enumerate(sorted(chars))}
+
+
+def iter_textfile_chunks(path, chunk_size=1 << 20):
+    """ Memory-map an (utf-8) text file and yield its decoded text by
+    chunks of about `chunk_size` bytes. """
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            return
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            # Incremental decoding handles chars split between chunks
+            decoder = codecs.getincrementaldecoder('utf-8')()
+            for start in range(0, size, chunk_size):
+                final = start + chunk_size >= size
+                text = decoder.decode(mm[start:start + chunk_size], final)
+                if text:
+                    yield text
+        finally:
+            mm.close()
+
+
+class TextFileSequences(object):
+    """ TextFileSequences.
+
+    Streaming variant of `textfile_to_semi_redundant_sequences`, for text
+    files larger than memory. The text file is memory-mapped and vectorized
+    by chunks, iterating over it yields (inputs, targets) tuples of
+    semi-redundant sequences, in the same order as
+    `textfile_to_semi_redundant_sequences` would return them. Memory usage
+    is bounded by the chunk size (not by the file size).
+
+    It can be iterated multiple times, and can directly be provided to
+    `SequenceGenerator.fit` (that streams chunks through a single
+    `data_flow.ChunkFlow`). Its `len` is the total number of sequences.
+
+    Examples:
+        ```python
+        sequences = TextFileSequences('shakespeare.txt', seq_maxlen=25,
+                                      chunk_size=8 << 20)
+        m = tflearn.SequenceGenerator(net, dictionary=sequences.char_idx,
+                                      seq_maxlen=25)
+        m.fit(sequences, None, n_epoch=10)
+        ```
+
+    Arguments:
+        path: `str`. The text file path (utf-8 encoded).
+        seq_maxlen: `int`. Maximum length of a sequence. Default: 25.
+        redun_step: `int`. Redundancy step. Default: 3.
+        to_lower_case: `bool`. If True, text is converted to lower case.
+        pre_defined_char_idx: `dict`. A dictionary to convert chars to
+            positions. If None, it is built with a streaming pass over the
+            file.
+        chunk_size: `int`. Number of bytes read per chunk.
+        one_hot: `bool`. If True, sequences and targets are one-hot encoded,
+            otherwise chars indexes are returned (see
+            `string_to_semi_redundant_sequences`). Default: False.
+
+    Attributes:
+        char_idx: `dict`. The dictionary converting chars to positions.
+
+    """
+
+    def __init__(self, path, seq_maxlen=25, redun_step=3, to_lower_case=False,
+                 pre_defined_char_idx=None, chunk_size=1 << 20,
+                 one_hot=False):
+        self.path = path
+        self.seq_maxlen = seq_maxlen
+        self.redun_step = redun_step
+        self.to_lower_case = to_lower_case
+        self.chunk_size = chunk_size
+        self.one_hot = one_hot
+        self.char_idx = pre_defined_char_idx
+        if self.char_idx is None:
+            self.char_idx = textfile_to_chars_dictionary(path, to_lower_case,
+                                                         chunk_size)
+        self._n_sequences = None
+
+    def __len__(self):
+        # Number of chars is counted with a pass over the file (once)
+        if self._n_sequences is None:
+            n_chars = 0
+            for text in iter_textfile_chunks(self.path, self.chunk_size):
+                if self.to_lower_case:
+                    text = text.lower()
+                n_chars += len(text)
+            self._n_sequences = max(0, (n_chars - self.seq_maxlen +
+                                        self.redun_step - 1) //
+                                    self.redun_step)
+        return self._n_sequences
+
+    def __iter__(self):
+        n_class = len(self.char_idx)
+        # Encoded text not consumed by previous chunks sequences
+        tail = encode_string(u'', self.char_idx)
+        for text in iter_textfile_chunks(self.path, self.chunk_size):
+            if self.to_lower_case:
+                text = text.lower()
+            encoded = np.concatenate([tail, encode_string(text,
+                                                          self.char_idx)])
+            n_seq = max(0, (len(encoded) - self.seq_maxlen +
+                            self.redun_step - 1) // self.redun_step)
+            tail = encoded[n_seq * self.redun_step:]
+            if n_seq == 0:
+                continue
+            step = encoded.strides[0]
+            X = np.lib.stride_tricks.as_strided(
+                encoded, shape=(n_seq, self.seq_maxlen),
+                strides=(self.redun_step * step, step))
+            X.flags.writeable = False
+            Y = encoded[self.seq_maxlen::self.redun_step][:n_seq]
+            if self.one_hot:
+                X = OneHotPreloader(X, n_class, dtype=bool)[:]
+                Y = OneHotPreloader(Y, n_class, dtype=bool)[:]
+            yield X, Y
+
+
 def random_sequence_from_string(string, seq_maxlen):
     rand_index = random.randint(0, len(string) - seq_maxlen - 1)
     return string[rand_index: rand_index + seq_maxlen]
 
 
 def random_sequence_from_textfile(path, seq_maxlen):
-    text = open(path).read()
-    return random_sequence_from_string(text, seq_maxlen)
+    """ Pick a random sequence from a (utf-8) text file. The file is
+    memory-mapped, so only the sequence is read. """
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            start = random.randint(0, max(0, size - seq_maxlen - 1))
+            while True:
+                # Move to the beginning of a (multi-bytes) char
+                while start > 0 and \
+                        bytearray(mm[start:start + 1])[0] & 0xC0 == 0x80:
+                    start -= 1
+                # Chars are at most 4 bytes long
+                text = mm[start:start + 4 * seq_maxlen].decode('utf-8',
+                                                               'ignore')
+                if len(text) >= seq_maxlen or start == 0:
+                    return text[:seq_maxlen]
+                # Multi-bytes chars near the end of file
+                start = max(0, start - 4 * seq_maxlen)
+        finally:
+            mm.close()
 
 try:
     from tensorflow.contrib.learn.python.learn.preprocessing.text import \
@@ -291,7 +523,9 @@ class VocabularyProcessor(_VocabularyProcessor):
 def build_hdf5_image_dataset(target_path, image_shape, output_path='dataset.h5',
                              mode='file', categorical_labels=True,
                              normalize=True, grayscale=False,
-                             files_extension=None, chunks=False):
+                             files_extension=None, chunks=False,
+                             dtype='float32', compression=None,
+                             num_workers=None, slab_size=None, resume=False):
     """ Build HDF5 Image Dataset.
 
     Build an HDF5 dataset by providing either a root folder or a plain text
@@ -316,6 +550,16 @@ def build_hdf5_image_dataset(target_path, image_shape, output_path='dataset.h5',
     /path/to/img3 class_id
     ```
 
+    Images are decoded and resized by a pool of `num_workers` processes, and
+    written by slabs of `slab_size` images. After every slab, the number of
+    images written is recorded in the dataset, so if `resume` is True, an
+    interrupted build (with the same images and parameters) is resumed
+    instead of started over.
+
+    If `dtype` is 'uint8', raw pixel values are stored (4x smaller than
+    float32), and normalization (if `normalize` is True) is performed when
+    reading data, by wrapping the dataset with `NormalizedArray`.
+
     Examples:
         ```
         # Load path/class_id image file:
@@ -337,6 +581,13 @@ def build_hdf5_image_dataset(target_path, image_shape, output_path='dataset.h5',
         network = ...
         model = DNN(network, ...)
         model.fit(X, Y)
+
+        # Or, with uint8 storage (normalized at read time)
+        build_hdf5_image_dataset(dataset_file, image_shape=(128, 128),
+                                 output_path='dataset.h5', dtype='uint8',
+                                 chunks=True, compression='lzf')
+        h5f = h5py.File('dataset.h5', 'r')
+        X = NormalizedArray(h5f['X'])
         ```
 
     Arguments:
@@ -354,7 +605,7 @@ def build_hdf5_image_dataset(target_path, image_shape, output_path='dataset.h5',
         categorical_labels: `bool`. If True, labels are converted to binary
             vectors.
         normalize: `bool`. If True, normalize all pictures by dividing
-            every image array by 255.
+            every image array by 255 (at read time if `dtype` is 'uint8').
         grayscale: `bool`. If true, images are converted to grayscale.
         files_extension: `list of str`. A list of allowed image file
             extension, for example ['.jpg', '.jpeg', '.png']. If None,
@@ -362,6 +613,15 @@ def build_hdf5_image_dataset(target_path, image_shape, output_path='dataset.h5',
         chunks: `bool` Whether to chunks the dataset or not. You should use
             chunking only when you really need it. See HDF5 documentation.
             If chunks is 'True' a sensitive default will be computed.
+        dtype: `str`. Images data type: 'float32' or 'uint8'.
+        compression: `str`. Optional HDF5 compression filter, such as 'gzip'
+            or 'lzf' (enables chunking).
+        num_workers: `int`. Number of processes decoding images. If 0, images
+            are decoded in the current process. Default: the number of CPUs.
+        slab_size: `int`. Number of images written at once. Default: about
+            256 images, aligned to chunks.
+        resume: `bool`. If True, resume an interrupted build of the same
+            dataset at `output_path` (if any).
 
     """
     import h5py
@@ -370,6 +630,9 @@ def build_hdf5_image_dataset(target_path, image_shape, output_path='dataset.h5',
     assert image_shape[0] and image_shape[1], \
         "Image shape error. It must be a tuple of int: ('width', 'height')."
     assert mode in ['folder', 'file'], "`mode` arg must be 'folder' or 'file'"
+    dtype = np.dtype(dtype)
+    if dtype not in [np.float32, np.uint8]:
+        raise ValueError("Unsupported dtype: " + str(dtype))
 
     if mode == 'folder':
         images, labels = directory_to_samples(target_path,
@@ -390,32 +653,105 @@ def build_hdf5_image_dataset(target_path, image_shape, output_path='dataset.h5',
         if categorical_labels else (len(images), )
     x_chunks = None
     y_chunks = None
-    if chunks is True:
-        x_chunks = (1,)+ d_imgshape[1:]
-        if len(d_labelshape) > 1:
-            y_chunks = (1,) + d_labelshape[1:]
-    dataset = h5py.File(output_path, 'w')
-    dataset.create_dataset('X', d_imgshape, chunks=x_chunks)
-    dataset.create_dataset('Y', d_labelshape, chunks=y_chunks)
-
-    for i in range(len(images)):
-        img = load_image(images[i])
+    if chunks is True or compression:
+        # About 1MB chunks
+        row_bytes = int(np.prod(d_imgshape[1:])) * dtype.itemsize
+        x_chunks = (max(1, min(len(images), (1 << 20) // row_bytes)),) + \
+            d_imgshape[1:]
+        y_chunks = (min(len(images), 4096),) + d_labelshape[1:]
+    if slab_size is None:
+        slab_size = x_chunks[0] * max(1, 256 // x_chunks[0]) \
+            if x_chunks else 256
+
+    # Identify the build, to only resume a build of the same dataset
+    signature = hashlib.md5(repr((
+        images, labels, d_imgshape, d_labelshape, str(dtype), normalize,
+        compression, x_chunks)).encode('utf-8')).hexdigest()
+    n_built = 0
+    dataset = None
+    if resume and os.path.exists(output_path):
+        dataset = h5py.File(output_path, 'r+')
+        if dataset.attrs.get('signature') == signature:
+            n_built = int(dataset.attrs['n_built'])
+        else:
+            dataset.close()
+            dataset = None
+    if dataset is None:
+        dataset = h5py.File(output_path, 'w')
+        dataset.create_dataset('X', d_imgshape, dtype=dtype, chunks=x_chunks,
+                               compression=compression)
+        dataset.create_dataset('Y', d_labelshape, chunks=y_chunks,
+                               compression=compression)
+        if categorical_labels:
+            dataset['Y'][:] = to_categorical(labels, n_classes)
+        else:
+            dataset['Y'][:] = labels
+        if dtype == np.uint8:
+            dataset['X'].attrs['scale'] = 1. / 255. if normalize else 1.
+        dataset.attrs['signature'] = signature
+        dataset.attrs['n_built'] = 0
+        dataset.flush()
+
+    slabs = [(images[i:i + slab_size], image_shape, grayscale,
+              normalize, dtype) for i in range(n_built, len(images),
+                                                slab_size)]
+    pool = None
+    if num_workers != 0:
+        import multiprocessing
+        num_workers = num_workers or multiprocessing.cpu_count()
+        pool = multiprocessing.Pool(num_workers)
+    try:
+        # Slabs are loaded ahead of writing by at most 2 per worker
+        loaded = _bounded_imap(pool, _load_image_slab, slabs,
+                               2 * num_workers) if pool else \
+            map(_load_image_slab, slabs)
+        for slab in loaded:
+            dataset['X'][n_built:n_built + len(slab)] = slab
+            n_built += len(slab)
+            # Checkpoint
+            dataset.attrs['n_built'] = n_built
+            dataset.flush()
+    finally:
+        if pool:
+            pool.terminate()
+        dataset.close()
+
+
+def _bounded_imap(pool, func, iterable, max_pending):
+    """ Ordered `pool.imap`, with at most `max_pending` tasks in flight (so
+    results don't pile up in memory when they are consumed slower than they
+    are computed). """
+    iterable = iter(iterable)
+    pending = collections.deque(
+        pool.apply_async(func, (args,)) for args in
+        itertools.islice(iterable, max_pending))
+    while pending:
+        result = pending.popleft().get()
+        for args in itertools.islice(iterable, 1):
+            pending.append(pool.apply_async(func, (args,)))
+        yield result
+
+
+def _load_image_slab(args):
+    """ Load, resize and convert a slab of images (in a worker process). """
+    paths, image_shape, grayscale, normalize, dtype = args
+    slab = np.empty((len(paths), image_shape[0], image_shape[1]) +
+                    (() if grayscale else (3,)), dtype=dtype)
+    for i, path in enumerate(paths):
+        img = load_image(path)
         width, height = img.size
         if width != image_shape[0] or height != image_shape[1]:
             img = resize_image(img, image_shape[0], image_shape[1])
         if grayscale:
             img = convert_color(img, 'L')
-        elif img.mode == 'L':
+        elif img.mode != 'RGB':
             img = convert_color(img, 'RGB')
+        img.load()
+        slab[i] = np.asarray(img)
+    if normalize and dtype != np.uint8:
+        slab /= 255.
+    return slab
 
-        img = pil_to_nparray(img)
-        if normalize:
-            img /= 255.
-        dataset['X'][i] = img
-        if categorical_labels:
-            dataset['Y'][i] = to_categorical([labels[i]], n_classes)[0]
-        else:
-            dataset['Y'][i] = labels[i]
 
 def get_img_channel(image_path):
     """
@@ -433,7 +769,8 @@ def get_img_channel(image_path):
 
 def image_preloader(target_path, image_shape, mode='file', normalize=True,
                     grayscale=False, categorical_labels=True,
-                    files_extension=None, filter_channel=False):
+                    files_extension=None, filter_channel=False,
+                    cache_size=0, cache_path=None, executor=None):
     """ Image PreLoader.
 
     Create a python array (`Preloader`) that loads images on the fly (from
@@ -502,6 +839,12 @@ def image_preloader(target_path, image_shape, mode='file', normalize=True,
             all files are allowed.
         filter_channel: `bool`. If true, images which the channel is not 3 should
             be filter.
+        cache_size: `int`. Maximum size (in bytes) of the in-memory cache of
+            decoded images (see `ImagePreloader`). Default: 0.
+        cache_path: `str`. Optional path prefix of a memory-mapped disk cache
+            of decoded images (see `ImagePreloader`).
+        executor: `int` or executor. Optional number of threads, or pool
+            decoding images concurrently (see `Preloader`).
 
     Returns:
         (X, Y): with X the images array and Y the labels array.
@@ -524,7 +867,9 @@ def image_preloader(target_path, image_shape, mode='file', normalize=True,
                     labels.append(int(l[1]))
 
     n_classes = np.max(labels) + 1
-    X = ImagePreloader(images, image_shape, normalize, grayscale)
+    X = ImagePreloader(images, image_shape, normalize, grayscale,
+                       cache_size=cache_size, cache_path=cache_path,
+                       executor=executor)
     Y = LabelPreloader(labels, n_classes, categorical_labels)
 
     return X, Y
@@ -748,17 +1093,175 @@ def directory_to_samples(directory, flags=None, filter_channel=False):
     return samples, targets
 
 
+# ====================
+#   TFRECORDS UTILS
+# ====================
+
+# Types supported by `tf.decode_raw`, other types are stored as one of them
+_TFRECORDS_RAW_DTYPES = ['float16', 'float32', 'float64', 'uint8', 'int8',
+                         'int16', 'int32', 'int64']
+
+
+def build_tfrecords_dataset(X, Y, output_path='dataset', n_shards=1,
+                            chunk_size=1024):
+    """ Build TFRecords Dataset.
+
+    Convert a dataset into sharded TFRecords files, to be streamed with
+    `tflearn.data_flow.TFRecordsFlow`. Data can be numpy arrays or HDF5
+    datasets (that are read by chunk, so they don't need to fit in memory).
+
+    Every sample is written as a `tf.train.Example`, holding each input
+    ('X', or 'X0', 'X1'... for multiple inputs) and target ('Y', or 'Y0',
+    'Y1'...) as raw bytes. Shards are written to
+    'output_path-00000-of-0000n', along with a 'output_path.json' file
+    describing the dataset (number of samples, shards, and features shape
+    and dtype).
+
+    Examples:
+        ```
+        # Convert numpy arrays
+        build_tfrecords_dataset(X, Y, output_path='cifar10', n_shards=8)
+
+        # Convert a dataset built with `build_hdf5_image_dataset`
+        hdf5_to_tfrecords('dataset.h5', output_path='dataset', n_shards=8)
+
+        # Train from records
+        df = tflearn.data_flow.TFRecordsFlow('dataset', batch_size=128,
+                                             shuffle=True, continuous=True)
+        model.fit(df, None, n_epoch=10)
+        ```
+
+    Arguments:
+        X: `array`, HDF5 dataset or `list` of them (for multiple inputs).
+            The input data.
+        Y: `array`, HDF5 dataset or `list` of them (for multiple outputs).
+            The targets data. Can be None.
+        output_path: `str`. The output path (prefix) of the dataset files.
+            Default: 'dataset'.
+        n_shards: `int`. The number of files to split records into.
+        chunk_size: `int`. Number of samples to read at once from data.
+
+    Returns:
+        `str`. The dataset description file path.
+
+    """
+    import json
+    import tensorflow as tf
+
+    features = _tfrecords_features(X, 'X')
+    if Y is not None:
+        features += _tfrecords_features(Y, 'Y')
+    n_samples = len(features[0][1])
+    for name, data in features:
+        assert len(data) == n_samples, \
+            "'%s' length doesn't match other data length." % name
+    n_shards = max(1, min(n_shards, n_samples))
+
+    meta = {'n_samples': n_samples, 'shards': [], 'features': {}}
+    for name, data in features:
+        dtype = np.dtype(data.dtype)
+        raw_dtype = _tfrecords_raw_dtype(dtype)
+        meta['features'][name] = {'dtype': dtype.name,
+                                  'raw_dtype': raw_dtype.name,
+                                  'shape': list(data.shape[1:])}
+
+    # Shards hold contiguous samples, so data is read sequentially.
+    bounds = np.linspace(0, n_samples, n_shards + 1).astype('int64')
+    for shard in range(n_shards):
+        shard_path = '%s-%05d-of-%05d' % (output_path, shard, n_shards)
+        meta['shards'].append(os.path.basename(shard_path))
+        writer = tf.python_io.TFRecordWriter(shard_path)
+        for start in range(bounds[shard], bounds[shard + 1], chunk_size):
+            end = min(start + chunk_size, bounds[shard + 1])
+            chunks = []
+            for name, data in features:
+                raw_dtype = meta['features'][name]['raw_dtype']
+                chunks.append((name, np.asarray(data[start:end],
+                                                dtype=raw_dtype)))
+            for i in range(end - start):
+                example = tf.train.Example(features=tf.train.Features(
+                    feature={name: tf.train.Feature(
+                        bytes_list=tf.train.BytesList(
+                            value=[chunk[i].tobytes()]))
+                        for name, chunk in chunks}))
+                writer.write(example.SerializeToString())
+        writer.close()
+
+    meta_path = output_path + '.json'
+    with open(meta_path, 'w') as f:
+        json.dump(meta, f)
+    return meta_path
+
+
+def hdf5_to_tfrecords(hdf5_path, output_path='dataset', n_shards=1,
+                      chunk_size=1024):
+    """ HDF5 to TFRecords.
+
+    Convert an HDF5 dataset holding 'X' and 'Y' datasets (such as the ones
+    built by `build_hdf5_image_dataset`) into sharded TFRecords files. See
+    `build_tfrecords_dataset`.
+
+    Arguments:
+        hdf5_path: `str`. The HDF5 dataset path.
+        output_path: `str`. The output path (prefix) of the dataset files.
+        n_shards: `int`. The number of files to split records into.
+        chunk_size: `int`. Number of samples to read at once from data.
+
+    Returns:
+        `str`. The dataset description file path.
+
+    """
+    import h5py
+    with h5py.File(hdf5_path, 'r') as h5f:
+        Y = h5f['Y'] if 'Y' in h5f else None
+        return build_tfrecords_dataset(h5f['X'], Y, output_path, n_shards,
+                                       chunk_size)
+
+
+def _tfrecords_raw_dtype(dtype):
+    """ Returns the dtype used to store data of a given dtype """
+    if dtype.name in _TFRECORDS_RAW_DTYPES:
+        return dtype
+    if dtype.kind in 'biu':
+        return np.dtype('uint8') if dtype.itemsize == 1 else np.dtype('int64')
+    return np.dtype('float32')
+
+
+def _tfrecords_features(data, prefix):
+    """ Returns a list of (feature name, data) """
+    if type(data) in [list, tuple]:
+        if len(data) > 1:
+            return [(prefix + str(i), d) for i, d in enumerate(data)]
+        data = data[0]
+    if not hasattr(data, 'dtype'):
+        data = np.asarray(data)
+    return [(prefix, data)]
+
+
 # ==================
 #    OTHERS
 # ==================
 
 def load_csv(filepath, target_column=-1, columns_to_ignore=None,
-             has_header=True, categorical_labels=False, n_classes=None):
+             has_header=True, categorical_labels=False, n_classes=None,
+             dtype=None, categorical_columns=None):
     """ load_csv.
 
     Load data from a CSV file. By default the labels are considered to be the
     last column, but it can be changed by filling 'target_column' parameter.
 
+    By default, rows are returned as lists of strings. If `dtype` is set,
+    the file is parsed by a `CSVReader` (by chunks, column by column), and
+    typed arrays are returned instead (much faster for large files).
+
+    Examples:
+        ```python
+        # Typed arrays, with 'sex' (column 3) encoded as integer ids
+        data, target = load_csv('titanic.csv', target_column=0,
+                                columns_to_ignore=[2, 7],
+                                categorical_columns=[3], dtype='float32')
+        ```
+
     Arguments:
         filepath: `str`. The csv file path.
         target_column: The id of the column representing the labels.
@@ -769,11 +1272,25 @@ def load_csv(filepath, target_column=-1, columns_to_ignore=None,
             vectors (to be used with 'categorical_crossentropy').
         n_classes: `int`. Total number of class (needed if
             categorical_labels is True).
+        dtype: `str` or `dtype`. If set (such as 'float32'), data and target
+            are returned as arrays of that type. Default: None (lists of
+            strings).
+        categorical_columns: `list of int`. Columns (file index) of string
+            values, encoded as integer ids (only used if `dtype` is set,
+            see `CSVReader`).
 
     Returns:
         A tuple (data, target).
 
     """
+    if dtype is not None:
+        reader = CSVReader(filepath, target_column=target_column,
+                           columns_to_ignore=columns_to_ignore,
+                           has_header=has_header,
+                           categorical_columns=categorical_columns,
+                           categorical_labels=categorical_labels,
+                           n_classes=n_classes, dtype=dtype)
+        return reader.read()
 
     from tensorflow.python.platform import gfile
     with gfile.Open(filepath) as csv_file:
@@ -796,47 +1313,671 @@ def load_csv(filepath, target_column=-1, columns_to_ignore=None,
         return data, target
 
 
+# np.loadtxt parses quoted fields (with its C parser) since numpy 1.23
+_LOADTXT_QUOTECHAR = np.lib.NumpyVersion(np.__version__) >= '1.23.0'
+
+
+class CSVReader(object):
+    """ CSVReader.
+
+    Typed and chunked CSV reader. Rows are read by chunks of `chunk_size`
+    rows, and every chunk is parsed by numpy C parser (`np.loadtxt`, with
+    numpy >= 1.23, else by the csv module and converted column by column)
+    into a (n_rows, n_features) data array and a target array. String columns listed in `categorical_columns`
+    are encoded as integer ids through a vocabulary (built while reading,
+    by order of appearance). Empty numeric fields are read as
+    `missing_value`.
+
+    Iterating over it yields (data, target) tuples for every chunk, so files
+    larger than memory can be streamed. It can be iterated multiple times,
+    and can directly be provided to `DNN.fit` (that streams chunks through a
+    single `data_flow.ChunkFlow`). Its `len` is the number of rows. `read`
+    loads the whole file at once.
+
+    Examples:
+        ```python
+        reader = CSVReader('titanic.csv', target_column=0,
+                           columns_to_ignore=[2, 7], categorical_columns=[3],
+                           categorical_labels=True, n_classes=2)
+        # Whole file
+        data, labels = reader.read()
+        # Or stream it by chunks
+        model.fit(reader, None, n_epoch=10)
+        ```
+
+    Arguments:
+        filepath: `str`. The csv file path.
+        target_column: `int`. The id of the column representing the labels.
+            If None, there is no target column (target is then None).
+            Default: -1 (The last column).
+        columns_to_ignore: `list of int`. A list of columns index to ignore.
+        has_header: `bool`. Whether the csv file has a header or not.
+        categorical_columns: `list of int`. A list of columns index whose
+            (string) values are encoded as integer ids. It can include the
+            target column.
+        vocabularies: `dict`. Optional pre-defined vocabularies, as
+            {column index: {value: id}}. They are extended with unseen values.
+        categorical_labels: `bool`. If True, labels are returned as binary
+            vectors (to be used with 'categorical_crossentropy').
+        n_classes: `int`. Total number of class (needed if
+            categorical_labels is True).
+        dtype: `str` or `dtype`. The data type. Default: 'float32'.
+        target_dtype: `str` or `dtype`. The target type. Default: None (same
+            as `dtype`).
+        missing_value: `float`. The value of empty numeric fields.
+            Default: NaN.
+        chunk_size: `int`. Number of rows per chunk. Default: 65536.
+
+    Attributes:
+        header: `list of str`. The file header (None if `has_header` is
+            False).
+        vocabularies: `dict`. The vocabularies of categorical columns, as
+            {column index: {value: id}}.
+
+    """
+
+    def __init__(self, filepath, target_column=-1, columns_to_ignore=None,
+                 has_header=True, categorical_columns=None, vocabularies=None,
+                 categorical_labels=False, n_classes=None, dtype='float32',
+                 target_dtype=None, missing_value=float('nan'),
+                 chunk_size=65536):
+        if categorical_labels and not n_classes:
+            raise ValueError("n_classes not specified!")
+        self.filepath = filepath
+        self.has_header = has_header
+        self.categorical_labels = categorical_labels
+        self.n_classes = n_classes
+        self.dtype = np.dtype(dtype)
+        self.target_dtype = np.dtype(target_dtype or dtype)
+        self.missing_value = missing_value
+        self.chunk_size = chunk_size
+        self.vocabularies = dict((c, dict(v)) for c, v in
+                                 (vocabularies or {}).items())
+
+        # Resolve (negative) columns index with the number of columns
+        with self._open() as csv_file:
+            first_row = next(csv.reader(csv_file), [])
+        self.n_columns = len(first_row)
+        self.header = first_row if has_header else None
+
+        def resolve(c):
+            if not -self.n_columns <= c < self.n_columns:
+                raise ValueError("Column %d out of range (%d columns)" %
+                                 (c, self.n_columns))
+            return c % self.n_columns
+        self.target_column = None
+        if target_column is not None:
+            self.target_column = resolve(target_column)
+        ignored = set(resolve(c) for c in columns_to_ignore or [])
+        self.categorical_columns = set(resolve(c) for c in
+                                       categorical_columns or [])
+        self.vocabularies = dict((resolve(c), v) for c, v in
+                                 self.vocabularies.items())
+        self.feature_columns = [c for c in range(self.n_columns) if c not in
+                                ignored and c != self.target_column]
+        self._n_rows = None
+
+    def _open(self):
+        from tensorflow.python.platform import gfile
+        return gfile.Open(self.filepath)
+
+    def __len__(self):
+        # Rows are counted with a pass over the file (once)
+        if self._n_rows is None:
+            with self._open() as csv_file:
+                rows = csv.reader(csv_file)
+                if self.has_header:
+                    next(rows, None)
+                # Blank lines are skipped
+                self._n_rows = sum(1 for r in rows if r)
+        return self._n_rows
+
+    def __iter__(self):
+        with self._open() as csv_file:
+            if self.has_header:
+                next(csv.reader(csv_file), None)
+            for lines in self._iter_records(csv_file):
+                chunk = self._convert(lines)
+                if chunk is not None:
+                    yield chunk
+
+    def read(self):
+        """ read.
+
+        Read the whole file.
+
+        Returns:
+            A tuple (data, target) of arrays.
+
+        """
+        chunks = list(self)
+        if not chunks:
+            data = np.zeros((0, len(self.feature_columns)), self.dtype)
+            target = None
+            if self.target_column is not None:
+                shape = (0, self.n_classes) if self.categorical_labels \
+                    else (0,)
+                target = np.zeros(shape, self.target_dtype)
+            return data, target
+        if len(chunks) == 1:
+            return chunks[0]
+        data = np.concatenate([c[0] for c in chunks])
+        target = None
+        if self.target_column is not None:
+            target = np.concatenate([c[1] for c in chunks])
+        return data, target
+
+    def _iter_records(self, csv_file):
+        """ Yield chunks of `chunk_size` lines, extended to end with a
+        complete record (quoted fields may contain line breaks). """
+        while True:
+            lines = list(itertools.islice(csv_file, self.chunk_size))
+            if not lines:
+                return
+            n_quotes = ''.join(lines).count('"')
+            while n_quotes % 2:
+                line = next(csv_file, None)
+                if line is None:
+                    break
+                lines.append(line)
+                n_quotes += line.count('"')
+            yield lines
+
+    def _convert(self, lines):
+        columns = None
+        if _LOADTXT_QUOTECHAR:
+            try:
+                columns = self._parse_columns(lines)
+            except ValueError:
+                # Missing values or malformed rows, parsed (and reported)
+                # by the csv module below
+                pass
+        if columns is None:
+            rows = self._check_rows(list(csv.reader(lines)))
+            columns = dict(enumerate(zip(*rows)))
+        n_rows = len(next(iter(columns.values()), ()))
+        if n_rows == 0:
+            return None
+        data = np.empty((n_rows, len(self.feature_columns)), self.dtype)
+        for j, c in enumerate(self.feature_columns):
+            data[:, j] = self._convert_column(c, columns[c], self.dtype)
+        target = None
+        if self.target_column is not None:
+            target = self._convert_column(self.target_column,
+                                          columns[self.target_column],
+                                          self.target_dtype)
+            if self.categorical_labels:
+                target = to_categorical(target, self.n_classes,
+                                        dtype=self.target_dtype)
+        return data, target
+
+    def _parse_columns(self, lines):
+        """ Parse lines with numpy C parser, numeric columns at once and
+        categorical columns as strings. Returns {column index: values}. """
+        groups = collections.OrderedDict()
+        for c in self.feature_columns:
+            dtype = str if c in self.categorical_columns else self.dtype
+            groups.setdefault(dtype, []).append(c)
+        if self.target_column is not None:
+            c = self.target_column
+            dtype = str if c in self.categorical_columns else \
+                self.target_dtype
+            groups.setdefault(dtype, []).append(c)
+        columns = {}
+        with warnings.catch_warnings():
+            # Chunks of blank lines
+            warnings.simplefilter('ignore')
+            for dtype, cols in groups.items():
+                values = np.loadtxt(lines, dtype=dtype, delimiter=',',
+                                    quotechar='"', comments=None,
+                                    usecols=cols, ndmin=2)
+                for j, c in enumerate(cols):
+                    columns[c] = values[:, j]
+        return columns
+
+    def _check_rows(self, rows):
+        if set(map(len, rows)) == set([self.n_columns]):
+            return rows
+        # Skip blank lines
+        rows = [r for r in rows if r]
+        for r in rows:
+            if len(r) != self.n_columns:
+                raise ValueError("Expected %d columns, found a row with %d "
+                                 "columns: %s" % (self.n_columns, len(r),
+                                                  str(r)))
+        return rows
+
+    def _convert_column(self, c, values, dtype):
+        if c in self.categorical_columns:
+            if isinstance(values, np.ndarray):
+                values = values.tolist()
+            vocab = self.vocabularies.setdefault(c, {})
+            # Unseen values get the next ids, by order of appearance
+            for v in collections.OrderedDict.fromkeys(values):
+                if v not in vocab:
+                    vocab[v] = len(vocab)
+            return np.fromiter(map(vocab.__getitem__, values), dtype,
+                               count=len(values))
+        try:
+            return np.asarray(values, dtype=dtype)
+        except ValueError:
+            # Empty fields are missing values
+            values = [v if v.strip() else self.missing_value for v in values]
+            try:
+                return np.array(values, dtype=dtype)
+            except ValueError as e:
+                raise ValueError("Column %d is not numeric (%s), you may add "
+                                 "it to 'categorical_columns' or "
+                                 "'columns_to_ignore'." % (c, str(e)))
+
+
+def load_npy_cache(cache_dir, names, build, mmap_mode=None):
+    """ load_npy_cache.
+
+    Load arrays from `.npy` files (one per name) in `cache_dir`. On first
+    use (if any file is missing), arrays are built with `build` and saved.
+    If `mmap_mode` is set, arrays are memory-mapped, so they are only read
+    when accessed, and several processes share them in the page cache.
+
+    Examples:
+        ```python
+        X, Y = load_npy_cache('cache', ['X', 'Y'], build_fn, mmap_mode='r')
+        ```
+
+    Arguments:
+        cache_dir: `str`. The cache directory.
+        names: `list` of `str`. The arrays names.
+        build: `function`. Returns the list of arrays (in `names` order).
+        mmap_mode: `str`. Optional memory-map mode, such as 'r'.
+
+    Returns:
+        A `list` of arrays (memory-mapped if `mmap_mode` is set).
+
+    """
+    paths = [os.path.join(cache_dir, name + '.npy') for name in names]
+    if not all(os.path.exists(p) for p in paths):
+        try:
+            os.makedirs(cache_dir)
+        except OSError:
+            # Already existing (possibly created by another process)
+            if not os.path.isdir(cache_dir):
+                raise
+        for path, array in zip(paths, build()):
+            # Write then rename, so other processes never read a partial file
+            tmp_path = "%s.%d.tmp" % (path, os.getpid())
+            with open(tmp_path, 'wb') as f:
+                np.save(f, np.ascontiguousarray(array))
+            os.rename(tmp_path, path)
+    return [np.load(p, mmap_mode=mmap_mode) for p in paths]
+
+
 class Preloader(object):
-    def __init__(self, array, function):
+    """ Preloader.
+
+    A python array that loads samples on the fly, by applying `function` to
+    the elements of `array`.
+
+    A batch of samples (list, array or slice of indexes) is loaded
+    concurrently if an `executor` is provided, and assembled into a single
+    array (if all samples have the same shape).
+
+    Arguments:
+        array: `list` or `array`. The elements to load samples from.
+        function: `function`. Function loading a sample from an element.
+        executor: `int` or executor. Optional number of threads, or pool
+            (such as `concurrent.futures` executors, or `multiprocessing`
+            pools) loading samples. With thread pools, samples are written
+            directly into the batch array; with process pools, samples are
+            loaded by chunks (and only the chunk elements are sent to the
+            workers).
+
+    """
+    def __init__(self, array, function, executor=None):
         self.array = array
         self.function = function
+        if isinstance(executor, int):
+            from multiprocessing.pool import ThreadPool
+            self._n_workers = executor
+            executor = ThreadPool(executor)
+        else:
+            self._n_workers = _pool_size(executor)
+        self.executor = executor
+
+    @property
+    def n_workers(self):
+        """ Number of workers loading samples concurrently (1 without
+        executor). """
+        return self._n_workers
 
     def __getitem__(self, id):
         if type(id) in [list, np.ndarray]:
-            return [self.function(self.array[i]) for i in id]
+            return self.load_batch(id)
         elif isinstance(id, slice):
-            return [self.function(arr) for arr in self.array[id]]
+            return self.load_batch(range(*id.indices(len(self))))
         else:
-            return self.function(self.array[id])
+            return self.load(id)
 
     def __len__(self):
         return len(self.array)
 
+    def load(self, index):
+        """ Load sample `index`. """
+        return self.function(self.array[index])
+
+    def load_batch(self, ids):
+        """ Load samples `ids`, returns an `array` (or a `list` if samples
+        shapes differ). """
+        ids = list(ids)
+        if not ids:
+            return []
+        if self.executor is None:
+            return _stack_samples([self.load(i) for i in ids])
+        if _is_thread_pool(self.executor):
+            # Load the first sample to allocate the batch, then all other
+            # samples are directly written into it
+            first = np.asarray(self.load(ids[0]))
+            batch = np.empty((len(ids),) + first.shape, dtype=first.dtype)
+            batch[0] = first
+            ragged = []
+
+            def load_into(i):
+                sample = np.asarray(self.load(ids[i]))
+                if sample.shape != first.shape:
+                    ragged.append(i)
+                    return sample
+                batch[i] = sample
+            samples = list(self.executor.map(load_into,
+                                             range(1, len(ids))))
+            if not ragged:
+                return batch
+            return [first] + [batch[i] if s is None else s
+                              for i, s in enumerate(samples, 1)]
+        # Process pool: load by chunks (one per worker at most)
+        n_chunks = min(len(ids), self.n_workers)
+        chunks = [ids[i::n_chunks] for i in range(n_chunks)]
+        loaded = list(self.executor.map(_load_samples,
+                                        [(self.select(c), c) for c in chunks]))
+        samples = [None] * len(ids)
+        for i in range(n_chunks):
+            samples[i::n_chunks] = loaded[i]
+        return _stack_samples(samples)
+
+    def select(self, ids):
+        """ Returns a shallow copy of the preloader holding only elements
+        `ids` (still indexed by their position in `array`). """
+        preloader = copy.copy(self)
+        preloader.array = dict((i, self.array[i]) for i in ids)
+        return preloader
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        # Pools can't be pickled (and are not needed in workers)
+        state['executor'] = None
+        return state
+
+
+def _load_samples(args):
+    """ Load a chunk of samples (in a worker process). """
+    preloader, ids = args
+    return [preloader.load(i) for i in ids]
+
+
+def _stack_samples(samples):
+    """ Stack samples into an array, if they all have the same shape. """
+    shape = np.shape(samples[0])
+    if any(np.shape(s) != shape for s in samples):
+        return samples
+    return np.asarray(samples)
+
+
+def _pool_size(executor):
+    """ Number of workers of an executor (or pool). """
+    if executor is None:
+        return 1
+    # Neither `concurrent.futures` executors nor `multiprocessing` pools
+    # expose their size publicly
+    for attr in ['_max_workers', '_processes']:
+        if getattr(executor, attr, None):
+            return getattr(executor, attr)
+    import multiprocessing
+    return multiprocessing.cpu_count()
+
+
+def _is_thread_pool(executor):
+    from multiprocessing.pool import ThreadPool
+    try:
+        from concurrent.futures import ThreadPoolExecutor
+    except ImportError:
+        ThreadPoolExecutor = ThreadPool
+    return isinstance(executor, (ThreadPool, ThreadPoolExecutor))
+
 
 class ImagePreloader(Preloader):
-    def __init__(self, array, image_shape, normalize=True, grayscale=False):
-        fn = lambda x: self.preload(x, image_shape, normalize, grayscale)
-        super(ImagePreloader, self).__init__(array, fn)
+    """ ImagePreloader.
+
+    Load images on the fly from their paths (decode, resize and normalize).
+
+    Decoded images can be cached (as uint8 arrays): a bounded in-memory LRU
+    cache holds up to `cache_size` bytes of images, and if `cache_path` is
+    provided, decoded images are also spilled to a memory-mapped file (with
+    one slot per image), so images are decoded only once, even across runs.
+    Cached images are keyed by path, modification time and target shape.
+    Cache statistics (size and hit ratio) are available with `cache_info`.
+
+    Examples:
+        ```python
+        # 2GB in-memory cache, and disk cache of all images
+        X = ImagePreloader(paths, (128, 128), cache_size=2 << 30,
+                           cache_path='/tmp/images_cache')
+        model.fit(X, Y, n_epoch=10)
+        print(X.cache_info())
+        ```
+
+    Arguments:
+        array: `list` of `str`. The images paths.
+        image_shape: `tuple (width, height)`. The images shape. Images that
+            doesn't match that shape will be resized.
+        normalize: `bool`. If True, normalize images by dividing them by 255.
+        grayscale: `bool`. If true, images are converted to grayscale.
+        cache_size: `int`. Maximum size (in bytes) of the in-memory cache of
+            decoded images. Default: 0 (no in-memory cache).
+        cache_path: `str`. Optional path prefix of the memory-mapped disk
+            cache files.
+        executor: `int` or executor. Optional number of threads, or pool
+            decoding images concurrently (see `Preloader`).
 
-    def preload(self, path, image_shape, normalize=True, grayscale=False):
+    """
+    def __init__(self, array, image_shape, normalize=True, grayscale=False,
+                 cache_size=0, cache_path=None, executor=None):
+        # Not bound to the preloader, so that selected copies sent to worker
+        # processes don't carry the whole array with them
+        fn = functools.partial(ImagePreloader.preload,
+                               image_shape=image_shape, normalize=normalize,
+                               grayscale=grayscale)
+        super(ImagePreloader, self).__init__(array, fn, executor)
+        self.image_shape = image_shape
+        self.normalize = normalize
+        self.grayscale = grayscale
+        self.cache = None
+        if cache_size or cache_path:
+            self.cache = ImageCache(
+                len(array), (image_shape[1], image_shape[0]) +
+                (() if grayscale else (3,)), cache_size, cache_path)
+
+    def load(self, index):
+        if self.cache is None:
+            return super(ImagePreloader, self).load(index)
+        path = self.array[index]
+        img = self.cache.get(index, self.cache_key(path),
+                             lambda: self.decode(path, self.image_shape,
+                                                 self.grayscale))
+        img = img.astype(np.float32)
+        if self.normalize:
+            img /= 255.
+        return img
+
+    @staticmethod
+    def preload(path, image_shape, normalize=True, grayscale=False):
+        img = pil_to_nparray(ImagePreloader.load_resized(path, image_shape,
+                                                         grayscale))
+        if normalize:
+            img /= 255.
+        return img
+
+    @staticmethod
+    def decode(path, image_shape, grayscale=False):
+        """ Decode and resize an image, as an uint8 array. """
+        img = ImagePreloader.load_resized(path, image_shape, grayscale)
+        img.load()
+        return np.asarray(img, dtype=np.uint8)
+
+    @staticmethod
+    def load_resized(path, image_shape, grayscale=False):
+        """ Load an image, resized to `image_shape`, returns PIL.Image. """
         img = load_image(path)
         width, height = img.size
         if width != image_shape[0] or height != image_shape[1]:
             img = resize_image(img, image_shape[0], image_shape[1])
         if grayscale:
             img = convert_color(img, 'L')
-        img = pil_to_nparray(img)
-        if normalize:
-            img /= 255.
         return img
 
+    def cache_key(self, path):
+        """ Cache key of an image (from its path, modification time and
+        target shape). """
+        try:
+            mtime = os.path.getmtime(path)
+        except OSError:
+            mtime = None
+        digest = hashlib.md5(repr((path, mtime, tuple(self.image_shape),
+                                   self.grayscale)).encode('utf-8'))
+        # Positive, non zero int64 (0 marks empty disk cache slots)
+        return int(digest.hexdigest()[:15], 16) | 1
+
+    def cache_info(self):
+        """ Returns cache statistics (a `dict`), or None if there is no
+        cache. """
+        return self.cache.info() if self.cache is not None else None
+
+
+class ImageCache(object):
+    """ ImageCache.
+
+    Cache of decoded images, with a bounded in-memory LRU cache and an
+    optional memory-mapped disk spill file (see `ImagePreloader`).
+
+    Arguments:
+        n_slots: `int`. Number of images (one disk slot per image).
+        shape: `tuple`. Images shape (only images of that shape are spilled
+            to disk).
+        max_size: `int`. Maximum size (in bytes) of the in-memory cache.
+        path: `str`. Optional path prefix of the disk cache files.
+
+    """
+    def __init__(self, n_slots, shape, max_size=0, path=None):
+        self.max_size = max_size
+        self.size = 0
+        self.entries = collections.OrderedDict()
+        self.lock = threading.Lock()
+        self.hits, self.disk_hits, self.misses = 0, 0, 0
+        self.n_slots, self.shape, self.path = n_slots, tuple(shape), path
+        self.open_disk_cache()
+
+    def open_disk_cache(self):
+        self.images, self.keys = None, None
+        if self.path:
+            self.images = _open_memmap(self.path + '.images.npy', np.uint8,
+                                       (self.n_slots,) + self.shape)
+            self.keys = _open_memmap(self.path + '.keys.npy', np.int64,
+                                     (self.n_slots,))
+
+    def __getstate__(self):
+        # Memory-mapped files are re-opened (and memory cache emptied) when
+        # unpickled (such as in worker processes)
+        state = self.__dict__.copy()
+        for k in ['lock', 'images', 'keys']:
+            del state[k]
+        state['entries'] = collections.OrderedDict()
+        state['size'] = 0
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.lock = threading.Lock()
+        self.open_disk_cache()
+
+    def get(self, index, key, load):
+        """ Returns image `index` from cache, or from `load()` (and cache
+        it). """
+        with self.lock:
+            entry = self.entries.pop(index, None)
+            if entry is not None and entry[0] == key:
+                # Move to most recently used
+                self.entries[index] = entry
+                self.hits += 1
+                return entry[1]
+            elif entry is not None:
+                self.size -= entry[1].nbytes
+        if self.keys is not None and self.keys[index] == key:
+            img = np.array(self.images[index])
+            with self.lock:
+                self.disk_hits += 1
+        else:
+            img = load()
+            with self.lock:
+                self.misses += 1
+            if self.keys is not None and img.shape == self.images.shape[1:]:
+                self.images[index] = img
+                # Key is written last, so the slot is only valid when full
+                self.keys[index] = key
+        if img.nbytes <= self.max_size:
+            with self.lock:
+                if index not in self.entries:
+                    self.entries[index] = (key, img)
+                    self.size += img.nbytes
+                while self.size > self.max_size:
+                    self.size -= self.entries.popitem(last=False)[1][1].nbytes
+        return img
+
+    def info(self):
+        """ Returns cache statistics (a `dict`). """
+        total = self.hits + self.disk_hits + self.misses
+        return {'hits': self.hits, 'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'hit_ratio': (self.hits + self.disk_hits) / max(total, 1),
+                'size': self.size, 'max_size': self.max_size,
+                'n_cached': len(self.entries)}
+
+
+def _open_memmap(path, dtype, shape):
+    """ Open (or create, if missing or of another shape) a `.npy` memory-mapped
+    array. """
+    if os.path.exists(path):
+        array = np.load(path, mmap_mode='r+')
+        if array.shape == shape and array.dtype == dtype:
+            return array
+        del array
+    return np.lib.format.open_memmap(path, mode='w+', dtype=dtype,
+                                     shape=shape)
+
 
 class LabelPreloader(Preloader):
     def __init__(self, array, n_class=None, categorical_label=True):
-        fn = lambda x: self.preload(x, n_class, categorical_label)
-        super(LabelPreloader, self).__init__(array, fn)
-
-    def preload(self, label, n_class, categorical_label):
+        fn = functools.partial(LabelPreloader.preload, n_class=n_class,
+                               categorical_label=categorical_label)
+        # Converted once, so batches of labels are loaded at once
+        super(LabelPreloader, self).__init__(np.asarray(array), fn)
+        self.n_class = n_class
+        self.categorical_label = categorical_label
+
+    def load_batch(self, ids):
+        labels = self.array[np.asarray(ids, dtype=np.int64)]
+        if self.categorical_label:
+            return to_categorical(labels, self.n_class)
+        return labels
+
+    @staticmethod
+    def preload(label, n_class, categorical_label):
         if categorical_label:
             #TODO: inspect assert bug
             #assert isinstance(n_class, int)
@@ -845,6 +1986,83 @@ class LabelPreloader(Preloader):
             return label
 
 
+class OneHotPreloader(Preloader):
+    """ OneHotPreloader.
+
+    Lazily one-hot encode an array of indexes (such as chars or labels
+    indexes), so only the requested samples are encoded. This allows to
+    train on index data (`string_to_semi_redundant_sequences` with
+    `one_hot=False`) without storing its (much larger) one-hot encoding.
+
+    Examples:
+        ```python
+        X, Y, char_idx = textfile_to_semi_redundant_sequences(
+            path, seq_maxlen=25, one_hot=False)
+        X = OneHotPreloader(X, len(char_idx))
+        Y = OneHotPreloader(Y, len(char_idx))
+        X[[0, 3]] # array of shape (2, 25, len(char_idx))
+        ```
+
+    Arguments:
+        array: `array`. The indexes array, of any shape.
+        n_class: `int`. Total number of classes.
+        dtype: `str` or `dtype`. The encoded data type.
+
+    """
+    def __init__(self, array, n_class, dtype='float32'):
+        super(OneHotPreloader, self).__init__(array, None)
+        self.n_class = n_class
+        self.eye = np.eye(n_class, dtype=dtype)
+
+    def __getitem__(self, id):
+        return self.eye[np.asarray(self.array[id])]
+
+    @property
+    def shape(self):
+        return tuple(np.shape(self.array)) + (self.n_class,)
+
+
+class NormalizedArray(Preloader):
+    """ NormalizedArray.
+
+    Lazily normalize (scale) data when reading it, such as images stored as
+    uint8 by `build_hdf5_image_dataset` with `dtype='uint8'`, so data can be
+    stored 4x smaller than float32.
+
+    Examples:
+        ```python
+        h5f = h5py.File('dataset.h5', 'r')
+        X = NormalizedArray(h5f['X'])
+        X[[0, 3]] # float32 array, with values in [0, 1]
+        ```
+
+    Arguments:
+        array: `array`. The data, such as a HDF5 dataset.
+        scale: `float`. The scale factor. Default: the `scale` attribute of
+            the HDF5 dataset if any, 1/255 otherwise.
+        dtype: `str` or `dtype`. The normalized data type.
+
+    """
+    def __init__(self, array, scale=None, dtype='float32'):
+        super(NormalizedArray, self).__init__(array, None)
+        if scale is None:
+            scale = getattr(array, 'attrs', {}).get('scale', 1. / 255.)
+        self.scale = scale
+        self.dtype = np.dtype(dtype)
+
+    def __getitem__(self, id):
+        if hasattr(id, '__len__') and not isinstance(self.array, np.ndarray):
+            from .utils import read_rows
+            data = read_rows(self.array, id)
+        else:
+            data = self.array[id]
+        return np.multiply(data, self.scale, dtype=self.dtype)
+
+    @property
+    def shape(self):
+        return self.array.shape
+
+
 def get_max(X):
     return np.max(X)
 
@@ -13,42 +13,74 @@ import tarfile
 import numpy as np
 import pickle
 
-from ..data_utils import to_categorical
+from ..data_utils import to_categorical, load_npy_cache, \
+    NormalizedArray, OneHotPreloader
 
 
-def load_data(dirname="cifar-10-batches-py", one_hot=False):
+def load_data(dirname="cifar-10-batches-py", one_hot=False, mmap=False):
+    """ load_data.
+
+    Load CIFAR-10 (images shape: [32, 32, 3], normalized to [0, 1]). On first
+    use, the dataset is also saved as uint8 `.npy` files (in a 'npy_cache'
+    sub-folder), that are loaded instead of the original batches.
+
+    Arguments:
+        dirname: `str`. The dataset directory.
+        one_hot: `bool`. If True, labels are converted to binary vectors.
+        mmap: `bool`. If True, returns memory-mapped data (shared by all
+            processes using it), that is only normalized (or one-hot encoded)
+            when batches are read (see `NormalizedArray`).
+
+    Returns:
+        (X_train, Y_train), (X_test, Y_test)
+
+    """
     tarpath = maybe_download("cifar-10-python.tar.gz",
                              "http://www.cs.toronto.edu/~kriz/",
                              dirname)
-    X_train = []
-    Y_train = []
 
     if dirname != './cifar-10-batches-py':
         dirname = os.path.join(dirname, 'cifar-10-batches-py')
 
-    for i in range(1, 6):
-        fpath = os.path.join(dirname, 'data_batch_' + str(i))
-        data, labels = load_batch(fpath)
-        if i == 1:
-            X_train = data
-            Y_train = labels
-        else:
-            X_train = np.concatenate([X_train, data], axis=0)
-            Y_train = np.concatenate([Y_train, labels], axis=0)
-
-    fpath = os.path.join(dirname, 'test_batch')
-    X_test, Y_test = load_batch(fpath)
-
-    X_train = np.dstack((X_train[:, :1024], X_train[:, 1024:2048],
-                         X_train[:, 2048:])) / 255.
-    X_train = np.reshape(X_train, [-1, 32, 32, 3])
-    X_test = np.dstack((X_test[:, :1024], X_test[:, 1024:2048],
-                        X_test[:, 2048:])) / 255.
-    X_test = np.reshape(X_test, [-1, 32, 32, 3])
-
+    def build():
+        X_train, Y_train = [], []
+        for i in range(1, 6):
+            fpath = os.path.join(dirname, 'data_batch_' + str(i))
+            data, labels = load_batch(fpath)
+            X_train.append(data)
+            Y_train.extend(labels)
+        X_test, Y_test = load_batch(os.path.join(dirname, 'test_batch'))
+        return [to_images(np.concatenate(X_train)), np.asarray(Y_train),
+                to_images(X_test), np.asarray(Y_test)]
+
+    return load_cache(dirname, build, 10, one_hot, mmap)
+
+
+def to_images(data):
+    """ Convert rows of [red, green, blue] channels to (uint8) images of
+    shape [32, 32, 3]. """
+    return np.reshape(data, (-1, 3, 32, 32)).transpose(0, 2, 3, 1)
+
+
+def load_cache(dirname, build, n_classes, one_hot=False, mmap=False):
+    """ Load the dataset `.npy` cache (built on first use). """
+    X_train, Y_train, X_test, Y_test = load_npy_cache(
+        os.path.join(dirname, 'npy_cache'),
+        ['X_train', 'Y_train', 'X_test', 'Y_test'], build,
+        mmap_mode='r' if mmap else None)
+    if mmap:
+        # float64, as non memory-mapped data
+        X_train = NormalizedArray(X_train, dtype='float64')
+        X_test = NormalizedArray(X_test, dtype='float64')
+        if one_hot:
+            Y_train = OneHotPreloader(Y_train, n_classes, dtype='float64')
+            Y_test = OneHotPreloader(Y_test, n_classes, dtype='float64')
+        return (X_train, Y_train), (X_test, Y_test)
+
+    X_train, X_test = X_train / 255., X_test / 255.
     if one_hot:
-        Y_train = to_categorical(Y_train, 10)
-        Y_test = to_categorical(Y_test, 10)
+        Y_train = to_categorical(Y_train, n_classes)
+        Y_test = to_categorical(Y_test, n_classes)
 
     return (X_train, Y_train), (X_test, Y_test)
 
@@ -13,41 +13,38 @@ import tarfile
 import numpy as np
 import pickle
 
-from ..data_utils import to_categorical
+from .cifar10 import to_images, load_cache
 
 
-def load_data(dirname="cifar-100-python", one_hot=False):
+def load_data(dirname="cifar-100-python", one_hot=False, mmap=False):
+    """ load_data.
+
+    Load CIFAR-100 (images shape: [32, 32, 3], normalized to [0, 1]). On
+    first use, the dataset is also saved as uint8 `.npy` files (in a
+    'npy_cache' sub-folder), that are loaded instead of the original files.
+
+    Arguments:
+        dirname: `str`. The dataset directory.
+        one_hot: `bool`. If True, labels are converted to binary vectors.
+        mmap: `bool`. If True, returns memory-mapped data (shared by all
+            processes using it), that is only normalized (or one-hot encoded)
+            when batches are read (see `NormalizedArray`).
+
+    Returns:
+        (X_train, Y_train), (X_test, Y_test)
+
+    """
     tarpath = maybe_download("cifar-100-python.tar.gz",
                              "http://www.cs.toronto.edu/~kriz/",
                              dirname)
-    X_train = []
-    Y_train = []
-
-    for i in ["train"]:
-        fpath = os.path.join(dirname, i)
-        data, labels = load_batch(fpath)
-        if i == "train":
-            X_train = data
-            Y_train = labels
-        else:
-            X_train = np.concatenate([X_train, data], axis=0)
-            Y_train = np.concatenate([Y_train, labels], axis=0)
-
-    fpath = os.path.join(dirname, 'test')
-    X_test, Y_test = load_batch(fpath)
-
-    X_train = np.dstack((X_train[:, :1024], X_train[:, 1024:2048],
-                         X_train[:, 2048:])) / 255.
-    X_train = np.reshape(X_train, [-1, 32, 32, 3])
-    X_test = np.dstack((X_test[:, :1024], X_test[:, 1024:2048],
-                        X_test[:, 2048:])) / 255.
-    X_test = np.reshape(X_test, [-1, 32, 32, 3])
 
-    if one_hot:
-        Y_train = to_categorical(Y_train, 100)
-        Y_test = to_categorical(Y_test, 100)
+    def build():
+        X_train, Y_train = load_batch(os.path.join(dirname, 'train'))
+        X_test, Y_test = load_batch(os.path.join(dirname, 'test'))
+        return [to_images(X_train), np.asarray(Y_train),
+                to_images(X_test), np.asarray(Y_test)]
 
-    return (X_train, Y_train), (X_test, Y_test)
+    return load_cache(dirname, build, 100, one_hot, mmap)
 
 
 def load_batch(fpath):
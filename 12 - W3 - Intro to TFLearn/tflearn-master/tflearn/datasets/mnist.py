@@ -8,12 +8,60 @@ import os
 from six.moves import urllib
 import numpy
 
-SOURCE_URL = 'http://yann.lecun.com/exdb/mnist/'
+from ..data_utils import load_npy_cache, NormalizedArray, OneHotPreloader
 
+SOURCE_URL = 'http://yann.lecun.com/exdb/mnist/'
+TRAIN_IMAGES = 'train-images-idx3-ubyte.gz'
+TRAIN_LABELS = 'train-labels-idx1-ubyte.gz'
+TEST_IMAGES = 't10k-images-idx3-ubyte.gz'
+TEST_LABELS = 't10k-labels-idx1-ubyte.gz'
+VALIDATION_SIZE = 5000
+
+
+def load_data(data_dir="mnist/", one_hot=False, mmap=False):
+    """ load_data.
+
+    Load MNIST (flattened images of 784 pixels, normalized to [0, 1]), the
+    first 5000 training images being left out (for validation). On first
+    use, the dataset is also saved as uint8 `.npy` files (in a 'npy_cache'
+    sub-folder), that are loaded instead of the original files.
+
+    Arguments:
+        data_dir: `str`. The dataset directory.
+        one_hot: `bool`. If True, labels are converted to binary vectors.
+        mmap: `bool`. If True, returns memory-mapped data (shared by all
+            processes using it), that is only normalized (or one-hot encoded)
+            when batches are read (see `NormalizedArray`).
+
+    Returns:
+        X_train, Y_train, X_test, Y_test
+
+    """
+    def build():
+        train_images = extract_images(maybe_download(TRAIN_IMAGES, data_dir))
+        train_labels = extract_labels(maybe_download(TRAIN_LABELS, data_dir))
+        test_images = extract_images(maybe_download(TEST_IMAGES, data_dir))
+        test_labels = extract_labels(maybe_download(TEST_LABELS, data_dir))
+        return [train_images[VALIDATION_SIZE:].reshape(-1, 784),
+                train_labels[VALIDATION_SIZE:],
+                test_images.reshape(-1, 784), test_labels]
+
+    X_train, Y_train, X_test, Y_test = load_npy_cache(
+        os.path.join(data_dir, 'npy_cache'),
+        ['X_train', 'Y_train', 'X_test', 'Y_test'], build,
+        mmap_mode='r' if mmap else None)
+    if mmap:
+        X_train, X_test = NormalizedArray(X_train), NormalizedArray(X_test)
+        if one_hot:
+            Y_train = OneHotPreloader(Y_train, 10, dtype='float64')
+            Y_test = OneHotPreloader(Y_test, 10, dtype='float64')
+        return X_train, Y_train, X_test, Y_test
 
-def load_data(data_dir="mnist/", one_hot=False):
-    mnist = read_data_sets(data_dir, one_hot=one_hot)
-    return mnist.train.images, mnist.train.labels, mnist.test.images, mnist.test.labels
+    X_train = numpy.multiply(X_train.astype(numpy.float32), 1.0 / 255.0)
+    X_test = numpy.multiply(X_test.astype(numpy.float32), 1.0 / 255.0)
+    if one_hot:
+        Y_train, Y_test = dense_to_one_hot(Y_train), dense_to_one_hot(Y_test)
+    return X_train, Y_train, X_test, Y_test
 
 
 def maybe_download(filename, work_directory):
@@ -152,11 +200,6 @@ def read_data_sets(train_dir="mnist/", fake_data=False, one_hot=False):
         data_sets.validation = DataSet([], [], fake_data=True)
         data_sets.test = DataSet([], [], fake_data=True)
         return data_sets
-    TRAIN_IMAGES = 'train-images-idx3-ubyte.gz'
-    TRAIN_LABELS = 'train-labels-idx1-ubyte.gz'
-    TEST_IMAGES = 't10k-images-idx3-ubyte.gz'
-    TEST_LABELS = 't10k-labels-idx1-ubyte.gz'
-    VALIDATION_SIZE = 5000
     local_file = maybe_download(TRAIN_IMAGES, train_dir)
     train_images = extract_images(local_file)
     local_file = maybe_download(TRAIN_LABELS, train_dir)
@@ -12,6 +12,9 @@ import scipy.io
 from six.moves import urllib
 import os
 
+from ..data_utils import to_categorical, load_npy_cache, \
+    NormalizedArray, OneHotPreloader
+
 URL_BASE = 'http://ufldl.stanford.edu/housenumbers/'
 TRAIN_FILE = 'train_32x32.mat'
 TEST_FILE = 'test_32x32.mat'
@@ -20,34 +23,74 @@ TRAIN_INSTANCES = 73257
 TEST_INSTANCES = 26032
 EXTRA_INSTANCES = 531131
 
-def load_data(data_dir="svhn/", one_hot=True):
-	train_filepath = maybe_download(TRAIN_FILE,data_dir)
-	test_filepath = maybe_download(TEST_FILE,data_dir)
-	trainX, trainY = read_data_from_file(train_filepath,TRAIN_INSTANCES) 
-	testX, testY = read_data_from_file(test_filepath,TEST_INSTANCES)
-	return trainX, trainY, testX, testY
+def load_data(data_dir="svhn/", one_hot=True, mmap=False):
+	""" load_data.
+
+	Load SVHN train and test sets (images shape: [32, 32, 3], with raw
+	[0, 255] float64 values). On first use, the dataset is also saved as
+	uint8 `.npy` files (in a 'npy_cache' sub-folder), that are loaded instead
+	of the original files.
+
+	Arguments:
+		data_dir: `str`. The dataset directory.
+		one_hot: `bool`. If True, labels are converted to binary vectors,
+			else labels are integers from 0 to 9.
+		mmap: `bool`. If True, returns memory-mapped data (shared by all
+			processes using it), that is only converted to float (and one-hot
+			encoded) when batches are read (see `NormalizedArray`).
+
+	Returns:
+		trainX, trainY, testX, testY
 
-def load_extra_data(data_dir="svhn/", one_hot=True):
-	extra_filepath = maybe_download(EXTRA_FILE,data_dir)
-	extraX, extraY = read_data_from_file(extra_filepath,EXTRA_INSTANCES) 
-	return extraX, extraY
+	"""
+	def build():
+		train_filepath = maybe_download(TRAIN_FILE,data_dir)
+		test_filepath = maybe_download(TEST_FILE,data_dir)
+		return read_raw_data_from_file(train_filepath) + \
+			read_raw_data_from_file(test_filepath)
+	trainX, trainY, testX, testY = load_npy_cache(
+		os.path.join(data_dir, 'npy_cache'),
+		['X_train', 'Y_train', 'X_test', 'Y_test'], build,
+		mmap_mode='r' if mmap else None)
+	return to_dataset(trainX, trainY, mmap, one_hot) + \
+		to_dataset(testX, testY, mmap, one_hot)
 
-def read_data_from_file(filepath,instances):
+def load_extra_data(data_dir="svhn/", one_hot=True, mmap=False):
+	def build():
+		extra_filepath = maybe_download(EXTRA_FILE,data_dir)
+		return read_raw_data_from_file(extra_filepath)
+	extraX, extraY = load_npy_cache(
+		os.path.join(data_dir, 'npy_cache'), ['X_extra', 'Y_extra'], build,
+		mmap_mode='r' if mmap else None)
+	return to_dataset(extraX, extraY, mmap, one_hot)
+
+def read_data_from_file(filepath,instances=None):
+	nX, nY = read_raw_data_from_file(filepath)
+	return tuple(to_dataset(nX, nY))
+
+def read_raw_data_from_file(filepath):
+	""" Returns (uint8 images of shape (N, 32, 32, 3), labels from 0 to 9). """
 	print('Reading SVHN Dataset...')
 	mat = scipy.io.loadmat(filepath)
-	Y = mat['y'] ##Y.shape = (instances,1) 
-	X = mat['X'] #X.shape = (32, 32, 3, instances) -> 32x32 RGB 
-	nX = np.zeros(instances*3*32*32).reshape(instances,32,32,3)
-	for n in range (instances):
-		for rgb in range(3):
-			for i in range(32):
-				for j in range(32):
-					nX[n,i,j,rgb]=X[i,j,rgb,n] #output shape: (Nx32x32x3)
-	nY = np.zeros(instances*10).reshape(instances,10)
-	for n in range(instances):
-		nY[n] = label_to_one_hot_y(Y[n,0],10)
+	Y = mat['y'] ##Y.shape = (instances,1)
+	X = mat['X'] #X.shape = (32, 32, 3, instances) -> 32x32 RGB
+	#output shape: (Nx32x32x3)
+	nX = np.ascontiguousarray(np.transpose(X, (3, 0, 1, 2)))
+	#original .mat files has the 'y' classes labeled from 1 up to 10
+	nY = (Y[:, 0] - 1).astype(np.uint8)
 	print('   ...dataset read!')
-	return nX, nY
+	return [nX, nY]
+
+def to_dataset(X, Y, mmap=False, one_hot=True):
+	# Same data types whether memory-mapped (converted per batch) or not
+	if mmap:
+		X = NormalizedArray(X, scale=1., dtype='float64')
+		if one_hot:
+			Y = OneHotPreloader(Y, 10, dtype='float64')
+		return [X, Y]
+	if one_hot:
+		Y = to_categorical(Y, 10)
+	return [X.astype(np.float64), Y]
 
 def label_to_one_hot_y(y,classes):
 	#original .mat files has the 'y' classes labeled from 1 up to 10
@@ -1,9 +1,11 @@
 from __future__ import division, print_function, absolute_import
 
+import numpy as np
 import tensorflow as tf
 
 import tflearn
-from ..utils import to_list
+from ..utils import to_list, get_dict_first_element, make_batches, \
+    slice_array
 from .. import data_flow
 from .. import metrics
 from .trainer import evaluate_flow
@@ -35,45 +37,111 @@ class Evaluator(object):
             self.saver = tf.train.Saver()
             if model: self.saver.restore(self.session, model)
 
-    def predict(self, feed_dict):
+    def predict(self, feed_dict, batch_size=None, as_array=False):
         """ predict.
 
         Run data through the provided network and return the result value.
+        All tensors are predicted in a single run (per batch).
 
         Arguments:
             feed_dict: `dict`. Feed data dictionary, with placeholders as
                 keys, and data as values.
+            batch_size: `int` or None. If `int`, data is predicted by
+                batches of `batch_size` samples (so memory usage depends on
+                batch size rather than on data size). If None, all data is
+                predicted at once.
+            as_array: `bool`. If True, predictions are returned as numpy
+                arrays (one per tensor), which avoids converting them to
+                per-sample lists.
 
         Returns:
-            An `array`. In case of multiple tensors to predict, each tensor's
-            prediction result is concatenated.
+            A `list` of per-sample predictions. In case of multiple tensors
+            to predict, each sample's predictions (one per tensor) are
+            concatenated. If `as_array` is True, an `array` (or a `list` of
+            `array`, one per tensor).
 
         """
-        with self.graph.as_default():
-            # Data Preprocessing
-            dprep_dict = dict()
-            for i in range(len(self.inputs)):
-                # Support for custom inputs not using dprep/daug
-                if len(self.dprep_collection) > i:
-                    if self.dprep_collection[i] is not None:
-                        dprep_dict[self.inputs[i]] = self.dprep_collection[i]
-            # Apply pre-processing
-            if len(dprep_dict) > 0:
-                for k in dprep_dict:
-                    feed_dict[k] = dprep_dict[k].apply(feed_dict[k])
+        n_samples = len(get_dict_first_element(feed_dict))
+        prediction = None
+        start = 0
+        for pred in self.predict_generator(feed_dict, batch_size,
+                                           as_array=True):
+            if batch_size is None or n_samples <= batch_size:
+                # Single batch, no copy required
+                return pred if as_array else self._per_sample(pred)
+            preds = pred if len(self.tensors) > 1 else [pred]
+            if prediction is None:
+                # Allocate all predictions at once
+                prediction = [np.empty((n_samples,) + p.shape[1:], p.dtype)
+                              for p in preds]
+            for out, p in zip(prediction, preds):
+                out[start:start + len(p)] = p
+            start += len(preds[0])
+        if prediction is None:
+            prediction = [np.empty((0,) + tuple(
+                t.get_shape().as_list()[1:]), t.dtype.as_numpy_dtype)
+                for t in self.tensors]
+        prediction = prediction if len(self.tensors) > 1 else prediction[0]
+        return prediction if as_array else self._per_sample(prediction)
+
+    def _per_sample(self, pred):
+        """ Convert predicted arrays to a list of per-sample predictions. """
+        if len(self.tensors) > 1:
+            return [list(p) for p in zip(*[o.tolist() for o in pred])]
+        return pred.tolist()
+
+    def predict_generator(self, feed_dict, batch_size=128, as_array=False):
+        """ predict_generator.
+
+        Run data through the provided network by batches, and yield results
+        as they are predicted.
+
+        Examples:
+            ```python
+            for pred in evaluator.predict_generator({X: data}, 256):
+                ...
+            ```
+
+        Arguments:
+            feed_dict: `dict`. Feed data dictionary, with placeholders as
+                keys, and data as values.
+            batch_size: `int` or None. The batch size. If None, all data is
+                predicted at once.
+            as_array: `bool`. If True, predictions are yielded as numpy
+                arrays (see `predict`).
+
+        Yields:
+            The predictions of a batch, with the same layout as `predict`.
 
-            # Prediction for each tensor
+        """
+        # Data Preprocessing
+        dprep_dict = dict()
+        for i in range(len(self.inputs)):
+            # Support for custom inputs not using dprep/daug
+            if len(self.dprep_collection) > i:
+                if self.dprep_collection[i] is not None:
+                    dprep_dict[self.inputs[i]] = self.dprep_collection[i]
+
+        with self.graph.as_default():
             tflearn.is_training(False, self.session)
-            prediction = []
-            for output in self.tensors:
-                o_pred = self.session.run(output, feed_dict=feed_dict).tolist()
-                for i, val in enumerate(o_pred): # Reshape pred per sample
-                    if len(self.tensors) > 1:
-                        if not len(prediction) > i: prediction.append([])
-                        prediction[i].append(val)
-                    else:
-                        prediction.append(val)
-            return prediction
+        n_samples = len(get_dict_first_element(feed_dict))
+        if batch_size is None:
+            batches = [(0, n_samples)]
+        else:
+            batches = make_batches(n_samples, batch_size)
+        for batch_start, batch_end in batches:
+            if len(batches) > 1:
+                batch = dict((k, slice_array(v, batch_start, batch_end))
+                             for k, v in feed_dict.items())
+            else:
+                batch = dict(feed_dict)
+            # Apply pre-processing
+            for k in dprep_dict:
+                batch[k] = dprep_dict[k].apply(batch[k])
+            # Prediction for all tensors in a single run
+            pred = self.session.run(self.tensors, feed_dict=batch)
+            pred = pred if len(self.tensors) > 1 else pred[0]
+            yield pred if as_array else self._per_sample(pred)
 
     def evaluate(self, feed_dict, ops, batch_size=128):
         """ Evaluate.
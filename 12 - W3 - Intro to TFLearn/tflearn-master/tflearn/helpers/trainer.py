@@ -3,9 +3,17 @@ from __future__ import division, print_function, absolute_import
 
 import re
 import os
+import threading
+import time
 import numpy as np
 import tensorflow as tf
 from tensorflow.python.training import optimizer as tf_optimizer
+try:
+    # Python 2
+    import Queue as queue
+except Exception:
+    # Python 3
+    import queue
 
 import tflearn
 from .. import callbacks as tf_callbacks
@@ -51,6 +59,10 @@ class Trainer(object):
             3 - Loss, Accuracy, Gradients, Weights, Activations, Sparsity.
                 (Best Visualization)
             ```
+        summary_step: `int`. Compute and write training summaries every
+            `summary_step` steps (loss and metric are still retrieved at
+            every step). Larger values speed up training with small
+            batches. Default: 1.
         checkpoint_path: `str`. Path to store model checkpoints. If None,
             no model checkpoint will be saved. Default: None.
         best_checkpoint_path: `str`. Path to store the model when the validation rate reaches its
@@ -76,10 +88,11 @@ class Trainer(object):
                  tensorboard_verbose=0, checkpoint_path=None, best_checkpoint_path=None,
                  max_checkpoints=None,
                  keep_checkpoint_every_n_hours=10000.0, random_seed=None,
-                 session=None, best_val_accuracy=0.0):
+                 session=None, best_val_accuracy=0.0, summary_step=1):
 
         self.graph = tf.get_default_graph()
         self.summ_writer = None
+        self.summary_step = max(int(summary_step), 1)
         if graph:
             self.graph = graph
 
@@ -168,7 +181,9 @@ class Trainer(object):
 
     def fit(self, feed_dicts, n_epoch=10, val_feed_dicts=None, show_metric=False,
             snapshot_step=None, snapshot_epoch=True, shuffle_all=None,
-            dprep_dict=None, daug_dict=None, excl_trainops=None, run_id=None, callbacks=[]):
+            dprep_dict=None, daug_dict=None, excl_trainops=None, run_id=None, callbacks=[],
+            use_processes=False, async_validation=0, num_workers=1,
+            prefetch=32, reuse_buffers=False):
         """ fit.
 
         Train network with feeded data dicts.
@@ -205,8 +220,9 @@ class Trainer(object):
                 save model, if a `checkpoint_path` is specified in `Trainer`).
             snapshot_epoch: `bool`. If True, snapshot the network at the end
                 of every epoch.
-            shuffle_all: `bool`. If True, shuffle all data batches (overrides
-                `TrainOp` shuffle parameter behavior).
+            shuffle_all: `bool` or `str`. If True, shuffle all data batches
+                (overrides `TrainOp` shuffle parameter behavior). If 'block',
+                shuffle data by blocks (see `FeedDictFlow`).
             dprep_dict: `dict` with `Placeholder` as key and
                 `DataPreprocessing` as value. Apply realtime data
                 preprocessing to the given placeholders (Applied at training
@@ -221,6 +237,28 @@ class Trainer(object):
                 display. If no name provided, a random one will be generated.
             callbacks: `Callback` or `list`. Custom callbacks to use in the
                 training life cycle
+            use_processes: `bool`. If True, training batches are built by
+                worker processes instead of threads (useful for heavy data
+                augmentation or pre-processing). Default: False.
+            async_validation: `int`. If > 0, validation is performed in
+                background (over a snapshot of the weights, in a separate
+                session) while training goes on. Results are reported when
+                ready, and at most `async_validation` evaluations are in
+                flight. As results arrive after weights have been updated,
+                `best_checkpoint_path` is ignored. Default: 0 (synchronous
+                validation).
+            num_workers: `int` or 'auto'. Number of workers (threads, or
+                processes if `use_processes`) building training batches. If
+                'auto', it is adapted at runtime, from the time training
+                waits for batches against the time workers take to build
+                them (see `FeedDictFlow`). Default: 1.
+            prefetch: `int`. Maximum number of training batches built in
+                advance. Default: 32.
+            reuse_buffers: `bool`. If True, training batches are built into
+                a fixed pool of `prefetch` reusable buffers instead of new
+                arrays. A batch buffer is then overwritten once its training
+                step is done, so callbacks must not keep references to fed
+                data. Default: False.
         """
 
         if not run_id:
@@ -237,7 +275,7 @@ class Trainer(object):
 
         # shuffle is an override for simplicty, it will overrides every
         # training op batch shuffling
-        if isinstance(shuffle_all, bool):
+        if isinstance(shuffle_all, bool) or shuffle_all == 'block':
             for t in self.train_ops: t.shuffle = shuffle_all
 
         with self.graph.as_default():
@@ -260,16 +298,26 @@ class Trainer(object):
             utils.fix_saver(obj_lists)
 
             feed_dicts = to_list(feed_dicts)
-            for d in feed_dicts: standarize_dict(d)
+            for d in feed_dicts:
+                if not isinstance(d, data_flow.DataFlow):
+                    standarize_dict(d)
             val_feed_dicts = to_list(val_feed_dicts)
             if val_feed_dicts:
                 [standarize_dict(d) for d in val_feed_dicts if not
                  isinstance(d, float)]
 
+            best_checkpoint_path = self.best_checkpoint_path
+            if async_validation and best_checkpoint_path:
+                # Validation results are only known once training weights
+                # have changed, so they can't tell which weights are best.
+                print("Warning: best_checkpoint_path is ignored with "
+                      "async_validation.")
+                best_checkpoint_path = None
+
             termlogger = tf_callbacks.TermLogger()
             modelsaver = tf_callbacks.ModelSaver(self.save,
                                               self.checkpoint_path,
-                                              self.best_checkpoint_path,
+                                              best_checkpoint_path,
                                               self.best_val_accuracy,
                                               snapshot_step,
                                               snapshot_epoch)
@@ -279,7 +327,9 @@ class Trainer(object):
                 # Prepare all train_ops for fitting
                 train_op.initialize_fit(feed_dicts[i], vd, dprep_dict,
                                         daug_dict, show_metric,
-                                        self.summ_writer, self.coord)
+                                        self.summ_writer, self.coord,
+                                        use_processes, async_validation,
+                                        num_workers, prefetch, reuse_buffers)
 
                 # Prepare TermLogger for training diplay
                 metric_term_name = None
@@ -302,6 +352,8 @@ class Trainer(object):
             if callbacks:
                 [caller.add(cb) for cb in callbacks]
 
+            # Allow callbacks to write summaries (see `callbacks.Profiler`)
+            self.training_state.summary_writer = self.summ_writer
             caller.on_train_begin(self.training_state)
             train_ops_count = len(self.train_ops)
             snapshot = snapshot_epoch
@@ -330,7 +382,8 @@ class Trainer(object):
                             snapshot = train_op._train(self.training_state.step,
                                                        (bool(self.best_checkpoint_path) | snapshot_epoch),
                                                        snapshot_step,
-                                                       show_metric)
+                                                       show_metric,
+                                                       self.summary_step)
 
                             # Update training state
                             self.training_state.update(train_op, train_ops_count)
@@ -345,10 +398,29 @@ class Trainer(object):
                     # Epoch end
                     caller.on_epoch_end(self.training_state)
 
+                # Wait for background validations. No training step is
+                # done anymore, so results are only displayed (at the end of
+                # training) and set to the training state.
+                collected = [t.collect_validation(show_metric, wait=True)
+                             for t in self.train_ops]
+                if any(collected):
+                    for i, train_op in enumerate(self.train_ops):
+                        self.training_state.val_loss = train_op.val_loss
+                        self.training_state.val_acc = train_op.val_acc
+                        if train_op.val_acc is not None and train_op.val_acc \
+                                > self.training_state.best_accuracy:
+                            self.training_state.best_accuracy = \
+                                train_op.val_acc
+                        termlogger.on_sub_batch_end(self.training_state, i)
+
             finally:
                 caller.on_train_end(self.training_state)
                 for t in self.train_ops:
                     t.train_dflow.interrupt()
+                    if t.test_dflow is not None:
+                        t.test_dflow.interrupt()
+                    if t.async_evaluator is not None:
+                        t.async_evaluator.close()
                 # Set back train_ops
                 self.train_ops = original_train_ops
 
@@ -503,7 +575,8 @@ class TrainOp(object):
         ema: `float`. Exponential moving averages.
         trainable_vars: list of `tf.Variable`. List of trainable variables to
             use for training. Default: all trainable variables.
-        shuffle: `bool`. Shuffle data.
+        shuffle: `bool` or `str`. Shuffle data. If 'block', shuffle data by
+            blocks of consecutive samples (faster for HDF5 datasets).
         step_tensor: `tf.Tensor`. A variable holding training step. If not
             provided, it will be created. Early defining the step tensor
             might be useful for network creation, such as for learning rate
@@ -563,6 +636,7 @@ class TrainOp(object):
         self.val_loss = None
         self.acc_value = None
         self.val_acc = None
+        self.async_evaluator = None
 
         if step_tensor is None:
             with self.graph.as_default():
@@ -641,14 +715,15 @@ class TrainOp(object):
         with tf.name_scope(self.name):
             lss = [self.loss] + tf.get_collection(tf.GraphKeys.REGULARIZATION_LOSSES)
             total_loss = tf.add_n(lss, name="Total_Loss")
-            loss_avg_op = summaries.add_loss_summaries(
+            loss_avg_op, self.loss_avg = summaries.add_loss_summaries(
                 total_loss,
                 self.loss,
                 regul_losses_collection_key=tf.GraphKeys.REGULARIZATION_LOSSES,
                 name_prefix=self.scope_name,
                 summaries_collection_key=self.name + "_training_summaries",
                 exp_moving_avg=0.9,
-                ema_num_updates=self.training_steps)
+                ema_num_updates=self.training_steps,
+                return_average=True)
 
             # Compute gradients operations
             with tf.control_dependencies([loss_avg_op, acc_avg_op]):
@@ -681,14 +756,17 @@ class TrainOp(object):
                     self.train = tf.no_op(name="train_op_" + str(i))
 
     def initialize_fit(self, feed_dict, val_feed_dict, dprep_dict, daug_dict,
-                       show_metric, summ_writer, coord):
+                       show_metric, summ_writer, coord, use_processes=False,
+                       async_validation=0, num_workers=1, prefetch=32,
+                       reuse_buffers=False):
         """ initialize_fit.
 
         Initialize data for feeding the training process. It is meant to
         be used by `Trainer` before starting to fit data.
 
         Arguments:
-            feed_dict: `dict`. The data dictionary to feed.
+            feed_dict: `dict` or `DataFlow`. The data dictionary to feed, or
+                a data flow (such as `TFRecordsFlow`) streaming training data.
             val_feed_dict: `dict` or `float`. The validation data dictionary to
                 feed or validation split.
             dprep_dict: `dict`. Data Preprocessing dict (with placeholder as
@@ -698,11 +776,33 @@ class TrainOp(object):
             show_metric: `bool`. If True, display accuracy at every step.
             summ_writer: `SummaryWriter`. The summary writer to use for
                 Tensorboard logging.
+            coord: `Coordinator`. A Tensorflow coordinator.
+            use_processes: `bool`. If True, training batches are built by
+                worker processes instead of threads.
+            async_validation: `int`. If > 0, validation runs in background
+                (on a snapshot of the weights) while training goes on, with
+                at most `async_validation` evaluations in flight.
+            num_workers: `int` or 'auto'. Number of workers building
+                training batches ('auto' to adapt it at runtime). Ignored
+                when training from a data flow.
+            prefetch: `int`. Maximum number of training batches built in
+                advance. Ignored when training from a data flow.
+            reuse_buffers: `bool`. If True, training batches are built into
+                reusable buffers (released once trained on). Ignored when
+                training from a data flow.
 
         """
         self.summary_writer = summ_writer
+        self.async_evaluator = None
+        self.test_dflow = None
+        # Validation batches, shared by all validation flows
+        self.val_batch_cache = data_flow.BatchCache()
         self.feed_dict = feed_dict
         self.val_feed_dict = val_feed_dict
+        if isinstance(feed_dict, data_flow.DataFlow):
+            self.initialize_flow_fit(feed_dict, val_feed_dict, dprep_dict,
+                                     daug_dict, show_metric, async_validation)
+            return
         self.n_train_samples = len(get_dict_first_element(feed_dict))
 
         self.index_array = np.arange(self.n_train_samples)
@@ -733,33 +833,100 @@ class TrainOp(object):
                                                   dprep_dict=dprep_dict,
                                                   daug_dict=daug_dict,
                                                   index_array=self.index_array,
-                                                  num_threads=1,
-                                                  shuffle=self.shuffle)
+                                                  num_threads=num_workers,
+                                                  max_queue=prefetch,
+                                                  shuffle=self.shuffle,
+                                                  use_processes=use_processes,
+                                                  reuse_buffers=reuse_buffers)
+
+        self.n_batches = len(self.train_dflow.batches)
+        self.train_dflow.start()
+        if val_feed_dict:
+            self.test_dflow = self.create_test_dflow(val_feed_dict, coord,
+                                                     dprep_dict)
+
+        self.create_testing_summaries(show_metric, self.metric_summ_name,
+                                      val_feed_dict)
+        if val_feed_dict and async_validation:
+            self.async_evaluator = AsyncEvaluator(
+                self.session, self.validation_ops(show_metric),
+                lambda: self.create_test_dflow(val_feed_dict, coord,
+                                               dprep_dict),
+                int(async_validation))
+
+    def create_test_dflow(self, val_feed_dict, coord, dprep_dict):
+        """ Returns a validation data flow. Its threads persist between
+        evaluations, and pre-processed batches are cached (if they fit). """
+        return data_flow.ValidationFlow(val_feed_dict, coord,
+                                        batch_size=self.validation_batch_size,
+                                        dprep_dict=dprep_dict,
+                                        index_array=self.val_index_array,
+                                        cache=self.val_batch_cache)
+
+    def initialize_flow_fit(self, dflow, val_feed_dict, dprep_dict,
+                            daug_dict, show_metric, async_validation=0):
+        """ initialize_flow_fit.
+
+        Initialize a training process fed by a data flow (such as
+        `TFRecordsFlow`) instead of a data dictionary. Training batch size
+        is the data flow batch size.
+
+        """
+        if isinstance(val_feed_dict, float):
+            raise ValueError("Validation split is not supported when "
+                             "training from a data flow, please provide a "
+                             "validation set instead.")
+        self.n_train_samples = dflow.n_samples
+        self.index_array = None
+        self.val_index_array = None
+        self.n_val_samples = 0
+        if val_feed_dict is not None:
+            self.n_val_samples = len(get_dict_first_element(val_feed_dict))
+
+        if dprep_dict:
+            # Data is streamed, so pre-processing statistics can't be
+            # computed and must be provided.
+            for k in dprep_dict:
+                dprep_dict[k].initialize(None, self.session)
+        if dflow.dprep_dict is None:
+            dflow.dprep_dict = dprep_dict
+        if dflow.daug_dict is None:
+            dflow.daug_dict = daug_dict
+        dflow.continuous = True
+        if getattr(dflow, 'session', False) is None:
+            dflow.session = self.session
+        self.train_dflow = dflow
 
         self.n_batches = len(self.train_dflow.batches)
         self.train_dflow.start()
-        # TODO: Optimize data_flow to not start/restart threads (cost time)
-        # every time testing
+        coord = self.train_dflow.coord
         if val_feed_dict:
-            self.test_dflow = data_flow.FeedDictFlow(val_feed_dict, coord,
-                                                     batch_size=self.validation_batch_size,
-                                                     dprep_dict=dprep_dict,
-                                                     daug_dict=None,
-                                                     index_array=self.val_index_array,
-                                                     num_threads=1)
+            self.test_dflow = self.create_test_dflow(val_feed_dict, coord,
+                                                     dprep_dict)
 
         self.create_testing_summaries(show_metric, self.metric_summ_name,
                                       val_feed_dict)
+        if val_feed_dict and async_validation:
+            self.async_evaluator = AsyncEvaluator(
+                self.session, self.validation_ops(show_metric),
+                lambda: self.create_test_dflow(val_feed_dict, coord,
+                                               dprep_dict),
+                int(async_validation))
 
     def _train(self, training_step, snapshot_epoch, snapshot_step,
-               show_metric):
+               show_metric, summary_step=1):
         """ Training process for this optimizer.
 
+        Loss and metric (moving averages) are fetched with the training op,
+        and training summaries are only computed every `summary_step` steps.
+
         Arguments:
             training_step: `int`. The global step.
             snapshot_epoch: `bool`. If True, snapshot network at each epoch.
             snapshot_step: `int`. If not None, snapshot network given 'step'.
             show_metric: `bool`. If True, display accuracy at every step.
+            summary_step: `int`. Write training summaries every
+                `summary_step` steps.
 
         """
         self.loss_value, self.acc_value = None, None
@@ -768,21 +935,36 @@ class TrainOp(object):
         snapshot = False
         epoch = self.train_dflow.data_status.epoch
 
+        # Step phases timings (in seconds), see `callbacks.Profiler`
+        timings = self.step_timings = {}
+        dflow_queue = getattr(self.train_dflow, 'feed_dict_queue', None)
+        timings['queue'] = dflow_queue.qsize() if dflow_queue else 0
+
+        t0 = time.time()
         feed_batch = self.train_dflow.next()
+        t1 = time.time()
+        timings['data'] = t1 - t0
         tflearn.is_training(True, session=self.session)
-        _, train_summ_str = self.session.run([self.train, self.summ_op],
-                                             feed_batch)
-
-        # Retrieve loss value from summary string
-        sname = "Loss/" + self.scope_name
-        self.loss_value = summaries.get_value_from_summary_string(
-            sname, train_summ_str)
-
+        # Fetch loss and metric directly (no summary parsing), summaries
+        # are only computed every 'summary_step' steps.
+        fetches = [self.train, self.loss_avg]
+        if show_metric and self.metric is not None:
+            fetches.append(self.acc_averages.average(self.metric))
+        if training_step % summary_step == 0:
+            fetches.append(self.summ_op)
+        results = self.session.run(fetches, feed_batch)
+        # Batch has been fed, its buffer can be reused
+        self.train_dflow.release(feed_batch)
+        t0 = time.time()
+        timings['run'] = t0 - t1
+
+        self.loss_value = float(results[1])
         if show_metric and self.metric is not None:
-            # Retrieve accuracy value from summary string
-            sname = self.metric_summ_name + "/" + self.scope_name
-            self.acc_value = summaries.get_value_from_summary_string(
-                sname, train_summ_str)
+            self.acc_value = float(results[2])
+        if training_step % summary_step == 0:
+            train_summ_str = results[-1]
+        t1 = time.time()
+        timings['parse'] = t1 - t0
 
         if epoch != self.train_dflow.data_status.epoch:
             if snapshot_epoch:
@@ -795,48 +977,97 @@ class TrainOp(object):
 
         # Calculate validation
         if snapshot and self.val_feed_dict:
-            tflearn.is_training(False, session=self.session)
-            # Evaluation returns the mean over all batches.
-            eval_ops = [self.loss] + self.validation_monitors	# compute loss as well as any extra validation monotor tensors
-            if show_metric and self.metric is not None:
-                eval_ops.append(self.metric)
-            e = evaluate_flow(self.session, eval_ops, self.test_dflow)
-            self.val_loss = e[0]
-            if show_metric and self.metric is not None:
-                self.validation_monitor_values = e[1:-1]
-                self.val_acc = e[-1]
+            if self.async_evaluator is not None:
+                # Evaluate a snapshot of the weights while training goes on
+                self.async_evaluator.submit(self.training_steps)
             else:
-                self.validation_monitor_values = e[1:]
-
-            # Set evaluation results to variables, to be summarized.
-            update_val_op = [self.val_loss_assign]
-            update_val_feed = {self.val_loss_P: self.val_loss}
-            if show_metric:
-                update_val_op.append(self.val_acc_assign)
-                update_val_feed[self.val_acc_P] = self.val_acc
-            if self.validation_monitors:
-                update_val_op.append(self.val_monitors_assign)
-                for vmp, vmv in zip(self.val_monitors_P, self.validation_monitor_values):
-                    update_val_feed[vmp] = vmv
-
-            self.session.run(update_val_op, feed_dict=update_val_feed)
+                # Evaluation returns the mean over all batches.
+                e = evaluate_flow(self.session,
+                                  self.validation_ops(show_metric),
+                                  self.test_dflow)
+                test_summ_str = self.set_validation_results(e, show_metric)
 
-            # Run summary operation.
-            test_summ_str = self.session.run(self.val_summary_op)
+        # Report ready background validations
+        self.collect_validation(show_metric)
+        t0 = time.time()
+        timings['validation'] = t0 - t1
 
         # Write to Tensorboard
-        #TODO: Delete?
-        n_step = self.training_steps.eval(session=self.session)
-        if n_step > 1:
-            if train_summ_str:
-                self.summary_writer.add_summary(
-                    train_summ_str, n_step)
-            if test_summ_str:
-                self.summary_writer.add_summary(
-                    test_summ_str, n_step)
+        if train_summ_str or test_summ_str:
+            n_step = self.training_steps.eval(session=self.session)
+            if n_step > 1:
+                if train_summ_str:
+                    self.summary_writer.add_summary(
+                        train_summ_str, n_step)
+                if test_summ_str:
+                    self.summary_writer.add_summary(
+                        test_summ_str, n_step)
+        timings['write'] = time.time() - t0
 
         return snapshot
 
+    def validation_ops(self, show_metric):
+        """ Returns the ops to evaluate on validation data """
+        # compute loss as well as any extra validation monotor tensors
+        eval_ops = [self.loss] + self.validation_monitors
+        if show_metric and self.metric is not None:
+            eval_ops.append(self.metric)
+        return eval_ops
+
+    def set_validation_results(self, e, show_metric):
+        """ set_validation_results.
+
+        Set validation results (as returned by evaluating `validation_ops`)
+        and returns their summary string.
+
+        """
+        self.val_loss = e[0]
+        if show_metric and self.metric is not None:
+            self.validation_monitor_values = e[1:-1]
+            self.val_acc = e[-1]
+        else:
+            self.validation_monitor_values = e[1:]
+
+        # Set evaluation results to variables, to be summarized.
+        update_val_op = [self.val_loss_assign]
+        update_val_feed = {self.val_loss_P: self.val_loss}
+        if show_metric:
+            update_val_op.append(self.val_acc_assign)
+            update_val_feed[self.val_acc_P] = self.val_acc
+        if self.validation_monitors:
+            update_val_op.append(self.val_monitors_assign)
+            for vmp, vmv in zip(self.val_monitors_P, self.validation_monitor_values):
+                update_val_feed[vmp] = vmv
+
+        self.session.run(update_val_op, feed_dict=update_val_feed)
+
+        # Run summary operation.
+        return self.session.run(self.val_summary_op)
+
+    def collect_validation(self, show_metric, wait=False):
+        """ collect_validation.
+
+        Set results of background validations that are done (and write
+        their summaries at the step they were started).
+
+        Arguments:
+            show_metric: `bool`. If True, metric is evaluated.
+            wait: `bool`. If True, wait for all pending validations.
+
+        Returns:
+            `bool`. True if validation results have been set.
+
+        """
+        if self.async_evaluator is None:
+            return False
+        collected = False
+        for n_step, e in self.async_evaluator.results(wait):
+            test_summ_str = self.set_validation_results(e, show_metric)
+            if test_summ_str:
+                self.summary_writer.add_summary(test_summ_str, n_step)
+            collected = True
+        return collected
+
     def duplicate(self):
         """ Returns a duplicated `TrainOp` """
         return TrainOp(self.loss, optimizer=self.optimizer,
@@ -938,6 +1169,7 @@ def evaluate_flow(session, ops_to_evaluate, dataflow):
         while feed_batch:
             r = session.run(ops_to_evaluate, feed_batch)
             current_batch_size = get_current_batch_size(feed_batch, dataflow)
+            dataflow.release(feed_batch)
             for i in range(len(r)):
                 res[i] += r[i] * current_batch_size
             feed_batch = dataflow.next()
@@ -945,6 +1177,110 @@ def evaluate_flow(session, ops_to_evaluate, dataflow):
         return res
 
 
+class AsyncEvaluator(object):
+    """ AsyncEvaluator.
+
+    Evaluate ops over a validation data flow in background threads, while
+    training goes on. Every evaluation runs over a snapshot of the model
+    variables (taken when it is submitted), loaded into a dedicated session.
+
+    Arguments:
+        session: `Session`. The training session (to snapshot variables
+            from).
+        ops: `list` of `Tensor`. The ops to evaluate.
+        dataflow_fn: `function`. A function returning a new validation
+            `DataFlow`.
+        max_pending: `int`. Maximum number of evaluations in flight. When
+            reached, submitting waits for an evaluation to be done.
+
+    """
+
+    def __init__(self, session, ops, dataflow_fn, max_pending=1):
+        self.session = session
+        self.ops = ops
+        self.graph = session.graph
+        self.variables = self.graph.get_collection(
+            tf.GraphKeys.GLOBAL_VARIABLES) + self.graph.get_collection(
+            tf.GraphKeys.LOCAL_VARIABLES)
+        # Variables are loaded by feeding their initializer
+        self.load_ops = [v.initializer for v in self.variables]
+        self.load_inputs = [v.initializer.inputs[1] for v in self.variables]
+
+        config = None
+        tflearn_conf = self.graph.get_collection(tf.GraphKeys.GRAPH_CONFIG)
+        if tflearn_conf:
+            config = tflearn_conf[0]
+        # Idle (session, dataflow) workers
+        self.workers = queue.Queue()
+        for i in range(max_pending):
+            self.workers.put((tf.Session(graph=self.graph, config=config),
+                              dataflow_fn()))
+        self.max_pending = max_pending
+        self.done = queue.Queue()
+        self.threads = []
+
+    def submit(self, step_tensor):
+        """ submit.
+
+        Snapshot variables and start evaluating them.
+
+        Arguments:
+            step_tensor: `Tensor`. The training step to report results at.
+
+        """
+        session, dataflow = self.workers.get()
+        values = self.session.run([step_tensor] + self.variables)
+        # Copy values, as training keeps updating variables
+        values = [np.array(v, copy=True) for v in values]
+        t = threading.Thread(target=self.evaluate,
+                             args=(session, dataflow, values))
+        t.daemon = True
+        t.start()
+        self.threads = [th for th in self.threads if th.is_alive()] + [t]
+
+    def evaluate(self, session, dataflow, values):
+        try:
+            with self.graph.as_default():
+                session.run(self.load_ops,
+                            feed_dict=dict(zip(self.load_inputs, values[1:])))
+                res = evaluate_flow(session, self.ops, dataflow)
+            self.done.put((values[0], res, None))
+        except Exception as e:
+            self.done.put((values[0], None, e))
+        finally:
+            self.workers.put((session, dataflow))
+
+    def results(self, wait=False):
+        """ results.
+
+        Returns done evaluations results, as a list of (step, results).
+
+        Arguments:
+            wait: `bool`. If True, wait for all pending evaluations.
+
+        """
+        if wait:
+            for t in self.threads:
+                t.join()
+            self.threads = []
+        res = []
+        while not self.done.empty():
+            step, r, e = self.done.get()
+            if e is not None:
+                raise e
+            res.append((step, r))
+        return sorted(res, key=lambda x: x[0])
+
+    def close(self):
+        """ Wait for pending evaluations and close sessions. """
+        for t in self.threads:
+            t.join()
+        while not self.workers.empty():
+            session, dataflow = self.workers.get()
+            dataflow.interrupt()
+            session.close()
+
+
 def evaluate(session, op_to_evaluate, feed_dict, batch_size):
         """ evaluate.
 
@@ -986,6 +1322,10 @@ class TrainingState(object):
         self.step = 0
         self.current_iter = 0
         self.step_time = 0.0
+        self.data_stats = None
+        self.step_timings = None
+        self.train_op_name = None
+        self.summary_writer = None
 
         self.acc_value = None
         self.loss_value = None
@@ -1007,6 +1347,11 @@ class TrainingState(object):
         self.val_acc = train_op.val_acc
         self.val_loss = train_op.val_loss
         self.current_iter = data_status.current_iter
+        # Data flow timings (if recorded)
+        self.data_stats = getattr(train_op.train_dflow, 'data_stats', None)
+        # Step phases timings
+        self.step_timings = getattr(train_op, 'step_timings', None)
+        self.train_op_name = train_op.name
 
         # Update best validation accuracy
         if self.val_acc is not None and self.val_acc > self.best_accuracy:
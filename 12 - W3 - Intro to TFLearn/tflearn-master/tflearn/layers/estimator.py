@@ -61,8 +61,9 @@ def regression(incoming, placeholder=None, optimizer='adam',
         dtype: `tf.types`. This layer placeholder type. Default: tf.float32.
         batch_size: `int`. Batch size of data to use for training. tflearn
             supports different batch size for every optimizers. Default: 64.
-        shuffle_batches: `bool`. Shuffle or not this optimizer batches at
-            every epoch. Default: True.
+        shuffle_batches: `bool` or `str`. Shuffle or not this optimizer
+            batches at every epoch. If 'block', data is shuffled by blocks of
+            consecutive samples (faster for HDF5 datasets). Default: True.
         to_one_hot: `bool`. If True, labels will be encoded to one hot vectors.
             'n_classes' must then be specified.
         n_classes: `int`. The total number of classes. Only required when using
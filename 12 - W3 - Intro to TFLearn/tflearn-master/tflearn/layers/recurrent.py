@@ -9,7 +9,7 @@ from tensorflow.contrib.rnn.python.ops.core_rnn import static_rnn as _rnn, \
     static_bidirectional_rnn as _brnn
 from tensorflow.python.ops.rnn import rnn_cell_impl as _rnn_cell, \
     dynamic_rnn as _drnn
-from tensorflow.python.util.nest import is_sequence
+from tensorflow.python.util.nest import is_sequence, flatten
 from tensorflow.contrib.framework.python.ops.variables import model_variable
 from tensorflow.contrib.rnn.python.ops import core_rnn_cell
 
@@ -62,9 +62,16 @@ def _rnn_template(incoming, cell, dropout=None, return_seq=False,
             inference = tf.transpose(inference, (axes))
             inference = tf.unstack(inference)
 
+        # Record every timestep states
+        cell = StepRecorderWrapper(cell)
         outputs, state = _rnn(cell, inference, dtype=tf.float32,
                               initial_state=initial_state, scope=name,
                               sequence_length=sequence_length)
+        # Track states, so the last timestep can be run from a given state
+        tf.add_to_collection(tf.GraphKeys.RNN_STATES, {
+            'dynamic': dynamic,
+            'last_state': flatten(cell.states[-1]),
+            'final_state': flatten(state)})
 
         # Retrieve RNN Variables
         c = tf.GraphKeys.LAYER_VARIABLES + '/' + scope.name
@@ -688,6 +695,27 @@ class DropoutWrapper(core_rnn_cell.RNNCell):
         return output, new_state
 
 
+class StepRecorderWrapper(core_rnn_cell.RNNCell):
+    """Operator recording the state given to the cell at every timestep."""
+
+    def __init__(self, cell):
+        self._cell = cell
+        self.states = []
+
+    @property
+    def state_size(self):
+        return self._cell.state_size
+
+    @property
+    def output_size(self):
+        return self._cell.output_size
+
+    def __call__(self, inputs, state, scope=None):
+        """Run the cell, recording its input state."""
+        self.states.append(state)
+        return self._cell(inputs, state)
+
+
 # --------------------
 #   TensorFlow Utils
 # --------------------
@@ -5,6 +5,8 @@ import numpy as np
 
 from ..helpers.trainer import Trainer
 from ..helpers.evaluator import Evaluator
+from ..data_flow import TFRecordsFlow, ChunkFlow
+from ..data_utils import CSVReader
 from ..utils import feed_dict_builder, is_none, get_tensor_parents_placeholders
 
 
@@ -26,6 +28,9 @@ class DNN(object):
             ```
         tensorboard_dir: `str`. Directory to store tensorboard logs.
             Default: "/tmp/tflearn_logs/"
+        summary_step: `int`. Compute and write training summaries every
+            `summary_step` steps. Larger values speed up training with small
+            batches. Default: 1.
         checkpoint_path: `str`. Path to store model checkpoints. If None,
             no model checkpoint will be saved. Default: None.
         best_checkpoint_path: `str`. Path to store the model when the validation rate reaches its
@@ -49,7 +54,8 @@ class DNN(object):
 
     def __init__(self, network, clip_gradients=5.0, tensorboard_verbose=0,
                  tensorboard_dir="/tmp/tflearn_logs/", checkpoint_path=None, best_checkpoint_path=None,
-                 max_checkpoints=None, session=None, best_val_accuracy=0.0):
+                 max_checkpoints=None, session=None, best_val_accuracy=0.0,
+                 summary_step=1):
         assert isinstance(network, tf.Tensor), "'network' arg is not a Tensor!"
         self.net = network
         self.train_ops = tf.get_collection(tf.GraphKeys.TRAIN_OPS)
@@ -61,7 +67,8 @@ class DNN(object):
                                best_checkpoint_path=best_checkpoint_path,
                                max_checkpoints=max_checkpoints,
                                session=session,
-                               best_val_accuracy=best_val_accuracy)
+                               best_val_accuracy=best_val_accuracy,
+                               summary_step=summary_step)
         self.session = self.trainer.session
 
         self.inputs = tf.get_collection(tf.GraphKeys.INPUTS)
@@ -90,7 +97,9 @@ class DNN(object):
     def fit(self, X_inputs, Y_targets, n_epoch=10, validation_set=None,
             show_metric=False, batch_size=None, shuffle=None,
             snapshot_epoch=True, snapshot_step=None, excl_trainops=None,
-            validation_batch_size=None, run_id=None, callbacks=[]):
+            validation_batch_size=None, run_id=None, callbacks=[],
+            use_processes=False, async_validation=0, num_workers=1,
+            prefetch=32, reuse_buffers=False):
         """ Fit.
 
         Train model, feeding X_inputs and Y_targets to the network.
@@ -115,7 +124,13 @@ class DNN(object):
         Arguments:
             X_inputs: array, `list` of array (if multiple inputs) or `dict`
                 (with inputs layer name as keys). Data to feed to train
-                model.
+                model. It also accepts a `TFRecordsFlow`, to stream both
+                inputs and targets from a TFRecords dataset (`Y_targets` is
+                then ignored, and the data flow batch size is used).
+                A `CSVReader` (or a `ChunkFlow`) is also accepted, to stream
+                a CSV file by chunks (`Y_targets` is then ignored). With
+                streamed data, pre-processing statistics are not computed
+                and must be provided.
             Y_targets: array, `list` of array (if multiple inputs) or `dict`
                 (with estimators layer name as keys). Targets (Labels) to
                 feed to train model.
@@ -131,8 +146,10 @@ class DNN(object):
                 is None.
             validation_batch_size: `int` or None. If `int`, overrides all network
                 estimators 'validation_batch_size' by this value.
-            shuffle: `bool` or None. If `bool`, overrides all network
-                estimators 'shuffle' by this value.
+            shuffle: `bool`, `str` or None. If `bool` or 'block', overrides
+                all network estimators 'shuffle' by this value ('block'
+                shuffles data by blocks of consecutive samples, which is
+                faster for HDF5 datasets).
             snapshot_epoch: `bool`. If True, it will snapshot model at the end
                 of every epoch. (Snapshot a model will evaluate this model
                 on validation set, as well as create a checkpoint if
@@ -145,6 +162,25 @@ class DNN(object):
             run_id: `str`. Give a name for this run. (Useful for Tensorboard).
             callbacks: `Callback` or `list`. Custom callbacks to use in the
                 training life cycle
+            use_processes: `bool`. If True, training batches (including data
+                augmentation and pre-processing) are built by worker
+                processes instead of threads. Batch order is kept the same.
+            async_validation: `int`. If > 0, validation is performed in
+                background (over a snapshot of the weights) while training
+                goes on, with at most `async_validation` evaluations in
+                flight. Results are displayed when ready (best checkpoints
+                are then not saved).
+            num_workers: `int` or 'auto'. Number of workers (threads, or
+                processes if `use_processes`) building training batches. If
+                'auto', it is adapted at runtime, from the time training
+                waits for batches against the time workers take to build
+                them. Default: 1.
+            prefetch: `int`. Maximum number of training batches built in
+                advance. Default: 32.
+            reuse_buffers: `bool`. If True, training batches are built into
+                a fixed pool of reusable buffers instead of new arrays (a
+                batch is overwritten once trained on, so callbacks must not
+                keep references to it). Default: False.
 
         """
         if len(self.train_ops) == 0:
@@ -152,6 +188,14 @@ class DNN(object):
                             'is empty! Please make sure you are using '
                             '`regression` layer in your network.')
 
+        if isinstance(X_inputs, CSVReader):
+            # Streamed CSV: all chunks are fed through a single data flow
+            if shuffle is None:
+                shuffle = self.train_ops[0].shuffle
+            X_inputs = ChunkFlow(X_inputs, batch_size=batch_size or
+                                 self.train_ops[0].batch_size,
+                                 max_queue=prefetch, shuffle=bool(shuffle))
+
         if batch_size:
             for train_op in self.train_ops:
                 train_op.batch_size = batch_size
@@ -179,9 +223,20 @@ class DNN(object):
         # For simplicity we build sync dict synchronously but Trainer support
         # asynchronous feed dict allocation.
         # TODO: check memory impact for large data and multiple optimizers
-        feed_dict = feed_dict_builder(X_inputs, Y_targets, self.inputs,
-                                      self.targets)
-        feed_dicts = [feed_dict for i in self.train_ops]
+        if isinstance(X_inputs, (TFRecordsFlow, ChunkFlow)):
+            # Streamed data is matched with network placeholders
+            if len(self.train_ops) > 1:
+                raise ValueError("A %s can only feed a single training "
+                                 "operation." % type(X_inputs).__name__)
+            X_inputs.set_feed_keys(
+                feed_dict_builder(X_inputs.input_names,
+                                  X_inputs.target_names,
+                                  self.inputs, self.targets))
+            feed_dicts = [X_inputs]
+        else:
+            feed_dict = feed_dict_builder(X_inputs, Y_targets, self.inputs,
+                                          self.targets)
+            feed_dicts = [feed_dict for i in self.train_ops]
         val_feed_dicts = None
         if not (is_none(valX) or is_none(valY)):
             if isinstance(valX, float):
@@ -212,9 +267,14 @@ class DNN(object):
                          daug_dict=daug_dict,
                          excl_trainops=excl_trainops,
                          run_id=run_id,
-                         callbacks=callbacks)
-
-    def predict(self, X):
+                         callbacks=callbacks,
+                         use_processes=use_processes,
+                         async_validation=async_validation,
+                         num_workers=num_workers,
+                         prefetch=prefetch,
+                         reuse_buffers=reuse_buffers)
+
+    def predict(self, X, batch_size=None, as_array=False):
         """ Predict.
 
         Model prediction for given input data.
@@ -222,15 +282,42 @@ class DNN(object):
         Arguments:
             X: array, `list` of array (if multiple inputs) or `dict`
                 (with inputs layer name as keys). Data to feed for prediction.
+            batch_size: `int` or None. If `int`, data is predicted by batches
+                of `batch_size` samples (to limit memory usage on large
+                data). If None, all data is predicted at once.
+            as_array: `bool`. If True, predictions are returned as a numpy
+                array instead of a list.
 
         Returns:
-            array or `list` of array. The predicted probabilities.
+            `list` (or array, if `as_array`). The predicted probabilities.
+
+        """
+        feed_dict = feed_dict_builder(X, None, self.inputs, None)
+        return self.predictor.predict(feed_dict, batch_size, as_array)
+
+    def predict_generator(self, X, batch_size=128, as_array=False):
+        """ Predict Generator.
+
+        Model prediction for given input data, yielding predictions batch
+        by batch (so they can be processed as they are computed).
+
+        Arguments:
+            X: array, `list` of array (if multiple inputs) or `dict`
+                (with inputs layer name as keys). Data to feed for prediction.
+            batch_size: `int`. The batch size.
+            as_array: `bool`. If True, predictions are yielded as numpy
+                arrays instead of lists.
+
+        Yields:
+            `list` (or array, if `as_array`). The predicted probabilities of
+            a batch.
 
         """
         feed_dict = feed_dict_builder(X, None, self.inputs, None)
-        return self.predictor.predict(feed_dict)
+        return self.predictor.predict_generator(feed_dict, batch_size,
+                                                as_array)
 
-    def predict_label(self, X):
+    def predict_label(self, X, batch_size=None):
         """ Predict Label.
 
         Predict class labels for input X.
@@ -238,6 +325,8 @@ class DNN(object):
         Arguments:
             X: array, `list` of array (if multiple inputs) or `dict`
                 (with inputs layer name as keys). Data to feed for prediction.
+            batch_size: `int` or None. If `int`, data is predicted by batches
+                of `batch_size` samples.
 
         Returns:
             array or `list` of array. The predicted classes index array, sorted
@@ -245,7 +334,8 @@ class DNN(object):
 
         """
         feed_dict = feed_dict_builder(X, None, self.inputs, None)
-        return np.argsort(self.predictor.predict(feed_dict))[::-1]
+        return np.argsort(self.predictor.predict(feed_dict, batch_size,
+                                                 as_array=True))[::-1]
 
     def save(self, model_file):
         """ Save.
@@ -4,9 +4,30 @@ import sys
 import numpy as np
 import tensorflow as tf
 
+import tflearn
+
 from ..helpers.trainer import Trainer, evaluate as eval
 from ..helpers.evaluator import Evaluator
 from ..utils import feed_dict_builder, is_none
+from ..data_utils import OneHotPreloader, TextFileSequences
+from ..data_flow import ChunkFlow
+from ..sampling import sample
+
+
+class _OneHotChunks(object):
+    """ Chunks of a `TextFileSequences`, whose chars indexes are lazily
+    one-hot encoded. """
+
+    def __init__(self, sequences, one_hot_indexes):
+        self.sequences = sequences
+        self.one_hot_indexes = one_hot_indexes
+
+    def __len__(self):
+        return len(self.sequences)
+
+    def __iter__(self):
+        for X, Y in self.sequences:
+            yield self.one_hot_indexes(X, Y)
 
 
 class SequenceGenerator(object):
@@ -30,6 +51,9 @@ class SequenceGenerator(object):
             ```
         tensorboard_dir: `str`. Directory to store tensorboard logs.
             Default: "/tmp/tflearn_logs/"
+        summary_step: `int`. Compute and write training summaries every
+            `summary_step` steps. Larger values speed up training with small
+            batches. Default: 1.
         checkpoint_path: `str`. Path to store model checkpoints. If None,
             no model checkpoint will be saved. Default: None.
         max_checkpoints: `int` or None. Maximum amount of checkpoints. If
@@ -49,7 +73,7 @@ class SequenceGenerator(object):
                  clip_gradients=0.0, tensorboard_verbose=0,
                  tensorboard_dir="/tmp/tflearn_logs/",
                  checkpoint_path=None, max_checkpoints=None,
-                 session=None):
+                 session=None, summary_step=1):
         assert isinstance(network, tf.Tensor), "'network' arg is not a Tensor!"
         self.net = network
         self.train_ops = tf.get_collection(tf.GraphKeys.TRAIN_OPS)
@@ -59,7 +83,8 @@ class SequenceGenerator(object):
                                tensorboard_verbose=tensorboard_verbose,
                                checkpoint_path=checkpoint_path,
                                max_checkpoints=max_checkpoints,
-                               session=session)
+                               session=session,
+                               summary_step=summary_step)
         self.session = self.trainer.session
         self.inputs = tf.get_collection(tf.GraphKeys.INPUTS)
         self.targets = tf.get_collection(tf.GraphKeys.TARGETS)
@@ -97,11 +122,18 @@ class SequenceGenerator(object):
         Arguments:
             X_inputs: array, `list` of array (if multiple inputs) or `dict`
                 (with inputs layer name as keys). Data to feed to train
-                model.
+                model. Integer arrays of shape (n_sequences, seq_maxlen)
+                (as returned by `string_to_semi_redundant_sequences` with
+                `one_hot=False`) are one-hot encoded per batch. It also
+                accepts a `TextFileSequences` to stream a text file by
+                chunks, or a `ChunkFlow` (`Y_targets` is then ignored).
+                Pre-processing statistics are not computed over streamed
+                data, and must be provided.
             Y_targets: array, `list` of array (if multiple inputs) or `dict`
                 (with estimators layer name as keys). Targets (Labels) to
                 feed to train model. Usually set as the next element of a
-                sequence, i.e. for x[0] => y[0] = x[1].
+                sequence, i.e. for x[0] => y[0] = x[1]. Integer arrays of
+                shape (n_sequences,) are one-hot encoded per batch.
             n_epoch: `int`. Number of epoch to run. Default: None.
             validation_set: `tuple`. Represents data used for validation.
                 `tuple` holds data and targets (provided as same type as
@@ -124,6 +156,17 @@ class SequenceGenerator(object):
             run_id: `str`. Give a name for this run. (Useful for Tensorboard).
 
         """
+        if isinstance(X_inputs, TextFileSequences):
+            # Streamed text: all chunks are fed through a single data flow
+            # (chars indexes being one-hot encoded per batch)
+            if shuffle is None:
+                shuffle = self.train_ops[0].shuffle
+            X_inputs = ChunkFlow(_OneHotChunks(X_inputs,
+                                               self._one_hot_indexes),
+                                 batch_size=batch_size or
+                                 self.train_ops[0].batch_size,
+                                 shuffle=bool(shuffle))
+
         if batch_size:
             for train_op in self.train_ops:
                 train_op.batch_size = batch_size
@@ -137,11 +180,25 @@ class SequenceGenerator(object):
                 valX = validation_set[0]
                 valY = validation_set[1]
 
-        # For simplicity we build sync dict synchronously but
-        # Trainer support asynchronous feed dict allocation
-        feed_dict = feed_dict_builder(X_inputs, Y_targets, self.inputs,
-                                      self.targets)
-        feed_dicts = [feed_dict for i in self.train_ops]
+        if not (is_none(valX) or isinstance(valX, float)):
+            valX, valY = self._one_hot_indexes(valX, valY)
+
+        if isinstance(X_inputs, ChunkFlow):
+            if len(self.train_ops) > 1:
+                raise ValueError("A ChunkFlow can only feed a single "
+                                 "training operation.")
+            X_inputs.set_feed_keys(feed_dict_builder(
+                X_inputs.input_names, X_inputs.target_names, self.inputs,
+                self.targets))
+            feed_dicts = [X_inputs]
+        else:
+            # Chars indexes are one-hot encoded per batch
+            X_inputs, Y_targets = self._one_hot_indexes(X_inputs, Y_targets)
+            # For simplicity we build sync dict synchronously but
+            # Trainer support asynchronous feed dict allocation
+            feed_dict = feed_dict_builder(X_inputs, Y_targets, self.inputs,
+                                          self.targets)
+            feed_dicts = [feed_dict for i in self.train_ops]
 
         val_feed_dicts = None
         if not (is_none(valX) or is_none(valY)):
@@ -179,8 +236,22 @@ class SequenceGenerator(object):
         feed_dict = feed_dict_builder(X, None, self.inputs, None)
         return self.predictor.predict(feed_dict)
 
+    def _one_hot_indexes(self, X, Y):
+        """ Wrap indexes arrays into a lazy one-hot encoder. """
+        if self.dic:
+            n_class = len(self.dic)
+        else:
+            n_class = self.inputs[0].get_shape().as_list()[-1]
+        if isinstance(X, np.ndarray) and X.ndim == 2 and \
+                np.issubdtype(X.dtype, np.integer):
+            X = OneHotPreloader(X, n_class)
+        if isinstance(Y, np.ndarray) and Y.ndim == 1 and \
+                np.issubdtype(Y.dtype, np.integer):
+            Y = OneHotPreloader(Y, n_class)
+        return X, Y
+
     def generate(self, seq_length, temperature=0.5, seq_seed=None,
-                 display=False):
+                 display=False, stateful=False, top_k=None, top_p=None):
         """ Generate.
 
         Generate a sequence. Temperature is controlling the novelty of
@@ -196,45 +267,157 @@ class SequenceGenerator(object):
                 new sequence. Suggested to be a sequence from data used for
                 training.
             display: `bool`. If True, print sequence as it is generated.
+            stateful: `bool`. If True, RNN states are carried forward from
+                one generated element to the next, so every element only
+                costs a single RNN timestep (instead of running the whole
+                sequence window). See `generate_batch`.
+            top_k: `int`. If set, only sample among the `top_k` most
+                probable next elements.
+            top_p: `float`. If set, only sample among the most probable next
+                elements whose cumulated probability reach `top_p` (nucleus
+                sampling).
 
         Returns:
             The generated sequence.
 
         """
+        if display: sys.stdout.write(str(seq_seed))
 
-        generated = seq_seed[:]
-        sequence = seq_seed[:]
-        whole_sequence = seq_seed[:]
+        def display_fn(next_elems):
+            sys.stdout.write(str(next_elems[0]))
+            sys.stdout.flush()
 
-        if display: sys.stdout.write(str(generated))
-
-        for i in range(seq_length):
-            x = np.zeros((1, self.seq_maxlen, len(self.dic)))
-            for t, char in enumerate(sequence):
-                x[0, t, self.dic[char]] = 1.
-
-            preds = self._predict(x)[0]
-            next_index = _sample(preds, temperature)
-            next_char = self.rev_dic[next_index]
-
-            if type(sequence) == str:
-                generated += next_char
-                sequence = sequence[1:] + next_char
-                whole_sequence += next_char
-            else:
-                generated.append(next_char)
-                sequence = sequence[1:]
-                sequence.append(next_char)
-                whole_sequence.append(next_char)
-
-            if display:
-                sys.stdout.write(str(next_char))
-                sys.stdout.flush()
+        whole_sequence = self.generate_batch(
+            seq_length, [seq_seed], temperature, stateful=stateful,
+            top_k=top_k, top_p=top_p,
+            callback=display_fn if display else None)[0]
 
         if display: print()
 
         return whole_sequence
 
+    def generate_batch(self, seq_length, seq_seeds, temperature=0.5,
+                       stateful=False, top_k=None, top_p=None,
+                       random_state=None, callback=None):
+        """ Generate Batch.
+
+        Generate multiple sequences at once, predicting next elements of
+        all sequences in a single run (with a temperature per sequence).
+
+        If `stateful` is True, the network is first run over every sequence
+        seed, then the RNN states are carried forward: each next element
+        only costs a single RNN timestep, instead of running the whole
+        `seq_maxlen` window. Generated sequences then depend on all
+        previous elements (not only the last `seq_maxlen` ones), and
+        seeds are expected to be `seq_maxlen` long. It supports networks
+        with (stacked) `simple_rnn`, `lstm` or `gru` layers, that are not
+        `dynamic`.
+
+        Examples:
+            ```python
+            seeds = [random_sequence_from_textfile(path, maxlen)
+                     for i in range(64)]
+            sequences = m.generate_batch(600, seeds,
+                                         temperature=[0.5] * 32 + [1.] * 32,
+                                         stateful=True)
+            ```
+
+        Arguments:
+            seq_length: `int`. The generated sequences length.
+            seq_seeds: `list` of `sequence`. The sequences used as seeds (one
+                per generated sequence).
+            temperature: `float` or `list` of `float`. Novelty rate (per
+                sequence if a list).
+            stateful: `bool`. If True, RNN states are carried forward from
+                one generated element to the next.
+            top_k: `int`. If set, only sample among the `top_k` most
+                probable next elements.
+            top_p: `float`. If set, only sample among the most probable next
+                elements whose cumulated probability reach `top_p` (nucleus
+                sampling).
+            random_state: `int` or `RandomState`. Optional random seed or
+                generator, for reproducible sampling.
+            callback: `function`. Optional function called with the list of
+                next elements (one per sequence) after every step.
+
+        Returns:
+            A `list` of generated sequences (seeds included).
+
+        """
+        n_seq = len(seq_seeds)
+        if isinstance(random_state, int):
+            random_state = np.random.RandomState(random_state)
+        n_class = len(self.dic)
+        # Index windows (-1 for padding, encoded as zeros)
+        windows = -np.ones((n_seq, self.seq_maxlen), dtype='int64')
+        lengths = np.zeros(n_seq, dtype='int64')
+        for i, seed in enumerate(seq_seeds):
+            seed = seed[-self.seq_maxlen:]
+            lengths[i] = len(seed)
+            windows[i, :len(seed)] = [self.dic[e] for e in seed]
+        eye = np.vstack([np.eye(n_class, dtype='float32'),
+                         np.zeros((1, n_class), dtype='float32')])
+
+        rnn_states = []
+        if stateful:
+            rnn_states = self.net.graph.get_collection(
+                tf.GraphKeys.RNN_STATES)
+            if len(rnn_states) == 0:
+                raise ValueError("Stateful generation requires a network "
+                                 "with recurrent layers.")
+            if any(r['dynamic'] for r in rnn_states):
+                raise ValueError("Stateful generation doesn't support "
+                                 "'dynamic' recurrent layers.")
+        final_states = [t for r in rnn_states for t in r['final_state']]
+        last_states = [t for r in rnn_states for t in r['last_state']]
+
+        generated = [seed[:] for seed in seq_seeds]
+        rows = np.arange(n_seq)
+        x = eye[windows]
+        states = None
+        with self.net.graph.as_default():
+            tflearn.is_training(False, self.session)
+        for i in range(seq_length):
+            feed_dict = feed_dict_builder(x, None, self.inputs, None)
+            if states is not None:
+                # Only run the last timestep, from the carried states
+                feed_dict.update(zip(last_states, states))
+            res = self._run([self.net] + final_states, feed_dict)
+            preds, states = res[0], res[1:]
+            next_index = sample(preds, temperature, top_k, top_p,
+                                random_state=random_state)
+            next_elems = [self.rev_dic[k] for k in next_index]
+
+            if stateful:
+                # The next element is the last timestep input
+                x = np.zeros_like(x)
+                x[:, -1] = eye[next_index]
+            else:
+                # Slide windows (keeping their length)
+                windows[:, :-1] = windows[:, 1:]
+                windows[rows, lengths - 1] = next_index
+                x = eye[windows]
+
+            for j, next_elem in enumerate(next_elems):
+                if type(generated[j]) == str:
+                    generated[j] += next_elem
+                else:
+                    generated[j].append(next_elem)
+            if callback:
+                callback(next_elems)
+
+        return generated
+
+    def _run(self, fetches, feed_dict):
+        """ Run fetches, applying inputs data pre-processing. """
+        dprep_collection = self.net.graph.get_collection(
+            tf.GraphKeys.DATA_PREP)
+        for i, inp in enumerate(self.inputs):
+            if len(dprep_collection) > i and dprep_collection[i] is not None:
+                if inp in feed_dict:
+                    feed_dict[inp] = dprep_collection[i].apply(feed_dict[inp])
+        return self.session.run(fetches, feed_dict=feed_dict)
+
     def save(self, model_file):
         """ Save.
 
@@ -327,9 +510,3 @@ def reverse_dictionary(dic):
         rev_dic[dic[key]] = key
     return rev_dic
 
-
-def _sample(a, temperature=1.0):
-    # helper function to sample an index from a probability array
-    a = np.log(a) / temperature
-    a = np.exp(a) / np.sum(np.exp(a))
-    return np.argmax(np.random.multinomial(1, a, 1))
@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+"""
+Sampling provides functions to sample indexes (such as next chars or words
+indexes) from batches of predicted probabilities or logits, for sequence
+generation.
+
+Note: Those functions are only meant to be directly applied to numpy data,
+they are not meant to be used with Tensors or Layers.
+"""
+from __future__ import division, print_function, absolute_import
+
+import numpy as np
+
+
+def sample(preds, temperature=1.0, top_k=None, top_p=None, logits=False,
+           random_state=None):
+    """ sample.
+
+    Sample an index per row of a batch of probabilities (or logits). Every
+    row is sampled with a single random draw. Computation is performed in
+    log space, so it is numerically stable (with any temperature, and with
+    probabilities that do not exactly sum to 1, such as float32 softmax
+    outputs).
+
+    Examples:
+        ```python
+        preds = model.predict(X, as_array=True) # (batch_size, n_class)
+        idx = sample(preds, temperature=0.8, top_k=10)
+        idx = sample(preds, temperature=[0.5, 1.0], top_p=0.9)
+        ```
+
+    Arguments:
+        preds: `array`. A 1-D (single row) or 2-D (batch) array of
+            probabilities, or logits (if `logits` is True).
+        temperature: `float` or `array`. Sampling temperature, per row if an
+            array. The lower, the more likely are the most probable indexes.
+            A temperature of 0 always returns the most probable index.
+        top_k: `int`. If set, only sample among the `top_k` most probable
+            indexes (0 or less disables it, as None does).
+        top_p: `float`. If set, nucleus sampling is performed: only sample
+            among the most probable indexes whose cumulated probability
+            reach `top_p`.
+        logits: `bool`. If True, `preds` are logits (unnormalized log
+            probabilities).
+        random_state: `int` or `RandomState`. Optional random seed or
+            generator to use. If None, `np.random` is used.
+
+    Returns:
+        An `int` (if `preds` is 1-D) or an `array` of indexes (one per row).
+
+    """
+    preds = np.asarray(preds, dtype='float64')
+    single = preds.ndim == 1
+    preds = np.atleast_2d(preds)
+    n_rows, n_class = preds.shape
+
+    if logits:
+        log_p = preds
+    else:
+        log_p = np.log(np.maximum(preds, np.finfo('float64').tiny))
+
+    temperature = np.broadcast_to(np.asarray(temperature, dtype='float64'),
+                                  (n_rows,))
+    greedy = temperature <= 0.
+    if greedy.any():
+        argmax = np.argmax(log_p, axis=1)
+        if greedy.all():
+            return argmax[0] if single else argmax
+    log_p = log_p / np.where(greedy, 1., temperature)[:, None]
+    # Unnormalized probabilities (max is 1, so exp doesn't overflow)
+    p = np.exp(log_p - np.max(log_p, axis=1, keepdims=True))
+
+    if top_k is not None and 0 < top_k < n_class:
+        kth = np.partition(p, n_class - top_k, axis=1)[:, n_class - top_k]
+        p[p < kth[:, None]] = 0.
+
+    indexes = None
+    if top_p is not None and top_p < 1.:
+        # Sort by decreasing probabilities, draw among the sorted ones
+        indexes = np.argsort(-p, axis=1)
+        p = p[np.arange(n_rows)[:, None], indexes]
+        cum = np.cumsum(p, axis=1)
+        # Keep the smallest set reaching 'top_p' (at least one index)
+        p[cum - p >= top_p * cum[:, -1:]] = 0.
+
+    cum = np.cumsum(p, axis=1)
+    u = _uniform(random_state, n_rows) * cum[:, -1]
+    idx = np.minimum(np.sum(cum <= u[:, None], axis=1), n_class - 1)
+    if indexes is not None:
+        idx = indexes[np.arange(n_rows), idx]
+    if greedy.any():
+        idx = np.where(greedy, argmax, idx)
+    return idx[0] if single else idx
+
+
+def _uniform(random_state, size):
+    """ Uniform samples in [0, 1). """
+    if random_state is None:
+        return np.random.random_sample(size)
+    if isinstance(random_state, (int, np.integer)):
+        random_state = np.random.RandomState(random_state)
+    if hasattr(random_state, 'random_sample'):
+        return random_state.random_sample(size)
+    # numpy `Generator`
+    return random_state.random(size)
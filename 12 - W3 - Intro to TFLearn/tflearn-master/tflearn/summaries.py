@@ -194,7 +194,8 @@ def get_value_from_summary_string(tag, summary_str):
 
 def add_loss_summaries(total_loss, loss, regul_losses_collection_key,
                        name_prefix="", summaries_collection_key=None,
-                       exp_moving_avg=0.9, ema_num_updates=None):
+                       exp_moving_avg=0.9, ema_num_updates=None,
+                       return_average=False):
     """ add_loss_summaries.
 
     Add scalar summaries (raw and averages) for given losses.
@@ -211,9 +212,12 @@ def add_loss_summaries(total_loss, loss, regul_losses_collection_key,
             regularization losses.
         exp_moving_avg: `float`. Exponential moving average.
         ema_num_updates: `int`. Step to be used with exp moving avg.
+        return_average: `bool`. If True, also returns the moving average
+            of `loss`.
 
     Returns:
-        loss_averages_op: op for generating moving averages of losses.
+        loss_averages_op: op for generating moving averages of losses (and
+            the `loss` moving average `Tensor` if `return_average`).
     """
     # Compute the moving average of all individual losses and the total loss.
     loss_averages = tf.train.ExponentialMovingAverage(exp_moving_avg,
@@ -254,6 +258,8 @@ def add_loss_summaries(total_loss, loss, regul_losses_collection_key,
         get_summary("scalar", summ_name + 'raw', wdl,
                     summaries_collection_key)
 
+    if return_average:
+        return loss_averages_op, loss_averages.average(loss)
     return loss_averages_op
 
 
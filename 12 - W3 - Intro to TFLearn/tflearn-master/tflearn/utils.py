@@ -4,6 +4,8 @@ from __future__ import division, print_function, absolute_import
 import six
 import string
 import random
+import threading
+import collections
 try:
     import h5py
     H5PY_SUPPORTED = True
@@ -181,14 +183,147 @@ def slice_array(X, start=None, stop=None):
         else:
             return [x[start:stop] for x in X]
     if H5PY_SUPPORTED:
-        if type(X) == h5py.Dataset:
-            return [X[i] for i in start]
+        if type(X) == h5py.Dataset and hasattr(start, '__len__'):
+            return read_rows(X, start)
     if hasattr(start, '__len__'):
         return X[start]
     else:
         return X[start:stop]
 
 
+def is_hdf5_dataset(X):
+    return H5PY_SUPPORTED and isinstance(X, h5py.Dataset)
+
+
+def read_rows(X, ids, out=None, cache=None):
+    """ read_rows.
+
+    Read `X[ids]` from an array-like data (such as a HDF5 dataset) with as
+    few reads as possible: ids are sorted and merged into contiguous runs,
+    every run is read at once (isolated rows with a single fancy-index read),
+    and rows are scattered back in `ids` order into a single array.
+
+    Arguments:
+        X: `array`, HDF5 dataset or any array-like supporting slicing.
+        ids: `list` or `array` of `int`. The rows to read.
+        out: `array`. Optional array to write rows into (of shape
+            (len(ids),) + X.shape[1:]).
+        cache: `ChunkCache`. Optional cache of recently read chunks.
+
+    Returns:
+        An `array` holding the rows.
+
+    """
+    ids = np.asarray(ids, dtype='int64')
+    if out is None:
+        out = np.empty((len(ids),) + tuple(X.shape[1:]), dtype=X.dtype)
+    if len(ids) == 0:
+        return out
+    order = np.argsort(ids, kind='mergesort')
+    sorted_ids = ids[order]
+    if cache is not None:
+        # Group rows by (aligned) chunk
+        groups = sorted_ids // cache.chunk_rows
+    else:
+        # Group rows by run of consecutive (or repeated) ids
+        groups = np.cumsum(np.concatenate([[0], np.diff(sorted_ids) > 1]))
+    bounds = np.flatnonzero(np.diff(groups)) + 1
+    starts = np.concatenate([[0], bounds])
+    ends = np.concatenate([bounds, [len(ids)]])
+    if cache is None:
+        # Isolated rows are all gathered with a single fancy-index read
+        single = sorted_ids[ends - 1] == sorted_ids[starts]
+        if np.count_nonzero(single) > 1:
+            rows = sorted_ids[starts[single]]
+            block = X[rows.tolist()]
+            pos = np.searchsorted(rows, sorted_ids[single[groups]])
+            out[order[single[groups]]] = block[pos]
+            starts, ends = starts[~single], ends[~single]
+    for a, b in zip(starts, ends):
+        if cache is not None:
+            lo = groups[a] * cache.chunk_rows
+            block = cache.get_chunk(groups[a])
+        else:
+            # Contiguous run: a single hyperslab read
+            lo = sorted_ids[a]
+            block = X[lo:sorted_ids[b - 1] + 1]
+        out[order[a:b]] = block[sorted_ids[a:b] - lo]
+    return out
+
+
+class ChunkCache(object):
+    """ ChunkCache.
+
+    Wrap an array-like data (such as a HDF5 dataset) to read rows by
+    aligned chunks, keeping the most recently read chunks in memory. This
+    is useful when batches often read rows from the same chunks (for
+    example with `block_shuffle` data flows). It can be used in place of
+    the data it wraps.
+
+    Examples:
+        ```python
+        h5f = h5py.File('dataset.h5', 'r')
+        X = ChunkCache(h5f['X'], max_chunks=128)
+        model.fit(X, Y)
+        ```
+
+    Arguments:
+        data: `array`, HDF5 dataset or any array-like supporting slicing.
+        max_chunks: `int`. Maximum number of chunks kept in memory.
+        chunk_rows: `int`. Number of rows per chunk. Default: the HDF5
+            dataset chunk size if any, 256 otherwise.
+
+    """
+
+    def __init__(self, data, max_chunks=64, chunk_rows=None):
+        self.data = data
+        self.max_chunks = max_chunks
+        if chunk_rows is None:
+            chunks = getattr(data, 'chunks', None)
+            chunk_rows = chunks[0] if chunks else 256
+        self.chunk_rows = chunk_rows
+        self.chunks = collections.OrderedDict()
+        self.lock = threading.Lock()
+
+    @property
+    def shape(self):
+        return self.data.shape
+
+    @property
+    def dtype(self):
+        return self.data.dtype
+
+    def __len__(self):
+        return len(self.data)
+
+    def __getitem__(self, id):
+        if hasattr(id, '__len__'):
+            return self.read(id)
+        if isinstance(id, slice):
+            return self.read(np.arange(len(self.data))[id])
+        return self.read([id])[0]
+
+    def read(self, ids, out=None):
+        """ Read rows `ids` (see `read_rows`). """
+        return read_rows(self.data, ids, out=out, cache=self)
+
+    def get_chunk(self, index):
+        """ Returns chunk `index` rows (reading it if not cached). """
+        with self.lock:
+            if index in self.chunks:
+                # Move to most recently used
+                chunk = self.chunks.pop(index)
+                self.chunks[index] = chunk
+                return chunk
+        start = index * self.chunk_rows
+        chunk = self.data[start:start + self.chunk_rows]
+        with self.lock:
+            self.chunks[index] = chunk
+            while len(self.chunks) > self.max_chunks:
+                self.chunks.popitem(last=False)
+        return chunk
+
+
 def get_dict_first_element(input_dict):
     for key in input_dict:
         return input_dict[key]